@@ -1,4 +1,8 @@
-from examples.timing.time_example_agents import run_move_timing
+import argparse
+from examples.timing.time_example_agents import run_move_timing, MOVE_TIME_FUNCS
 
 if __name__ == "__main__":
-    run_move_timing()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=sorted(MOVE_TIME_FUNCS), default="apptainer")
+    args = parser.parse_args()
+    run_move_timing(backend=args.backend)
\ No newline at end of file
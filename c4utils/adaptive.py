@@ -0,0 +1,264 @@
+"""
+Adaptive tournaments: play the matches that improve the ranking most, and stop once
+it is settled.
+
+`AdaptiveScheduler` keeps a `RatingModel` of all results so far and, when asked for
+the next pairings, scores every open pair by how much one more game would shrink the
+variance of their rating difference. That favours pairs that are uncertain and
+close, and skips clear mismatches. A pair is closed when
+
+- a sequential probability ratio test on its head-to-head results is conclusive:
+  one agent is at least `elo_margin` stronger, or neither is (see `sprt_llr`),
+- the model separates the two agents at `confidence` and both have played at least
+  `min_games` games, or
+- it has played `max_games_per_pair` games (failed matches count as well).
+
+The tournament is over when every pair is closed or `max_matches` were played.
+`run_adaptive_tournament` plays the scheduled matches on the same process pool as
+`run_tournament`, keeping the workers busy:
+
+    scheduler = AdaptiveScheduler(len(agents))
+    for result in run_adaptive_tournament(agents, scheduler, sandbox_factory=LocalAgent):
+        ...
+    for rating in scheduler.ranking():
+        print(rating)
+"""
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from functools import partial
+from statistics import NormalDist
+from typing import Iterator, Optional, Sequence
+import math
+import numpy as np
+
+from .c4_types import Board
+from .ratings import RatingModel, Rating, match_arrays
+from .tournament import (AgentSpec, MatchResult, ScheduledMatch, SandboxFactory, _init_worker, _run_in_worker,
+                         tournament_workers)
+from .agent_sandbox.agent_runner import SandboxedAgent, DeadlinePolicy
+
+H0, H1 = 'H0', 'H1'
+
+
+@dataclass(frozen=True)
+class AdaptiveConfig:
+    # Head-to-head SPRT: H0 "no stronger", H1 "at least elo_margin stronger"
+    elo_margin: float = 50.0
+    alpha: float = 0.05
+    beta: float = 0.05
+    # Separation of two agents by the rating model
+    confidence: float = 0.95
+    min_games: int = 10
+    max_games_per_pair: int = 200
+    max_matches: Optional[int] = None
+
+
+def expected_score(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def sprt_llr(wins: np.ndarray, draws: np.ndarray, losses: np.ndarray, elo0: float, elo1: float) -> np.ndarray:
+    """
+    Log-likelihood ratio of "elo1 stronger" against "elo0 stronger" for head-to-head
+    results, using the normal approximation of the score (the generalized SPRT used
+    by engine testing frameworks). One virtual win and loss keep the variance positive.
+    """
+    wins, draws, losses = (np.asarray(x, dtype=np.float64) for x in (wins, draws, losses))
+    games = wins + draws + losses
+    score = np.divide(wins + 0.5 * draws, games, out=np.full_like(games, 0.5), where=games > 0)
+    regularized = games + 2
+    regularized_score = (wins + 1 + 0.5 * draws) / regularized
+    variance = ((wins + 1) * (1 - regularized_score) ** 2 + draws * (0.5 - regularized_score) ** 2
+                + (losses + 1) * regularized_score ** 2) / regularized
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return games * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+
+def sprt_bounds(alpha: float, beta: float) -> tuple[float, float]:
+    """LLR at or below the lower bound accepts H0, at or above the upper bound H1"""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+class AdaptiveScheduler:
+    """
+    Chooses pairings for an adaptive tournament between `n_agents` agents and records
+    their results, see the module docstring.
+    """
+
+    def __init__(self, n_agents: int, config: AdaptiveConfig = AdaptiveConfig(),
+                 model: Optional[RatingModel] = None):
+        if n_agents < 2:
+            raise ValueError("An adaptive tournament needs at least two agents")
+        self.n_agents = n_agents
+        self.config = config
+        self.model = model or RatingModel(n_agents)
+        # Head-to-head results of the row agent against the column agent
+        self.wins = np.zeros((n_agents, n_agents), dtype=np.int64)
+        self.draws = np.zeros((n_agents, n_agents), dtype=np.int64)
+        # Games in which the row agent moved first against the column agent
+        self.first = np.zeros((n_agents, n_agents), dtype=np.int64)
+        self.in_flight = np.zeros((n_agents, n_agents), dtype=np.int64)
+        # Matches that could not be played, e.g. because a sandbox failed to start
+        self.failures = np.zeros((n_agents, n_agents), dtype=np.int64)
+        self.matches_scheduled = 0
+        self.matches_played = 0
+        self._pairs = np.triu_indices(n_agents, k=1)
+        self._stale = False
+
+    @property
+    def games(self) -> np.ndarray:
+        """Games played per pair"""
+        return self.wins + self.wins.T + self.draws
+
+    def sprt_decisions(self) -> np.ndarray:
+        """
+        Per ordered pair (i, j): H1 if i is at least `elo_margin` stronger than j, H0 if
+        it is not, '' while undecided.
+        """
+        lower, upper = sprt_bounds(self.config.alpha, self.config.beta)
+        llr = sprt_llr(self.wins, self.draws, self.wins.T, 0.0, self.config.elo_margin)
+        return np.where(llr >= upper, H1, np.where(llr <= lower, H0, ''))
+
+    def _refit(self):
+        if self._stale:
+            self.model.fit()
+            self._stale = False
+
+    def _pair_state(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Open pairs (i < j) with the variance of their log strength difference and win probability"""
+        self._refit()
+        i, j = self._pairs
+        decisions = self.sprt_decisions()
+        sprt_done = (decisions[i, j] == H1) | (decisions[j, i] == H1) | (
+            (decisions[i, j] == H0) & (decisions[j, i] == H0))
+
+        covariance = self.model.covariance()
+        variance = np.maximum(covariance[i, i] + covariance[j, j] - 2 * covariance[i, j], 0.0)
+        difference = self.model.log_strengths[i] - self.model.log_strengths[j]
+        z = NormalDist().inv_cdf((1 + self.config.confidence) / 2)
+        agent_games = self.model.games
+        separated = ((np.abs(difference) > z * np.sqrt(variance))
+                     & (agent_games[i] >= self.config.min_games) & (agent_games[j] >= self.config.min_games))
+        attempts = self.games + self.in_flight + self.in_flight.T + self.failures + self.failures.T
+        capped = attempts[i, j] >= self.config.max_games_per_pair
+
+        open_pairs = ~(sprt_done | separated | capped)
+        p = 1 / (1 + np.exp(-difference))
+        return i[open_pairs], j[open_pairs], variance[open_pairs], p[open_pairs]
+
+    @property
+    def is_finished(self) -> bool:
+        if self.config.max_matches is not None and self.matches_scheduled >= self.config.max_matches:
+            return True
+        return len(self._pair_state()[0]) == 0
+
+    def next_pairings(self, count: int) -> list[ScheduledMatch]:
+        """
+        Up to `count` matches to play next, the most informative first. Pairs already
+        being played and agents already picked in this batch come last.
+        """
+        if self.config.max_matches is not None:
+            count = min(count, self.config.max_matches - self.matches_scheduled)
+        i, j, variance, p = self._pair_state()
+        if count <= 0 or not len(i):
+            return []
+        # Reduction of the difference variance by one more game, in a normal approximation
+        information = p * (1 - p)
+        gain = variance ** 2 * information / (1 + variance * information)
+        busy = (self.in_flight[i, j] + self.in_flight[j, i]) > 0
+        order = np.lexsort((-gain, busy))
+
+        chosen, used = [], set()
+        for index in order:
+            if len(chosen) == count:
+                break
+            if i[index] not in used and j[index] not in used:
+                chosen.append(index)
+                used.update((i[index], j[index]))
+        if len(chosen) < count:
+            chosen += [index for index in order if index not in chosen][:count - len(chosen)]
+
+        matches = []
+        for index in chosen:
+            a, b = int(i[index]), int(j[index])
+            # Alternate who moves first within a pair
+            if self.first[a, b] > self.first[b, a]:
+                a, b = b, a
+            self.first[a, b] += 1
+            self.in_flight[a, b] += 1
+            matches.append(ScheduledMatch(self.matches_scheduled, a, b))
+            self.matches_scheduled += 1
+        return matches
+
+    def record(self, result: MatchResult):
+        """Adds the result of a scheduled match. Matches that could not be played count as not played."""
+        a, b = result.player_1, result.player_2
+        self.in_flight[a, b] -= 1
+        players_1, players_2, scores = match_arrays([result])
+        if not len(scores):
+            self.failures[a, b] += 1
+            return
+        self.matches_played += 1
+        if scores[0] == 1.0:
+            self.wins[a, b] += 1
+        elif scores[0] == 0.0:
+            self.wins[b, a] += 1
+        else:
+            self.draws[a, b] += 1
+            self.draws[b, a] += 1
+        self.model.add_results(players_1, players_2, scores)
+        self._stale = True
+
+    def ranking(self, level: float = 0.95) -> list[Rating]:
+        self._refit()
+        return self.model.ranking(level)
+
+    def adjacent_confidence(self) -> list[float]:
+        """Probability that each agent in `ranking()` is stronger than the next one"""
+        ranking = self.ranking()
+        ratings = self.model.ratings
+        better = np.array([r.agent for r in ranking[:-1]], dtype=np.intp)
+        worse = np.array([r.agent for r in ranking[1:]], dtype=np.intp)
+        stderr = self.model.difference_stderr(better, worse)
+        difference = ratings[better] - ratings[worse]
+        return [NormalDist().cdf(d / s) if s > 0 else 1.0 for d, s in zip(difference, stderr)]
+
+
+def run_adaptive_tournament(agents: Sequence[AgentSpec], scheduler: Optional[AdaptiveScheduler] = None,
+                            max_workers: Optional[int] = None,
+                            max_containers: Optional[int] = None,
+                            cores_per_match: Optional[int] = None,
+                            move_timeout: float = 5.0,
+                            initial_board: Optional[Board] = None,
+                            sandbox_factory: Optional[SandboxFactory] = None,
+                            deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy(),
+                            calibrate_deadline: bool = False) -> Iterator[MatchResult]:
+    """
+    Plays the matches chosen by `scheduler` on a process pool until it is finished,
+    yielding results as matches finish. The arguments are those of `run_tournament`.
+    """
+    scheduler = scheduler or AdaptiveScheduler(len(agents))
+    if scheduler.n_agents != len(agents):
+        raise ValueError(f"The scheduler is for {scheduler.n_agents} agents, got {len(agents)}")
+    workers = tournament_workers(agents, max_workers, max_containers, cores_per_match)
+    options = {
+        'move_timeout': move_timeout,
+        'initial_board': initial_board,
+        'sandbox_factory': sandbox_factory or partial(SandboxedAgent, cpus=cores_per_match),
+        'deadline_policy': deadline_policy,
+        'calibrate_deadline': calibrate_deadline,
+    }
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(list(agents), options)) as executor:
+        running = set()
+        while True:
+            if not scheduler.is_finished:
+                running |= {executor.submit(_run_in_worker, scheduled)
+                            for scheduled in scheduler.next_pairings(workers - len(running))}
+            if not running:
+                return
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                scheduler.record(result)
+                yield result
@@ -1,6 +1,6 @@
 import numpy as np
-from .c4_types import Player, AgentFunction, BOARD_SIZE, PLAYER1, PLAYER2, Move
-from .rules import is_valid_move
+from .c4_types import Board, Player, AgentFunction, BOARD_SIZE, NO_PLAYER, PLAYER1, PLAYER2, Move
+from .rules import is_valid_move, apply_move, check_winner
 
 def validate_agent_function(func: AgentFunction, validation_timeout: float) -> tuple[bool, None | Exception]:
     """Validates that an agent function meets the required interface."""
@@ -10,17 +10,42 @@ def validate_agent_function(func: AgentFunction, validation_timeout: float) -> t
     except Exception as e:
         return False, e
 
-def check_first_move(func: AgentFunction) -> bool:
+def check_move(func: AgentFunction, board: Board, player: Player, validation_timeout: float) -> bool:
+    move = func(board.copy(), player, validation_timeout)
+    return is_valid_move(board, Move(move), player)
+
+def check_first_move(func: AgentFunction, validation_timeout: float) -> bool:
     board = np.zeros(BOARD_SIZE, dtype=Player)
-    move = func(board, PLAYER1, validation_timeout)
-    return is_valid_move(board, Move(move), PLAYER1)
+    return check_move(func, board, PLAYER1, validation_timeout)
 
-def check_later_move(func: AgentFunction) -> bool:
+def check_later_move(func: AgentFunction, validation_timeout: float) -> bool:
     board = np.zeros(BOARD_SIZE, dtype=Player)
     board[0, 0] = PLAYER1
     board[0, 1] = PLAYER2
     board[0, 4] = PLAYER1
     board[1, 1] = PLAYER2
     board[1, 2] = PLAYER1
-    move = func(board, PLAYER2, validation_timeout)
-    return is_valid_move(board, Move(move), PLAYER2)
+    return check_move(func, board, PLAYER2, validation_timeout)
+
+def validation_positions(n: int, seed: int = 0) -> list[tuple[Board, Player]]:
+    """
+    `n` distinct positions of random games that are not over yet, with the player to
+    move. Later positions have full columns, which agents must avoid.
+    """
+    rng = np.random.default_rng(seed)
+    positions, seen = [], set()
+    while len(positions) < n:
+        board = np.zeros(BOARD_SIZE, dtype=Player)
+        plies = rng.integers(BOARD_SIZE[0] * BOARD_SIZE[1])
+        player = PLAYER1
+        for _ in range(plies):
+            open_columns = np.flatnonzero(board[-1] == NO_PLAYER)
+            next_board = apply_move(board, Move(rng.choice(open_columns)), player)
+            if check_winner(next_board) is not None:
+                break
+            board = next_board
+            player = PLAYER2 if player == PLAYER1 else PLAYER1
+        if board.tobytes() not in seen:
+            seen.add(board.tobytes())
+            positions.append((board, player))
+    return positions
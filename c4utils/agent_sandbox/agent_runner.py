@@ -1,41 +1,151 @@
-from typing import Callable
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+import select
+import statistics
 import subprocess
+import tempfile
+import time
 from pathlib import Path
 from uuid import uuid4
 import hashlib
 import json
+import numpy as np
 
 # Local imports
-from ..c4_types import Board, Move, Player, AgentRuntimeError
+from ..c4_types import Board, Move, Player, BOARD_SIZE, AgentRuntimeError, AgentLoadError, MoveTimeoutError
+from . import protocol
+from ..tracing import Tracer, NULL_TRACER
 
+WORKER_MODULE = "c4utils.agent_sandbox.worker"
+# Extra time on top of the move timeout (and measured overhead) before a move is killed
+DEFAULT_DEADLINE_MARGIN = 2.0
 
-class SandboxedAgent:
+
+@dataclass(frozen=True)
+class DeadlinePolicy:
+    """
+    When the referee gives up on a move.
+
+    `overhead` is the transport and startup time of the backend (see the `calibrate_*`
+    functions). It is added to the deadline, so the agent gets its full `timeout`
+    for computing, and it can be subtracted from measured move times.
+    """
+    margin: float = DEFAULT_DEADLINE_MARGIN
+    overhead: float = 0.0
+
+    def hard_limit(self, timeout: float) -> float:
+        return timeout + self.overhead + self.margin
+
+    def compute_time(self, elapsed: float) -> float:
+        """Measured wall-clock time of a move without the transport overhead"""
+        return max(0.0, elapsed - self.overhead)
+
+
+class SandboxBackend(ABC):
+    """
+    Environment an agent runs in, e.g. an Apptainer instance or a local process.
+
+    Backends only have to say how to start and stop the environment and which command
+    lines run Python code or the agent worker inside it; running commands and workers
+    is shared. Inside the environment, `from agent import generate_move` must work.
+    """
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
+
+    @abstractmethod
+    def start(self) -> 'SandboxBackend':
+        ...
+
+    @abstractmethod
+    def cleanup(self):
+        ...
+
+    @abstractmethod
+    def exec_python_command(self, cmd: str) -> list[str]:
+        """Command line running the Python source `cmd` inside the sandbox"""
+
+    @abstractmethod
+    def worker_command(self) -> list[str]:
+        """Command line starting the agent worker inside the sandbox"""
+
+    def process_options(self) -> dict[str, Any]:
+        """Extra `subprocess.Popen` arguments (env, cwd, preexec_fn) for sandboxed processes"""
+        return {}
+
+    def start_worker(self) -> 'AgentWorker':
+        """Starts a persistent agent worker inside the sandbox."""
+        return AgentWorker(self.worker_command(), **self.process_options()).start()
+
+    def exec_command(self, cmd: str, timeout: Optional[float] = None) -> str:
+        """
+        Execute a command in the sandbox and return the output.
+        The command is killed and MoveTimeoutError raised after `timeout` seconds.
+        """
+        try:
+            result = subprocess.run(
+                self.exec_python_command(cmd),
+                capture_output=True,
+                text=True,
+                check=False,  # Don't raise on non-zero exit codes
+                timeout=timeout,
+                **self.process_options()
+            )
+            
+            if result.returncode != 0:
+                raise AgentRuntimeError(
+                    f"Agent failed with exit code {result.returncode}\n"
+                    f"stdout: {result.stdout}\n"
+                    f"stderr: {result.stderr}"
+                )
+            
+            if result.stderr:
+                # Log stderr even on success
+                print(f"Warning: Agent produced stderr: {result.stderr}")
+                
+            return result.stdout.strip()
+        except subprocess.CalledProcessError as e:
+            raise AgentRuntimeError(
+                f"Container execution failed:\n"
+                f"stdout: {e.stdout if hasattr(e, 'stdout') else 'no stdout'}\n"
+                f"stderr: {e.stderr if hasattr(e, 'stderr') else 'no stderr'}"
+            )
+        except subprocess.TimeoutExpired:
+            raise MoveTimeoutError(f"Command did not finish within {timeout:.3f} seconds and was killed")
+        except AgentRuntimeError:
+            raise
+        except Exception as e:
+            raise AgentRuntimeError(f"Unexpected error: {str(e)}")
+
+
+class SandboxedAgent(SandboxBackend):
     """
     Runs an agent in a sandboxed Apptainer container for safe execution.
     """
 
-    def __init__(self, sif_path: Path):
+    def __init__(self, sif_path: Path, cpus: Optional[float] = None):
         """Initialize the agent runner with either a SIF file or sandbox directory"""
         self.container_path = str(sif_path)
+        self.cpus = cpus
         # Create a short hash of the path (first 4 chars) + random uuid (4 chars)
         path_hash = hashlib.md5(self.container_path.encode()).hexdigest()[:4]
         random_suffix = uuid4().hex[:4]
         self.instance_name = f"{path_hash}_{random_suffix}"
         self.instance = None
 
-    def __enter__(self):
+    def start(self) -> 'SandboxedAgent':
+        """Starts the Apptainer instance"""
         try:
             # Ensure cleanup of any existing instance with same name
             self.cleanup()
             
             # Start the Apptainer instance 
             result = subprocess.run(
-                ["apptainer", "instance", "start",
-                 "--fakeroot",
-                 "--writable-tmpfs",
-                 "--contain",
-                 self.container_path,
-                 self.instance_name],
+                self.start_instance_command(),
                 capture_output=True,
                 text=True,
                 check=True
@@ -86,87 +196,298 @@ class SandboxedAgent:
                 # Log the error but don't raise
                 print(f"Warning: cleanup error for {self.instance_name}: {str(e)}")
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.cleanup()
-
     def __del__(self):
         """Backup cleanup on deletion"""
         self.cleanup()
 
-    def exec_command(self, cmd: str) -> str:
-        """Execute a command in the container instance and return the output"""
+    def start_instance_command(self) -> list[str]:
+        cpu_limit = [] if self.cpus is None else ["--cpus", str(self.cpus)]
+        return ["apptainer", "instance", "start",
+                "--fakeroot",
+                "--writable-tmpfs",
+                "--contain",
+                *cpu_limit,
+                self.container_path,
+                self.instance_name]
+
+    def exec_python_command(self, cmd: str) -> list[str]:
+        return ["apptainer", "exec", f"instance://{self.instance_name}", "python3", "-c", cmd]
+
+    def worker_command(self) -> list[str]:
+        return ["apptainer", "exec", f"instance://{self.instance_name}", "python3", "-m", WORKER_MODULE]
+
+
+class AgentWorker:
+    """
+    Host side of a long-lived agent worker process (see `c4utils.agent_sandbox.worker`).
+
+    The worker imports the agent once and then answers move requests over its
+    stdin/stdout pipes, so moves do not pay for interpreter startup and imports,
+    and the agent can keep state between moves.
+    """
+
+    def __init__(self, cmd: list[str], env: Optional[dict[str, str]] = None, cwd: Optional[str] = None,
+                 preexec_fn: Optional[Callable[[], None]] = None):
+        self.cmd = cmd
+        self.env = env
+        self.cwd = cwd
+        self.preexec_fn = preexec_fn
+        self.process: Optional[subprocess.Popen] = None
+        self._stderr = None
+        self._request_id = 0
+        self.last_reply: Optional[protocol.Reply] = None
+
+    def start(self) -> 'AgentWorker':
+        self._stderr = tempfile.TemporaryFile()
         try:
-            result = subprocess.run(
-                ["apptainer", "exec", f"instance://{self.instance_name}", 
-                 "python3", "-c", cmd],
-                capture_output=True,
-                text=True,
-                check=False  # Don't raise on non-zero exit codes
+            # Unbuffered pipes, so select() sees exactly what the worker has sent
+            self.process = subprocess.Popen(
+                self.cmd,
+                bufsize=0,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=self._stderr,
+                env=self.env,
+                cwd=self.cwd,
+                preexec_fn=self.preexec_fn
             )
-            
-            if result.returncode != 0:
-                raise AgentRuntimeError(
-                    f"Agent failed with exit code {result.returncode}\n"
-                    f"stdout: {result.stdout}\n"
-                    f"stderr: {result.stderr}"
-                )
-            
-            if result.stderr:
-                # Log stderr even on success
-                print(f"Warning: Agent produced stderr: {result.stderr}")
-                
-            return result.stdout.strip()
-        except subprocess.CalledProcessError as e:
+        except OSError as e:
+            raise AgentRuntimeError(f"Failed to start agent worker: {str(e)}")
+        reply = self._receive()
+        if reply.status != protocol.STATUS_READY:
+            self.close()
+            raise AgentLoadError(
+                f"Agent worker failed to load the agent:\n"
+                f"Error: {reply.error['error']}\n"
+                f"Traceback:\n{reply.error['traceback']}"
+            )
+        return self
+
+    def __enter__(self):
+        if self.process is None:
+            self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stderr_output(self) -> str:
+        if self._stderr is None:
+            return ''
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors='replace')
+
+    def _send(self, request: bytes):
+        try:
+            self.process.stdin.write(request)
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError) as e:
+            raise AgentRuntimeError(f"Agent worker is not accepting requests: {str(e)}\n"
+                                    f"stderr: {self.stderr_output()}")
+
+    def _receive(self) -> protocol.Reply:
+        try:
+            reply = protocol.read_reply(self.process.stdout)
+        except EOFError:
+            reply = None
+        if reply is None:
+            self.process.wait()
             raise AgentRuntimeError(
-                f"Container execution failed:\n"
-                f"stdout: {e.stdout if hasattr(e, 'stdout') else 'no stdout'}\n"
-                f"stderr: {e.stderr if hasattr(e, 'stderr') else 'no stderr'}"
+                f"Agent worker exited with code {self.process.returncode}\n"
+                f"stderr: {self.stderr_output()}"
             )
-        except Exception as e:
-            raise AgentRuntimeError(f"Unexpected error: {str(e)}")
+        return reply
 
+    def _request(self, request: bytes, deadline: Optional[float]) -> protocol.Reply:
+        self._send(request)
+        if deadline is not None:
+            ready, _, _ = select.select([self.process.stdout], [], [], deadline)
+            if not ready:
+                # The agent may be stuck anywhere, even in C code, so the worker is killed
+                self.kill()
+                raise MoveTimeoutError(f"Agent did not answer within {deadline:.3f} seconds and was killed")
+        return self._receive()
 
-def get_move_from_container(container: SandboxedAgent, board: Board, player: Player, timeout: float) -> Move:
-    """Gets a move from the containerized agent running in the sandbox."""
-    try:
-        cmd = generate_move_cmd(board, player, timeout)
-        output = container.exec_command(cmd)
-        
-        response = json.loads(output)
-        if response['status'] == 'error':
+    def request_move(self, board: Board, player: Player, timeout: float,
+                     deadline: Optional[float] = None) -> Move:
+        """
+        Asks the worker for a move. If no reply arrives within `deadline` seconds,
+        the worker is killed and MoveTimeoutError raised.
+        """
+        if not self.is_running:
+            raise AgentRuntimeError("Agent worker is not running")
+        self._request_id = (self._request_id + 1) % (1 << 32)
+        request = protocol.encode_request(self._request_id, board, player, timeout)
+        reply = self.last_reply = self._request(request, deadline)
+        if reply.status == protocol.STATUS_ERROR:
             raise AgentRuntimeError(
                 f"Agent failed:\n"
-                f"Error: {response['error']}\n"
-                f"Traceback:\n{response['traceback']}"
+                f"Error: {reply.error['error']}\n"
+                f"Traceback:\n{reply.error['traceback']}"
             )
-            
+        if reply.request_id != self._request_id:
+            raise AgentRuntimeError(f"Agent worker answered request {reply.request_id}, expected {self._request_id}")
+        return reply.move
+
+    def ping(self) -> float:
+        """Round trip time of a request that does not call the agent"""
+        if not self.is_running:
+            raise AgentRuntimeError("Agent worker is not running")
+        self._request_id = (self._request_id + 1) % (1 << 32)
+        request = protocol.encode_request(self._request_id, np.zeros(BOARD_SIZE, dtype=Player), Player(0), 0.,
+                                          kind=protocol.PING_REQUEST)
+        start_time = time.perf_counter()
+        self._request(request, None)
+        return time.perf_counter() - start_time
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            # Closing stdin asks the worker to exit after the current request
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+        self._stderr.close()
+        self.process = None
+
+
+def get_move_from_container(container: SandboxBackend, board: Board, player: Player, timeout: float,
+                            deadline: Optional[float] = None, tracer: Tracer = NULL_TRACER) -> Move:
+    """
+    Gets a move from the containerized agent running in the sandbox.
+    The agent process is killed if it has not answered after `deadline` seconds.
+    """
+    try:
+        with tracer.span('serialize'):
+            cmd = generate_move_cmd(board, player, timeout)
+        with tracer.span('exec'):
+            output = container.exec_command(cmd, timeout=deadline)
+        exec_end = time.perf_counter()
+        with tracer.span('parse'):
+            response = parse_move_response(output)
+        if tracer.enabled:
+            tracer.record_agent_time('agent.compute', exec_end, response.get('elapsed'))
+            tracer.record_agent_time('agent.import', exec_end - response.get('elapsed', 0.0),
+                                     response.get('import_time'))
         return Move(response['move'])
-    except json.JSONDecodeError:
-        raise AgentRuntimeError(f"Agent returned invalid JSON: {output}")
+    except MoveTimeoutError:
+        raise
     except Exception as exc:
         raise AgentRuntimeError(f"Failed to get move: {str(exc)}") from exc
 
-def get_move_time_from_container(container: SandboxedAgent, board: Board, player: Player, timeout: float) -> float:
+def parse_move_response(output: str) -> dict:
+    """Parses the JSON printed by the command from `generate_move_cmd`, raising on agent errors."""
+    try:
+        response = json.loads(output)
+    except json.JSONDecodeError:
+        raise AgentRuntimeError(f"Agent returned invalid JSON: {output}")
+    if response['status'] == 'error':
+        raise AgentRuntimeError(
+            f"Agent failed:\n"
+            f"Error: {response['error']}\n"
+            f"Traceback:\n{response['traceback']}"
+        )
+    return response
+
+def parse_move_output(output: str) -> Move:
+    """Parses the move from the JSON printed by the command from `generate_move_cmd`."""
+    return Move(parse_move_response(output)['move'])
+
+def get_move_time_from_container(container: SandboxBackend, board: Board, player: Player, timeout: float) -> float:
     cmd = move_time_cmd(board, player, timeout)
     output = container.exec_command(cmd)
     return float(output)
 
-def get_generate_move_func_from_container(container: SandboxedAgent) -> Callable[[Board, Player, float], Move]:
+def get_generate_move_func_from_container(
+        container: SandboxBackend,
+        deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy(),
+        tracer: Tracer = NULL_TRACER) -> Callable[[Board, Player, float], Move]:
     """
     Gets a move generation function from the containerized agent.
+    Moves are killed according to `deadline_policy`; None waits forever.
+    """
+    def generate_move(board: Board, player: Player, timeout: float) -> Move:
+        deadline = None if deadline_policy is None else deadline_policy.hard_limit(timeout)
+        return get_move_from_container(container, board, player, timeout, deadline, tracer)
+    return generate_move
+
+def get_generate_move_func_from_worker(
+        worker: AgentWorker,
+        deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy(),
+        tracer: Tracer = NULL_TRACER) -> Callable[[Board, Player, float], Move]:
+    """
+    Gets a move generation function backed by a persistent agent worker.
+    Moves are killed according to `deadline_policy`; None waits forever.
     """
     def generate_move(board: Board, player: Player, timeout: float) -> Move:
-        return get_move_from_container(container, board, player, timeout)
+        deadline = None if deadline_policy is None else deadline_policy.hard_limit(timeout)
+        with tracer.span('worker.request'):
+            move = worker.request_move(board, player, timeout, deadline)
+        if tracer.enabled:
+            tracer.record_agent_time('agent.compute', time.perf_counter(), worker.last_reply.elapsed)
+        return move
     return generate_move
 
+def calibrate_container_deadline(container: SandboxBackend, samples: int = 5,
+                                 margin: float = DEFAULT_DEADLINE_MARGIN) -> DeadlinePolicy:
+    """
+    Measures the per-move overhead of `exec_command` moves (process startup in the
+    sandbox plus the imports of a move command) as the median of `samples` runs.
+    """
+    durations = []
+    for _ in range(samples):
+        start_time = time.perf_counter()
+        container.exec_command("import json, numpy, traceback\nfrom agent import generate_move")
+        durations.append(time.perf_counter() - start_time)
+    return DeadlinePolicy(margin=margin, overhead=statistics.median(durations))
+
+def calibrate_worker_deadline(worker: AgentWorker, samples: int = 20,
+                              margin: float = DEFAULT_DEADLINE_MARGIN) -> DeadlinePolicy:
+    """Measures the round trip overhead of a persistent worker as the median of `samples` pings."""
+    return DeadlinePolicy(margin=margin, overhead=statistics.median(worker.ping() for _ in range(samples)))
+
+def container_deadline_policy(container: SandboxBackend, deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy(),
+                              calibrate: bool = False) -> Optional[DeadlinePolicy]:
+    """
+    `deadline_policy`, or with `calibrate` a policy with its margin and the overhead of
+    `container` measured by `calibrate_container_deadline`.
+    """
+    if not calibrate:
+        return deadline_policy
+    margin = DEFAULT_DEADLINE_MARGIN if deadline_policy is None else deadline_policy.margin
+    return calibrate_container_deadline(container, margin=margin)
+
 def generate_move_cmd(board: Board, player: Player, timeout: float) -> str:
+    # The agent process reports its import and compute times, for tracing
     return (
+        "import time\n"
+        "start_time = time.perf_counter()\n"
         "import json, numpy as np, traceback\n"
         "try:\n"
         "    from agent import generate_move\n"
+        "    import_time = time.perf_counter() - start_time\n"
         "    board = np.array({board})\n"
+        "    start_time = time.perf_counter()\n"
         "    move = generate_move(board, {player}, {timeout})\n"
-        "    print(json.dumps({{'status': 'success', 'move': int(move)}}))\n"
+        "    elapsed = time.perf_counter() - start_time\n"
+        "    print(json.dumps({{'status': 'success', 'move': int(move),\n"
+        "                      'import_time': import_time, 'elapsed': elapsed}}))\n"
         "except Exception as e:\n"
         "    print(json.dumps({{\n"
         "        'status': 'error',\n"
@@ -0,0 +1,247 @@
+from typing import Awaitable, Callable, Optional
+import asyncio
+import subprocess
+import tempfile
+import warnings
+
+# Local imports
+from ..c4_types import Board, Move, Player, AgentRuntimeError, AgentLoadError, MoveTimeoutError
+from . import protocol
+from .agent_runner import SandboxedAgent, DeadlinePolicy, generate_move_cmd, parse_move_output
+
+AsyncAgentFunction = Callable[[Board, Player, float], Awaitable[Move]]
+
+
+async def run_command(cmd: list[str], input: Optional[bytes] = None,
+                      timeout: Optional[float] = None) -> tuple[int, str, str]:
+    """
+    Runs a command without blocking the event loop, returns (returncode, stdout, stderr).
+    The command is killed and MoveTimeoutError raised after `timeout` seconds.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(input), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise MoveTimeoutError(f"Command did not finish within {timeout:.3f} seconds and was killed")
+    return process.returncode, stdout.decode(), stderr.decode()
+
+
+class AsyncSandboxedAgent(SandboxedAgent):
+    """
+    Asyncio version of `SandboxedAgent`: the Apptainer CLI runs in subprocesses
+    created with `asyncio.create_subprocess_exec`, so one event loop can drive
+    many agents at once.
+
+    Usage:
+        async with AsyncSandboxedAgent(sif_path) as agent:
+            move = await async_get_move_from_container(agent, board, player, timeout)
+
+    Cleanup is explicit: unlike `SandboxedAgent`, the instance is not stopped when the
+    object is garbage collected, which could block the running event loop. A
+    ResourceWarning is emitted instead if it was never cleaned up.
+    """
+    _running = False
+
+    def __del__(self):
+        if self._running:
+            warnings.warn(f"Apptainer instance {self.instance_name} was not cleaned up", ResourceWarning)
+
+    async def __aenter__(self):
+        return await self.start_async()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.cleanup_async()
+
+    async def start_async(self) -> 'AsyncSandboxedAgent':
+        """Starts the Apptainer instance"""
+        await self.cleanup_async()
+        try:
+            returncode, _, stderr = await run_command(self.start_instance_command())
+        except OSError as e:
+            raise AgentRuntimeError(f"Unexpected error starting container: {str(e)}")
+        if returncode != 0:
+            raise AgentRuntimeError(f"Failed to start container (exit code {returncode})\nstderr: {stderr}")
+        _, instances, _ = await run_command(["apptainer", "instance", "list"])
+        if self.instance_name not in instances:
+            raise AgentRuntimeError(
+                f"Container failed to start. Start output: {stderr}\n"
+                f"Instance list: {instances}"
+            )
+        self._running = True
+        return self
+
+    async def cleanup_async(self):
+        try:
+            _, instances, _ = await run_command(["apptainer", "instance", "list"])
+            if self.instance_name in instances:
+                await run_command(["apptainer", "instance", "stop", self.instance_name])
+            self._running = False
+        except Exception as e:
+            # Log the error but don't raise
+            print(f"Warning: cleanup error for {self.instance_name}: {str(e)}")
+
+    async def exec_command_async(self, cmd: str, timeout: Optional[float] = None) -> str:
+        """Execute a command in the container instance and return the output"""
+        try:
+            returncode, stdout, stderr = await run_command(self.exec_python_command(cmd), timeout=timeout)
+        except OSError as e:
+            raise AgentRuntimeError(f"Unexpected error: {str(e)}")
+        if returncode != 0:
+            raise AgentRuntimeError(
+                f"Agent failed with exit code {returncode}\n"
+                f"stdout: {stdout}\n"
+                f"stderr: {stderr}"
+            )
+        if stderr:
+            print(f"Warning: Agent produced stderr: {stderr}")
+        return stdout.strip()
+
+    async def start_worker_async(self) -> 'AsyncAgentWorker':
+        """Starts a persistent agent worker inside the running instance."""
+        return await AsyncAgentWorker(self.worker_command()).start()
+
+
+class AsyncAgentWorker:
+    """Asyncio version of `AgentWorker`, speaking the binary worker protocol."""
+
+    def __init__(self, cmd: list[str], env: Optional[dict[str, str]] = None):
+        self.cmd = cmd
+        self.env = env
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._stderr = None
+        self._request_id = 0
+        # The worker answers one request at a time
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> 'AsyncAgentWorker':
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *self.cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=self._stderr,
+                env=self.env
+            )
+        except OSError as e:
+            raise AgentRuntimeError(f"Failed to start agent worker: {str(e)}")
+        reply = await self._receive()
+        if reply.status != protocol.STATUS_READY:
+            await self.close()
+            raise AgentLoadError(
+                f"Agent worker failed to load the agent:\n"
+                f"Error: {reply.error['error']}\n"
+                f"Traceback:\n{reply.error['traceback']}"
+            )
+        return self
+
+    async def __aenter__(self):
+        if self.process is None:
+            await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def stderr_output(self) -> str:
+        if self._stderr is None:
+            return ''
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors='replace')
+
+    async def _receive(self) -> protocol.Reply:
+        try:
+            reply = await protocol.read_reply_async(self.process.stdout)
+        except EOFError:
+            reply = None
+        if reply is None:
+            await self.process.wait()
+            raise AgentRuntimeError(
+                f"Agent worker exited with code {self.process.returncode}\n"
+                f"stderr: {self.stderr_output()}"
+            )
+        return reply
+
+    async def request_move(self, board: Board, player: Player, timeout: float,
+                           deadline: Optional[float] = None) -> Move:
+        """
+        Asks the worker for a move. If no reply arrives within `deadline` seconds,
+        the worker is killed and MoveTimeoutError raised.
+        """
+        async with self._lock:
+            if self.process is None or self.process.returncode is not None:
+                raise AgentRuntimeError("Agent worker is not running")
+            request_id = self._request_id = (self._request_id + 1) % (1 << 32)
+            try:
+                self.process.stdin.write(protocol.encode_request(request_id, board, player, timeout))
+                await self.process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError) as e:
+                raise AgentRuntimeError(f"Agent worker is not accepting requests: {str(e)}\n"
+                                        f"stderr: {self.stderr_output()}")
+            try:
+                reply = await asyncio.wait_for(self._receive(), deadline)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+                raise MoveTimeoutError(f"Agent did not answer within {deadline:.3f} seconds and was killed")
+        if reply.status == protocol.STATUS_ERROR:
+            raise AgentRuntimeError(
+                f"Agent failed:\n"
+                f"Error: {reply.error['error']}\n"
+                f"Traceback:\n{reply.error['traceback']}"
+            )
+        if reply.request_id != request_id:
+            raise AgentRuntimeError(f"Agent worker answered request {reply.request_id}, expected {request_id}")
+        return reply.move
+
+    async def close(self):
+        if self.process is None:
+            return
+        if self.process.returncode is None:
+            # Closing stdin asks the worker to exit after the current request
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        self._stderr.close()
+        self.process = None
+
+
+async def async_get_move_from_container(container: AsyncSandboxedAgent, board: Board,
+                                        player: Player, timeout: float,
+                                        deadline: Optional[float] = None) -> Move:
+    """Gets a move from the containerized agent without blocking the event loop."""
+    try:
+        output = await container.exec_command_async(generate_move_cmd(board, player, timeout), timeout=deadline)
+        return parse_move_output(output)
+    except MoveTimeoutError:
+        raise
+    except Exception as exc:
+        raise AgentRuntimeError(f"Failed to get move: {str(exc)}") from exc
+
+
+def get_async_generate_move_func_from_container(
+        container: AsyncSandboxedAgent,
+        deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy()) -> AsyncAgentFunction:
+    async def generate_move(board: Board, player: Player, timeout: float) -> Move:
+        deadline = None if deadline_policy is None else deadline_policy.hard_limit(timeout)
+        return await async_get_move_from_container(container, board, player, timeout, deadline)
+    return generate_move
+
+
+def get_async_generate_move_func_from_worker(
+        worker: AsyncAgentWorker,
+        deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy()) -> AsyncAgentFunction:
+    async def generate_move(board: Board, player: Player, timeout: float) -> Move:
+        deadline = None if deadline_policy is None else deadline_policy.hard_limit(timeout)
+        return await worker.request_move(board, player, timeout, deadline)
+    return generate_move
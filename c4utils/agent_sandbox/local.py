@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Sequence
+import os
+import resource
+import shutil
+import sys
+import tempfile
+
+# Local imports
+from ..c4_types import AgentRuntimeError
+from .agent_runner import SandboxBackend, WORKER_MODULE
+
+# Directory containing the c4utils package, so agents can import it like inside the containers
+C4UTILS_ROOT = str(Path(__file__).resolve().parents[2])
+
+
+# Applies `NAME=value` soft limits and execs the command after `--`, for hosts without `prlimit`
+_SETRLIMIT_EXEC = """
+import os, resource, sys
+separator = sys.argv.index('--')
+for item in sys.argv[1:separator]:
+    name, value = item.split('=')
+    limit = getattr(resource, name)
+    resource.setrlimit(limit, (int(value), resource.getrlimit(limit)[1]))
+os.execvp(sys.argv[separator + 1], sys.argv[separator + 1:])
+"""
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """
+    Limits applied to every process started by a `LocalAgent`.
+
+    The limits are set in the child, by `prlimit` or a small Python wrapper calling
+    `resource.setrlimit` before exec'ing the command, rather than in a `preexec_fn`,
+    which is unsafe when the parent runs other threads.
+
+    `cpu_seconds` is per process, so for a persistent worker it bounds the total
+    CPU time over all moves. None leaves a limit unchanged.
+    """
+    cpu_seconds: Optional[int] = None
+    memory_bytes: Optional[int] = 2 * 1024 ** 3
+    open_files: Optional[int] = 256
+    file_size_bytes: Optional[int] = 64 * 1024 ** 2
+
+    def soft_limits(self) -> list[tuple[str, str, int]]:
+        """(resource name, prlimit option, value) of the limits to set, capped at the hard limits"""
+        limits = []
+        for name, option, value in (('RLIMIT_CPU', 'cpu', self.cpu_seconds),
+                                    ('RLIMIT_AS', 'as', self.memory_bytes),
+                                    ('RLIMIT_NOFILE', 'nofile', self.open_files),
+                                    ('RLIMIT_FSIZE', 'fsize', self.file_size_bytes)):
+            if value is not None:
+                _, hard = resource.getrlimit(getattr(resource, name))
+                limits.append((name, option, value if hard == resource.RLIM_INFINITY else min(value, hard)))
+        return limits
+
+    def command_prefix(self, python: str = sys.executable) -> list[str]:
+        """Arguments to put before a command so it runs under the limits"""
+        limits = self.soft_limits()
+        if not limits:
+            return []
+        if shutil.which('prlimit') is not None:
+            return ['prlimit', *(f'--{option}={value}:' for _, option, value in limits)]
+        return [python, '-c', _SETRLIMIT_EXEC, *(f'{name}={value}' for name, _, value in limits), '--']
+
+
+class LocalAgent(SandboxBackend):
+    """
+    Runs an agent as a plain local process under resource limits instead of a container.
+
+    `agent_dir` plays the role of `/opt` in the agent containers: it must contain an
+    `agent.py` exposing `generate_move`. Processes run in a fresh temporary working
+    directory, and with `new_namespace` inside new user and network namespaces
+    (via `unshare`), so the agent has no network access.
+
+    This is meant for benchmarks, load tests and CI machines without Apptainer; it
+    isolates far less than a container.
+    """
+
+    def __init__(self, agent_dir: Path, limits: ResourceLimits = ResourceLimits(),
+                 new_namespace: bool = False, python: str = sys.executable,
+                 python_path: Sequence[str] = ()):
+        self.agent_dir = Path(agent_dir).resolve()
+        self.limits = limits
+        self.new_namespace = new_namespace
+        self.python = python
+        self.python_path = [str(self.agent_dir), *python_path, C4UTILS_ROOT]
+        self.work_dir: Optional[str] = None
+
+    def start(self) -> 'LocalAgent':
+        if not (self.agent_dir / 'agent.py').is_file():
+            raise AgentRuntimeError(f"No agent.py found in {self.agent_dir}")
+        if self.new_namespace and shutil.which('unshare') is None:
+            raise AgentRuntimeError("new_namespace requires the `unshare` command")
+        self.cleanup()
+        self.work_dir = tempfile.mkdtemp(prefix='c4agent_')
+        return self
+
+    def cleanup(self):
+        if self.work_dir is not None:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            self.work_dir = None
+
+    def _command(self, *args: str) -> list[str]:
+        prefix = ["unshare", "--user", "--map-root-user", "--net"] if self.new_namespace else []
+        return [*self.limits.command_prefix(self.python), *prefix, self.python, *args]
+
+    def exec_python_command(self, cmd: str) -> list[str]:
+        return self._command("-c", cmd)
+
+    def worker_command(self) -> list[str]:
+        return self._command("-m", WORKER_MODULE)
+
+    def process_options(self) -> dict[str, Any]:
+        if self.work_dir is None:
+            raise AgentRuntimeError("Local agent has not been started")
+        env = {
+            'PATH': os.environ.get('PATH', ''),
+            'HOME': self.work_dir,
+            'PYTHONPATH': os.pathsep.join(self.python_path),
+            # Keep numerical libraries from spawning a thread per core
+            'OMP_NUM_THREADS': '1',
+            'OPENBLAS_NUM_THREADS': '1',
+        }
+        return {'env': env, 'cwd': self.work_dir}
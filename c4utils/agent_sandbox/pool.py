@@ -0,0 +1,173 @@
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+import threading
+
+from .agent_runner import SandboxBackend, SandboxedAgent
+
+
+@dataclass
+class PooledAgent:
+    """A started sandbox together with the number of games it has served."""
+    agent: SandboxBackend
+    sif_path: str
+    games_played: int = 0
+    # Cleared by `AgentPool.mark_unhealthy`, e.g. after a move timed out or the agent crashed
+    healthy: bool = True
+
+
+class AgentPool:
+    """
+    Keeps warm sandbox instances per SIF file and leases them to matches.
+
+    `agent_factory` creates a sandbox for a path, e.g. `LocalAgent` to pool local
+    agent processes instead of Apptainer instances.
+
+    Instances are recycled (stopped and replaced by a fresh one) after
+    `max_games_per_instance` games, or immediately when a lease ends with an exception
+    or its instance was marked with `mark_unhealthy`.
+    A background thread keeps `warm_instances` idle instances ready for every SIF that
+    has been used or registered with `warm`.
+
+    Usage:
+        with AgentPool(warm_instances=2) as pool:
+            with pool.lease(sif_1) as player_1, pool.lease(sif_2) as player_2:
+                ...
+    """
+
+    def __init__(self, max_games_per_instance: int = 50, warm_instances: int = 1,
+                 agent_factory: Callable[[Path], SandboxBackend] = SandboxedAgent,
+                 refill_interval: float = 1.0):
+        if max_games_per_instance < 1:
+            raise ValueError("max_games_per_instance must be at least 1")
+        self.max_games_per_instance = max_games_per_instance
+        self.warm_instances = warm_instances
+        self.agent_factory = agent_factory
+        self.refill_interval = refill_interval
+        self._idle: dict[str, deque[PooledAgent]] = defaultdict(deque)
+        self._starting: dict[str, int] = defaultdict(int)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._refill_thread: Optional[threading.Thread] = None
+        # Leased instances by the id of their sandbox, for mark_unhealthy
+        self._leased: dict[int, PooledAgent] = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        """Starts the background thread that keeps instances warm."""
+        if self._refill_thread is None:
+            self._refill_thread = threading.Thread(target=self._refill_loop, name="agent-pool-refill", daemon=True)
+            self._refill_thread.start()
+
+    def warm(self, sif_path: Path):
+        """Registers a SIF file and starts its warm instances right away."""
+        key = str(sif_path)
+        with self._condition:
+            self._idle.setdefault(key, deque())
+        while self._start_one_if_needed(key):
+            pass
+
+    def idle_count(self, sif_path: Path) -> int:
+        with self._condition:
+            return len(self._idle.get(str(sif_path), ()))
+
+    def acquire(self, sif_path: Path) -> PooledAgent:
+        key = str(sif_path)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Agent pool is closed")
+            idle = self._idle[key]
+            pooled = idle.popleft() if idle else None
+            # Wake the refill thread so it replaces the leased instance
+            self._condition.notify_all()
+        if pooled is None:
+            pooled = PooledAgent(self.agent_factory(Path(key)).start(), key)
+        return pooled
+
+    def release(self, pooled: PooledAgent, recycle: bool = False):
+        pooled.games_played += 1
+        with self._condition:
+            keep = not (recycle or self._closed or pooled.games_played >= self.max_games_per_instance)
+            if keep:
+                self._idle[pooled.sif_path].append(pooled)
+            self._condition.notify_all()
+        if not keep:
+            pooled.agent.cleanup()
+
+    def mark_unhealthy(self, agent: SandboxBackend):
+        """Makes the lease of `agent` recycle it when it ends instead of returning it to the pool."""
+        with self._condition:
+            self._leased[id(agent)].healthy = False
+
+    @contextmanager
+    def lease(self, sif_path: Path) -> Iterator[SandboxBackend]:
+        pooled = self.acquire(sif_path)
+        with self._condition:
+            self._leased[id(pooled.agent)] = pooled
+        try:
+            yield pooled.agent
+        except BaseException:
+            self._end_lease(pooled, recycle=True)
+            raise
+        self._end_lease(pooled, recycle=not pooled.healthy)
+
+    def _end_lease(self, pooled: PooledAgent, recycle: bool):
+        with self._condition:
+            del self._leased[id(pooled.agent)]
+        self.release(pooled, recycle)
+
+    def close(self):
+        """Stops the background thread and all idle instances."""
+        with self._condition:
+            self._closed = True
+            idle = [pooled for instances in self._idle.values() for pooled in instances]
+            self._idle.clear()
+            self._condition.notify_all()
+        if self._refill_thread is not None:
+            self._refill_thread.join()
+            self._refill_thread = None
+        for pooled in idle:
+            pooled.agent.cleanup()
+
+    def _start_one_if_needed(self, key: str) -> bool:
+        with self._condition:
+            if self._closed or len(self._idle[key]) + self._starting[key] >= self.warm_instances:
+                return False
+            self._starting[key] += 1
+        pooled = None
+        try:
+            pooled = PooledAgent(self.agent_factory(Path(key)).start(), key)
+        except Exception as e:
+            print(f"Warning: failed to start warm instance for {key}: {str(e)}")
+        added = False
+        with self._condition:
+            self._starting[key] -= 1
+            if pooled is not None and not self._closed:
+                self._idle[key].append(pooled)
+                added = True
+            self._condition.notify_all()
+        if pooled is not None and not added:
+            pooled.agent.cleanup()
+        return added
+
+    def _refill_loop(self):
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+                keys = list(self._idle.keys())
+            started = False
+            for key in keys:
+                started |= self._start_one_if_needed(key)
+            if not started:
+                with self._condition:
+                    if not self._closed:
+                        self._condition.wait(self.refill_interval)
@@ -0,0 +1,144 @@
+"""
+Binary wire format between the referee and an agent worker.
+
+Requests and replies are fixed-size little-endian records. A request carries the board
+as 42 int8 cells in row-major order; a reply carries the move and the agent's own
+compute time. Error replies are followed by one length-prefixed frame with a JSON
+description of the error.
+"""
+import asyncio
+import json
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+import numpy as np
+
+from ..c4_types import Board, Player, Move, BOARD_SIZE
+
+FRAME_HEADER = struct.Struct('>I')
+# request id, kind, player, timeout, board cells
+REQUEST = struct.Struct(f'<IBbd{BOARD_SIZE[0] * BOARD_SIZE[1]}s')
+# request id, status, move, agent compute time in seconds
+REPLY = struct.Struct('<IBbd')
+
+MOVE_REQUEST = 0
+# Answered by the worker without calling the agent, to measure transport overhead
+PING_REQUEST = 1
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_READY = 2
+
+
+@dataclass(frozen=True)
+class Request:
+    request_id: int
+    kind: int
+    player: Player
+    timeout: float
+    board: Board
+
+
+@dataclass(frozen=True)
+class Reply:
+    request_id: int
+    status: int
+    move: Move
+    elapsed: float
+    error: Optional[dict] = None
+
+
+def write_frame(stream: BinaryIO, payload: bytes):
+    stream.write(FRAME_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def read_exactly(stream: BinaryIO, size: int) -> Optional[bytes]:
+    """Reads exactly `size` bytes, returns None on a clean end of stream."""
+    data = stream.read(size)
+    if not data and size:
+        return None
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError(f"Stream ended after {len(data)} of {size} bytes")
+        data += chunk
+    return data
+
+
+def read_frame(stream: BinaryIO) -> Optional[bytes]:
+    header = read_exactly(stream, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    return read_exactly(stream, size)
+
+
+def encode_board(board: Board) -> bytes:
+    if board.shape != BOARD_SIZE:
+        raise ValueError(f"Board must have shape {BOARD_SIZE}, got {board.shape}")
+    return np.ascontiguousarray(board, dtype=np.int8).tobytes()
+
+
+def decode_board(data: bytes) -> Board:
+    return np.frombuffer(data, dtype=Player).reshape(BOARD_SIZE).copy()
+
+
+def encode_request(request_id: int, board: Board, player: Player, timeout: float,
+                   kind: int = MOVE_REQUEST) -> bytes:
+    return REQUEST.pack(request_id, kind, int(player), timeout, encode_board(board))
+
+
+def decode_request(data: bytes) -> Request:
+    request_id, kind, player, timeout, cells = REQUEST.unpack(data)
+    return Request(request_id, kind, Player(player), timeout, decode_board(cells))
+
+
+def encode_reply(request_id: int, status: int, move: int = -1, elapsed: float = 0.0) -> bytes:
+    return REPLY.pack(request_id, status, move, elapsed)
+
+
+def decode_reply(data: bytes) -> Reply:
+    request_id, status, move, elapsed = REPLY.unpack(data)
+    return Reply(request_id, status, Move(move), elapsed)
+
+
+def write_error(stream: BinaryIO, request_id: int, error: str, traceback: str):
+    stream.write(encode_reply(request_id, STATUS_ERROR))
+    write_frame(stream, json.dumps({'error': error, 'traceback': traceback}).encode())
+
+
+def read_request(stream: BinaryIO) -> Optional[Request]:
+    data = read_exactly(stream, REQUEST.size)
+    return None if data is None else decode_request(data)
+
+
+def read_reply(stream: BinaryIO) -> Optional[Reply]:
+    data = read_exactly(stream, REPLY.size)
+    if data is None:
+        return None
+    reply = decode_reply(data)
+    if reply.status == STATUS_ERROR:
+        error = read_frame(stream)
+        if error is None:
+            raise EOFError("Stream ended before the error description")
+        reply = Reply(reply.request_id, reply.status, reply.move, reply.elapsed, json.loads(error))
+    return reply
+
+
+async def read_reply_async(stream: asyncio.StreamReader) -> Optional[Reply]:
+    """Like `read_reply`, for asyncio streams."""
+    try:
+        reply = decode_reply(await stream.readexactly(REPLY.size))
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise EOFError(f"Stream ended after {len(e.partial)} of {REPLY.size} bytes")
+    if reply.status == STATUS_ERROR:
+        try:
+            (size,) = FRAME_HEADER.unpack(await stream.readexactly(FRAME_HEADER.size))
+            error = json.loads(await stream.readexactly(size))
+        except asyncio.IncompleteReadError:
+            raise EOFError("Stream ended before the error description")
+        reply = Reply(reply.request_id, reply.status, reply.move, reply.elapsed, error)
+    return reply
@@ -1,25 +1,129 @@
-import signal
-from functools import wraps
-from typing import TypeVar, Callable, Any
-from contextlib import contextmanager
-from ..c4_types import MoveTimeoutError
-
-
-@contextmanager
-def timeout(seconds: float):
-    """Context manager that raises TimeoutError if block execution exceeds time limit"""
-    def signal_handler(signum, frame):
-        raise MoveTimeoutError(f"Execution timed out after {seconds} seconds")
-
-    # Set the signal handler and alarm
-    signal.signal(signal.SIGALRM, signal_handler)
-    signal.setitimer(signal.ITIMER_REAL, seconds)
-    
-    try:
-        yield
-    finally:
-        # Disable the alarm
-        signal.setitimer(signal.ITIMER_REAL, 0)
+"""
+Per-call deadlines for agent functions.
+
+`timeout` / `with_timeout` work in any thread and any number of deadlines can be
+active at once: a single timer thread keeps the pending deadlines in a heap and, when
+one expires, raises MoveTimeoutError in the thread that set it (with
+`PyThreadState_SetAsyncExc`). No signal handlers are installed, so this also works
+in thread pools and next to an asyncio loop.
+
+Asynchronous exceptions are only delivered while the thread runs Python code: a call
+blocked in C (a long `time.sleep`, a big numpy operation, a C extension loop) raises
+once it returns. For code that may never return, `with_hard_timeout` runs the
+function in a child process that is killed at the deadline.
+"""
+from functools import partial, wraps
+from typing import Any, Callable, Optional, TypeVar
+import ctypes
+import heapq
+import itertools
+import multiprocessing
+import threading
+import time
+
+from ..c4_types import MoveTimeoutError, AgentRuntimeError
+
+# Extra time a hard-timeout child gets to send its result
+HARD_TIMEOUT_GRACE = 0.05
+
+
+class _DeadlineExpired(MoveTimeoutError):
+    """Raised asynchronously by the timer thread, replaced by a MoveTimeoutError with a message"""
+
+
+def _set_async_exception(thread_id: int, exception: Optional[type]) -> int:
+    return ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id),
+                                                      ctypes.py_object(exception) if exception else None)
+
+
+class _Deadline:
+    __slots__ = ('when', 'thread_id', 'fired', 'cancelled')
+
+    def __init__(self, when: float, thread_id: int):
+        self.when = when
+        self.thread_id = thread_id
+        self.fired = False
+        self.cancelled = False
+
+
+class _DeadlineScheduler:
+    """Timer thread firing the deadlines of all threads, started on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._heap: list[tuple[float, int, _Deadline]] = []
+        self._counter = itertools.count()
+        self._cancelled = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, seconds: float) -> _Deadline:
+        deadline = _Deadline(time.monotonic() + seconds, threading.get_ident())
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='c4utils-deadlines', daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, (deadline.when, next(self._counter), deadline))
+            # The timer thread only needs to recompute its sleep if this is the new earliest deadline
+            if self._heap[0][2] is deadline:
+                self._wakeup.notify()
+        return deadline
+
+    def cancel(self, deadline: _Deadline) -> bool:
+        """Cancels a deadline, returns whether it had already fired."""
+        with self._lock:
+            deadline.cancelled = True
+            if deadline.fired:
+                # Drop the exception if it has not been delivered yet
+                _set_async_exception(deadline.thread_id, None)
+            else:
+                self._cancelled += 1
+                # Cancelled deadlines are normally dropped when they reach the top of the heap;
+                # compact it when they pile up behind long deadlines
+                if self._cancelled > 64 and self._cancelled > len(self._heap) // 2:
+                    self._heap = [item for item in self._heap if not item[2].cancelled]
+                    heapq.heapify(self._heap)
+                    self._cancelled = 0
+            return deadline.fired
+
+    def _run(self):
+        with self._lock:
+            while True:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled -= 1
+                if not self._heap:
+                    self._wakeup.wait()
+                    continue
+                remaining = self._heap[0][0] - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+                _, _, deadline = heapq.heappop(self._heap)
+                deadline.fired = True
+                _set_async_exception(deadline.thread_id, _DeadlineExpired)
+
+
+_scheduler = _DeadlineScheduler()
+
+
+class timeout:
+    """Context manager that raises MoveTimeoutError if block execution exceeds time limit"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._deadline: Optional[_Deadline] = None
+
+    def __enter__(self):
+        self._deadline = _scheduler.schedule(self.seconds)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        fired = _scheduler.cancel(self._deadline)
+        if fired and (exc_type is None or issubclass(exc_type, _DeadlineExpired)):
+            raise MoveTimeoutError(f"Execution timed out after {self.seconds} seconds") from None
+        return False
+
 
 F = TypeVar('F', bound=Callable[..., Any])
 
@@ -27,7 +131,7 @@ def with_timeout(func: F) -> F:
     """
     Decorator that applies timeout to a function.
     Expects the function to have timeout as its third argument.
-    
+
     Usage:
         @with_timeout
         def generate_move(board, player, timeout) -> Move:
@@ -38,4 +142,67 @@ def with_timeout(func: F) -> F:
         _, _, timeout_value = args
         with timeout(timeout_value):
             return func(*args, **kwargs)
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+def _run_in_child(func: Callable, args: tuple, kwargs: dict, connection):
+    try:
+        connection.send((True, func(*args, **kwargs)))
+    except BaseException as e:
+        connection.send((False, e))
+    finally:
+        connection.close()
+
+
+def _hard_timeout_context():
+    # Forking this process directly could deadlock the child, as other threads (e.g.
+    # the deadline timer thread) may hold locks. A fork server has no other threads.
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def call_with_hard_timeout(func: Callable, *args, seconds: float, **kwargs) -> Any:
+    """
+    Calls `func` in a child process, which is killed if it has not returned after
+    `seconds`. Children are started by a fork server (spawned where there is none), so
+    this is safe from any thread; `func`, its arguments, result and exceptions must be
+    picklable, i.e. `func` must be defined at module level. The first call starts the
+    fork server, later calls cost a few milliseconds plus importing `func`'s module.
+    """
+    context = _hard_timeout_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_in_child, args=(func, args, kwargs, sender), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(seconds + HARD_TIMEOUT_GRACE):
+            raise MoveTimeoutError(f"Execution timed out after {seconds} seconds and was killed")
+        try:
+            ok, value = receiver.recv()
+        except EOFError:
+            raise AgentRuntimeError(f"Process exited without a result (exit code {process.exitcode})")
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+    if not ok:
+        raise value
+    return value
+
+
+def _call_wrapped(wrapper: Callable, *args, **kwargs) -> Any:
+    # The decorated function is pickled by name, which refers to the wrapper
+    return wrapper.__wrapped__(*args, **kwargs)
+
+
+def with_hard_timeout(func: F) -> F:
+    """
+    Like `with_timeout`, but kills the call at the deadline even if it is stuck in C code.
+    See `call_with_hard_timeout` for the requirements on `func`.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        _, _, timeout_value = args
+        return call_with_hard_timeout(partial(_call_wrapped, wrapper), *args, seconds=timeout_value, **kwargs)
+    return wrapper
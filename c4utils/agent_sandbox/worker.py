@@ -0,0 +1,66 @@
+"""
+Long-lived agent worker.
+
+Started once inside the sandbox (`python3 -m c4utils.agent_sandbox.worker`), it imports
+the agent a single time and then answers move requests read from stdin until stdin is
+closed. Messages use the binary format from `c4utils.agent_sandbox.protocol`.
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+import traceback
+from typing import BinaryIO, Optional
+
+from ..c4_types import AgentFunction
+from .protocol import (Request, read_request, encode_reply, write_error,
+                       STATUS_OK, STATUS_READY, MOVE_REQUEST, PING_REQUEST)
+
+
+def handle_request(generate_move: AgentFunction, request: Request, replies: BinaryIO):
+    try:
+        if request.kind == PING_REQUEST:
+            replies.write(encode_reply(request.request_id, STATUS_OK))
+            replies.flush()
+            return
+        if request.kind != MOVE_REQUEST:
+            raise ValueError(f"Unknown request kind: {request.kind}")
+        start_time = time.perf_counter()
+        move = generate_move(request.board, request.player, request.timeout)
+        elapsed = time.perf_counter() - start_time
+        replies.write(encode_reply(request.request_id, STATUS_OK, int(move), elapsed))
+        replies.flush()
+    except Exception as e:
+        write_error(replies, request.request_id, str(e), traceback.format_exc())
+
+
+def serve(generate_move: AgentFunction, requests: BinaryIO, replies: BinaryIO):
+    while (request := read_request(requests)) is not None:
+        handle_request(generate_move, request, replies)
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module', default='agent', help="Module exposing the agent function")
+    parser.add_argument('--function', default='generate_move', help="Name of the agent function")
+    args = parser.parse_args(argv)
+
+    # Keep the protocol channel to ourselves: anything the agent prints goes to stderr
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = sys.stdin.buffer
+
+    try:
+        generate_move = getattr(importlib.import_module(args.module), args.function)
+    except Exception as e:
+        write_error(replies, 0, str(e), traceback.format_exc())
+        sys.exit(1)
+    replies.write(encode_reply(0, STATUS_READY))
+    replies.flush()
+    serve(generate_move, requests, replies)
+
+
+if __name__ == '__main__':
+    main()
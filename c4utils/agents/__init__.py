@@ -0,0 +1 @@
+"""Reference agents implementing the `AgentFunction` contract (`generate_move(board, player, timeout)`)."""
@@ -0,0 +1,273 @@
+"""
+Monte Carlo tree search reference agent.
+
+UCT on bitboards. Every round selects `batch_leaves` leaves (spread out with virtual
+losses), and plays `rollouts_per_leaf` random games from each of them. All playouts of
+a round advance together as numpy uint64 bitboard arrays, one vectorized step per ply,
+instead of one Python loop per playout.
+
+With `processes > 1` the agent uses root parallelism: independent trees with different
+seeds are searched in worker processes and their root visit counts summed.
+
+`MCTSAgent` instances are `AgentFunction`s; statistics of the last search, including
+the playout throughput, are in `last_result`. To compare hardware and numpy builds:
+
+    python -m c4utils.agents.mcts --seconds 5 --batch-size 4096
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+import argparse
+import math
+import time
+import numpy as np
+
+from ..c4_types import Board, Player, Move, PLAYER1
+from .. import bitboard
+from ..bitboard import BOTTOM_ROW, FULL_BOARD, COLUMN_MASKS, COLUMNS
+from .solver import winning_cells
+
+DEFAULT_EXPLORATION = math.sqrt(2)
+DEFAULT_BATCH_LEAVES = 16
+DEFAULT_ROLLOUTS_PER_LEAF = 16
+# Share of the timeout the search may use; the rest covers returning the move
+TIME_FRACTION = 0.8
+TIME_MARGIN = 0.01
+
+_BOTTOM_ROW = np.uint64(BOTTOM_ROW)
+_FULL_BOARD = np.uint64(FULL_BOARD)
+_COLUMN_MASKS = np.array(COLUMN_MASKS, dtype=np.uint64)
+
+
+def random_playouts(current: np.ndarray, mask: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Plays uniformly random games from a batch of positions, given as uint64 arrays of
+    the stones of the player to move and of all stones. Returns +1 where the player to
+    move at the start won, -1 where they lost and 0 for draws.
+    """
+    results = np.zeros(len(current), dtype=np.int8)
+    indices = np.arange(len(current))
+    current, mask = current.copy(), mask.copy()
+    ply = 0
+    while len(indices):
+        possible = (mask + _BOTTOM_ROW) & _FULL_BOARD
+        is_open = (possible[:, None] & _COLUMN_MASKS[None, :]) != 0
+        keys = rng.random(is_open.shape)
+        keys[~is_open] = -1.0
+        move = possible & _COLUMN_MASKS[np.argmax(keys, axis=1)]
+        current |= move
+        mask |= move
+        won = bitboard.has_four_batch(current)
+        results[indices[won]] = 1 if ply % 2 == 0 else -1
+        ongoing = ~won & (mask != _FULL_BOARD)
+        # The opponent moves next
+        current, mask, indices = (current ^ mask)[ongoing], mask[ongoing], indices[ongoing]
+        ply += 1
+    return results
+
+
+class Node:
+    __slots__ = ('current', 'mask', 'parent', 'move', 'children', 'untried', 'visits', 'virtual', 'value',
+                 'terminal_value')
+
+    def __init__(self, current: int, mask: int, parent: Optional['Node'] = None, move: int = -1,
+                 terminal_value: Optional[int] = None):
+        self.current = current
+        self.mask = mask
+        self.parent = parent
+        self.move = move
+        self.children: list['Node'] = []
+        possible = (mask + BOTTOM_ROW) & FULL_BOARD
+        self.untried = [] if terminal_value is not None else [
+            col for col in range(COLUMNS) if possible & COLUMN_MASKS[col]]
+        self.visits = 0
+        self.virtual = 0
+        # Sum of results for the player who made `move`
+        self.value = 0.0
+        # Result for the player to move, if the game is over
+        self.terminal_value = terminal_value
+
+    def expand(self, rng: np.random.Generator) -> 'Node':
+        col = self.untried.pop(rng.integers(len(self.untried)))
+        move = ((self.mask + BOTTOM_ROW) & FULL_BOARD) & COLUMN_MASKS[col]
+        stones = self.current | move
+        mask = self.mask | move
+        if bitboard.has_four(stones):
+            terminal_value = -1
+        elif mask == FULL_BOARD:
+            terminal_value = 0
+        else:
+            terminal_value = None
+        child = Node(stones ^ mask, mask, self, col, terminal_value)
+        self.children.append(child)
+        return child
+
+    def select_child(self, exploration: float) -> 'Node':
+        log_visits = math.log(self.visits + self.virtual)
+        best, best_score = None, -math.inf
+        for child in self.children:
+            visits = child.visits + child.virtual
+            score = child.value / visits + exploration * math.sqrt(log_visits / visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+
+@dataclass(frozen=True)
+class MCTSResult:
+    move: Move
+    # Root visit counts per column
+    visits: np.ndarray
+    playouts: int
+    elapsed: float
+
+    @property
+    def playouts_per_second(self) -> float:
+        return self.playouts / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def search(current: int, mask: int, time_limit: float, exploration: float = DEFAULT_EXPLORATION,
+           batch_leaves: int = DEFAULT_BATCH_LEAVES, rollouts_per_leaf: int = DEFAULT_ROLLOUTS_PER_LEAF,
+           seed: Optional[int] = None) -> tuple[np.ndarray, int]:
+    """Searches one tree for `time_limit` seconds, returns the root visit counts and the number of playouts."""
+    deadline = time.perf_counter() + time_limit
+    rng = np.random.default_rng(seed)
+    root = Node(current, mask)
+    playouts = rounds = 0
+    # At least one round, so every call returns a usable move
+    while rounds == 0 or time.perf_counter() < deadline:
+        rounds += 1
+        leaves = []
+        for _ in range(batch_leaves):
+            node = root
+            while not node.untried and node.children:
+                node = node.select_child(exploration)
+                node.virtual += 1
+            if node.untried:
+                node = node.expand(rng)
+                node.virtual += 1
+            leaves.append(node)
+            root.virtual += 1
+
+        open_leaves = [leaf for leaf in leaves if leaf.terminal_value is None]
+        if open_leaves:
+            currents = np.repeat(np.array([leaf.current for leaf in open_leaves], dtype=np.uint64),
+                                 rollouts_per_leaf)
+            masks = np.repeat(np.array([leaf.mask for leaf in open_leaves], dtype=np.uint64), rollouts_per_leaf)
+            results = random_playouts(currents, masks, rng).reshape(len(open_leaves), rollouts_per_leaf)
+            totals = dict(zip(map(id, open_leaves), results.sum(axis=1).tolist()))
+            playouts += results.size
+
+        for leaf in leaves:
+            if leaf.terminal_value is None:
+                count, total = rollouts_per_leaf, totals[id(leaf)]
+            else:
+                count, total = rollouts_per_leaf, rollouts_per_leaf * leaf.terminal_value
+            # Results are for the player to move at the leaf, values for the player who moved into it
+            value = -total
+            node = leaf
+            while node is not None:
+                node.virtual = 0
+                node.visits += count
+                node.value += value
+                value = -value
+                node = node.parent
+        if not root.untried and not root.children:
+            break
+
+    visits = np.zeros(COLUMNS, dtype=np.int64)
+    for child in root.children:
+        visits[child.move] = child.visits
+    return visits, playouts
+
+
+def _search_worker(args: tuple) -> tuple[np.ndarray, int]:
+    return search(*args)
+
+
+class MCTSAgent:
+    """
+    MCTS agent function, see the module docstring. With `processes > 1`, worker
+    processes are started on first use and kept until `close()`.
+    """
+
+    def __init__(self, exploration: float = DEFAULT_EXPLORATION, batch_leaves: int = DEFAULT_BATCH_LEAVES,
+                 rollouts_per_leaf: int = DEFAULT_ROLLOUTS_PER_LEAF, processes: int = 1,
+                 seed: Optional[int] = None):
+        self.exploration = exploration
+        self.batch_leaves = batch_leaves
+        self.rollouts_per_leaf = rollouts_per_leaf
+        self.processes = processes
+        self._seeds = np.random.SeedSequence(seed)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.last_result: Optional[MCTSResult] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def search(self, current: int, mask: int, time_limit: float) -> MCTSResult:
+        start_time = time.perf_counter()
+        possible = (mask + BOTTOM_ROW) & FULL_BOARD
+        wins = possible & winning_cells(current, mask)
+        if wins:
+            col = next(col for col in range(COLUMNS) if wins & COLUMN_MASKS[col])
+            visits = np.zeros(COLUMNS, dtype=np.int64)
+            visits[col] = 1
+            self.last_result = MCTSResult(Move(col), visits, 0, time.perf_counter() - start_time)
+            return self.last_result
+
+        seeds = [int(s.generate_state(1)[0]) for s in self._seeds.spawn(self.processes)]
+        jobs = [(current, mask, time_limit, self.exploration, self.batch_leaves, self.rollouts_per_leaf, seed)
+                for seed in seeds]
+        if self.processes == 1:
+            outcomes = [search(*jobs[0])]
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            outcomes = list(self._executor.map(_search_worker, jobs))
+        visits = sum(visits for visits, _ in outcomes)
+        playouts = sum(playouts for _, playouts in outcomes)
+        self.last_result = MCTSResult(Move(np.argmax(visits)), visits, playouts, time.perf_counter() - start_time)
+        return self.last_result
+
+    def __call__(self, board: Board, player: Player, timeout: float) -> Move:
+        player_1, player_2 = bitboard.from_board(board)
+        current = player_1 if player == PLAYER1 else player_2
+        time_limit = max(0.0, timeout * TIME_FRACTION - TIME_MARGIN)
+        return self.search(current, player_1 | player_2, time_limit).move
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+generate_move = MCTSAgent()
+
+
+def playout_throughput(batch_size: int = 4096, seconds: float = 2.0, seed: Optional[int] = None) -> float:
+    """Random playouts per second from the empty board, in batches of `batch_size`."""
+    rng = np.random.default_rng(seed)
+    empty = np.zeros(batch_size, dtype=np.uint64)
+    playouts = 0
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < seconds:
+        random_playouts(empty, empty, rng)
+        playouts += batch_size
+    return playouts / (time.perf_counter() - start_time)
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Measures the random playout throughput")
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--batch-size', type=int, default=4096)
+    args = parser.parse_args(argv)
+    print(f"numpy {np.__version__}: {playout_throughput(args.batch_size, args.seconds):,.0f} playouts/s "
+          f"(batch size {args.batch_size})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+Reference alpha-beta agent.
+
+Negamax with alpha-beta pruning on bitboards, a fixed-size transposition table, move
+ordering (transposition table move, then moves creating the most threats, center
+columns first) and iterative deepening. Moves that hand the opponent an immediate win
+are never searched, and positions where the opponent has two open threats are scored
+as lost right away, which is what makes endgames solvable.
+
+Scores are from the point of view of the player to move: `WIN_SCORE` plus the number of
+empty cells left when the game is won (faster wins score higher), the negation for
+losses, 0 for draws, and a small threat-count heuristic at the search horizon.
+
+`generate_move` follows the `AgentFunction` contract: it deepens until `timeout` (minus
+a safety margin) is nearly used up, then returns the best move of the deepest completed
+iteration. The search is CPU bound pure Python, so it also serves as a benchmark workload.
+Every thread calling `generate_move` gets its own `Solver` (and transposition table),
+so concurrent games in one process do not share deadlines or table entries.
+"""
+from dataclasses import dataclass
+from typing import Optional
+import gc
+import math
+import threading
+import time
+
+from ..c4_types import Board, Player, Move, PLAYER1
+from .. import bitboard
+from ..bitboard import BOTTOM_ROW, FULL_BOARD, COLUMN_BITS, COLUMN_MASKS, COLUMNS, ROWS
+
+SIZE = ROWS * COLUMNS
+WIN_SCORE = 1000
+CENTER_FIRST = tuple(sorted(range(COLUMNS), key=lambda col: abs(col - COLUMNS // 2)))
+DEFAULT_TABLE_SIZE = (1 << 20) + 7
+# Share of the timeout the search may use; the rest covers returning the move
+TIME_FRACTION = 0.8
+TIME_MARGIN = 0.01
+# The clock is checked every TIME_CHECK_INTERVAL nodes
+TIME_CHECK_INTERVAL = 1024
+
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    move: Move
+    score: int
+    depth: int
+    nodes: int
+    elapsed: float
+    # True if the score is the game-theoretic value of the position
+    solved: bool
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def winning_cells(stones: int, mask: int) -> int:
+    """Empty cells that would complete four in a row for `stones`."""
+    # Vertical: only three stones directly below
+    cells = (stones << 1) & (stones << 2) & (stones << 3)
+    for shift in (COLUMN_BITS, COLUMN_BITS - 1, COLUMN_BITS + 1):
+        pair = (stones << shift) & (stones << 2 * shift)
+        cells |= pair & (stones << 3 * shift)
+        cells |= pair & (stones >> shift)
+        pair = (stones >> shift) & (stones >> 2 * shift)
+        cells |= pair & (stones << shift)
+        cells |= pair & (stones >> 3 * shift)
+    return cells & (FULL_BOARD ^ mask)
+
+
+def is_decisive(score: int) -> bool:
+    return abs(score) >= WIN_SCORE
+
+
+class Solver:
+    """
+    Alpha-beta searcher. The transposition table is kept between searches, so one
+    instance should be reused for all moves of a game.
+    """
+
+    def __init__(self, table_size: int = DEFAULT_TABLE_SIZE):
+        self.table_size = table_size
+        self._keys: list[int] = [0] * table_size
+        # (depth, bound, score, best column)
+        self._entries: list[Optional[tuple[int, int, int, int]]] = [None] * table_size
+        self.nodes = 0
+        self._deadline = math.inf
+
+    def clear(self):
+        self._keys = [0] * self.table_size
+        self._entries = [None] * self.table_size
+
+    def _ordered_moves(self, current: int, mask: int, candidates: int, first: int) -> list[tuple[int, int]]:
+        moves = []
+        for col in CENTER_FIRST:
+            move = candidates & COLUMN_MASKS[col]
+            if move:
+                if col == first:
+                    priority = SIZE
+                else:
+                    priority = winning_cells(current | move, mask | move).bit_count()
+                moves.append((priority, col, move))
+        # sort is stable, so equally good moves stay in center-first order
+        moves.sort(key=lambda m: -m[0])
+        return [(col, move) for _, col, move in moves]
+
+    def _negamax(self, current: int, mask: int, moves: int, depth: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if not self.nodes % TIME_CHECK_INTERVAL and time.perf_counter() > self._deadline:
+            raise _SearchTimeout()
+        possible = (mask + BOTTOM_ROW) & FULL_BOARD
+        own_wins = winning_cells(current, mask)
+        if possible & own_wins:
+            return WIN_SCORE + SIZE - moves
+        if not possible:
+            return 0
+        opponent = current ^ mask
+        opponent_wins = winning_cells(opponent, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                # Two threats at once, only one can be blocked
+                return -(WIN_SCORE + SIZE - moves - 1)
+            possible = forced
+        # Never play directly below an opponent threat
+        candidates = possible & ~(opponent_wins >> 1)
+        if not candidates:
+            return -(WIN_SCORE + SIZE - moves - 1)
+        if depth == 0:
+            return own_wins.bit_count() - opponent_wins.bit_count()
+
+        key = current + mask
+        index = key % self.table_size
+        table_move = -1
+        if self._keys[index] == key:
+            entry_depth, bound, score, table_move = self._entries[index]
+            if entry_depth >= depth or is_decisive(score):
+                if bound == EXACT:
+                    return score
+                if bound == LOWER_BOUND:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        original_alpha = alpha
+        best_score, best_col = -math.inf, -1
+        for col, move in self._ordered_moves(current, mask, candidates, table_move):
+            score = -self._negamax(opponent, mask | move, moves + 1, depth - 1, -beta, -alpha)
+            if score > best_score:
+                best_score, best_col = score, col
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self._keys[index] = key
+        self._entries[index] = (depth, bound, best_score, best_col)
+        return best_score
+
+    def _search_root(self, current: int, mask: int, moves: int, depth: int, first: int) -> tuple[int, int]:
+        possible = (mask + BOTTOM_ROW) & FULL_BOARD
+        opponent_wins = winning_cells(current ^ mask, mask)
+        # Prefer moves that do not lose at once; if all do, any move will have to do
+        candidates = (possible & ~(opponent_wins >> 1)) or possible
+        if possible & opponent_wins:
+            candidates = possible & opponent_wins
+        alpha, beta = -math.inf, math.inf
+        best_score, best_col = -math.inf, -1
+        for col, move in self._ordered_moves(current, mask, candidates, first):
+            score = -self._negamax(current ^ mask, mask | move, moves + 1, depth - 1, -beta, -alpha)
+            if score > best_score:
+                best_score, best_col = score, col
+                alpha = max(alpha, score)
+        return best_col, best_score
+
+    def search(self, current: int, mask: int, time_limit: float = math.inf,
+               max_depth: Optional[int] = None) -> SearchResult:
+        """
+        Iteratively deepens from the position given by the stones of the player to move
+        (`current`) and all stones (`mask`) until the position is solved, `max_depth`
+        is reached or `time_limit` seconds have passed.
+        """
+        start_time = time.perf_counter()
+        self._deadline = start_time + time_limit
+        self.nodes = 0
+        moves = mask.bit_count()
+        remaining = SIZE - moves
+        if remaining == 0:
+            raise ValueError("The board is full")
+        possible = (mask + BOTTOM_ROW) & FULL_BOARD
+        wins = possible & winning_cells(current, mask)
+        if wins:
+            col = next(col for col in range(COLUMNS) if wins & COLUMN_MASKS[col])
+            return SearchResult(Move(col), WIN_SCORE + remaining, 1, 1, time.perf_counter() - start_time, True)
+
+        max_depth = remaining if max_depth is None else min(max_depth, remaining)
+        best_col = next(col for col in CENTER_FIRST if possible & COLUMN_MASKS[col])
+        best_score, completed_depth = 0, 0
+        try:
+            for depth in range(1, max_depth + 1):
+                best_col, best_score = self._search_root(current, mask, moves, depth, best_col)
+                completed_depth = depth
+                if is_decisive(best_score):
+                    break
+        except _SearchTimeout:
+            pass
+        solved = is_decisive(best_score) or completed_depth == remaining
+        return SearchResult(Move(best_col), best_score, completed_depth, self.nodes,
+                            time.perf_counter() - start_time, solved)
+
+    def search_board(self, board: Board, player: Player, time_limit: float = math.inf,
+                     max_depth: Optional[int] = None) -> SearchResult:
+        player_1, player_2 = bitboard.from_board(board)
+        current = player_1 if player == PLAYER1 else player_2
+        return self.search(current, player_1 | player_2, time_limit, max_depth)
+
+
+def solve(board: Board, player: Player) -> SearchResult:
+    """Searches the position to the end of the game, without a time limit."""
+    return Solver().search_board(board, player)
+
+
+# Solvers keep per-search state, so each thread gets its own
+_thread_state = threading.local()
+
+
+def thread_solver() -> Solver:
+    """The calling thread's solver, kept between moves to reuse its transposition table."""
+    solver = getattr(_thread_state, 'solver', None)
+    if solver is None:
+        solver = _thread_state.solver = Solver()
+        # Promote the large tables to the oldest generation now, otherwise the young
+        # collections during the first search each spend milliseconds traversing them
+        gc.collect(1)
+    return solver
+
+
+def generate_move(board: Board, player: Player, timeout: float) -> Move:
+    """Best move found within `timeout` seconds, see the module docstring."""
+    start_time = time.perf_counter()
+    # The first move of a thread also allocates its transposition table
+    solver = thread_solver()
+    time_limit = max(0.0, timeout * TIME_FRACTION - TIME_MARGIN - (time.perf_counter() - start_time))
+    return solver.search_board(board, player, time_limit).move
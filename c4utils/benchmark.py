@@ -0,0 +1,247 @@
+"""
+Orchestrator overhead benchmarks.
+
+Measures sandbox start/stop latency, per-move round trip latency, move throughput at
+increasing concurrency and match throughput for every sandbox backend and transport,
+plus the overhead of per-call move deadlines, writes the results as JSON and compares
+them against a stored baseline:
+
+    python -m c4utils.benchmark --backend local --output results.json --baseline baseline.json
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import numpy as np
+
+from .c4_types import Board, Player, Move, BOARD_SIZE, PLAYER1
+from .match import _play_match
+from .agent_sandbox.agent_runner import (SandboxBackend, SandboxedAgent, get_generate_move_func_from_container,
+                                         get_generate_move_func_from_worker)
+from .agent_sandbox.local import LocalAgent
+from .agent_sandbox.timeout import timeout
+
+BACKENDS = ('apptainer', 'local')
+TRANSPORTS = ('exec', 'worker')
+DEFAULT_LOCAL_AGENT = Path(__file__).resolve().parents[1] / 'examples' / 'local_agents' / 'random'
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass(frozen=True)
+class BenchmarkConfig:
+    moves: int = 100
+    cycles: int = 3
+    max_concurrency: int = 4
+    matches: int = 5
+    move_timeout: float = 1.0
+
+
+@dataclass(frozen=True)
+class Regression:
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self) -> str:
+        return f"{self.metric}: {self.current:.6g} (baseline {self.baseline:.6g})"
+
+
+def sandbox_factory(backend: str, sif: Optional[Path] = None,
+                    agent_dir: Path = DEFAULT_LOCAL_AGENT) -> Callable[[], SandboxBackend]:
+    if backend == 'apptainer':
+        if sif is None:
+            raise ValueError("The apptainer backend needs a SIF file")
+        return lambda: SandboxedAgent(sif)
+    if backend == 'local':
+        return lambda: LocalAgent(agent_dir)
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+@contextmanager
+def move_func(sandbox: SandboxBackend, transport: str) -> Iterator[Callable[[Board, Player, float], Move]]:
+    """Starts the sandbox and yields a move generation function using the given transport."""
+    with sandbox:
+        if transport == 'exec':
+            yield get_generate_move_func_from_container(sandbox)
+        elif transport == 'worker':
+            with sandbox.start_worker() as worker:
+                yield get_generate_move_func_from_worker(worker)
+        else:
+            raise ValueError(f"Unknown transport: {transport}")
+
+
+def latency_summary(durations: list[float]) -> dict[str, float]:
+    summary = {f'p{p}': float(np.percentile(durations, p)) for p in PERCENTILES}
+    summary['mean'] = float(np.mean(durations))
+    return summary
+
+
+def time_moves(generate_move: Callable[[Board, Player, float], Move], count: int, timeout: float) -> list[float]:
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+    durations = []
+    for _ in range(count):
+        start_time = time.perf_counter()
+        generate_move(board, PLAYER1, timeout)
+        durations.append(time.perf_counter() - start_time)
+    return durations
+
+
+def bench_start_stop(make_sandbox: Callable[[], SandboxBackend], cycles: int) -> dict[str, float]:
+    starts, stops = [], []
+    for _ in range(cycles):
+        sandbox = make_sandbox()
+        start_time = time.perf_counter()
+        sandbox.start()
+        starts.append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        sandbox.cleanup()
+        stops.append(time.perf_counter() - start_time)
+    return {'start_seconds': float(np.median(starts)), 'stop_seconds': float(np.median(stops))}
+
+
+def bench_move_latency(make_sandbox: Callable[[], SandboxBackend], transport: str,
+                       config: BenchmarkConfig) -> dict[str, float]:
+    with move_func(make_sandbox(), transport) as generate_move:
+        # The first move may pay for lazy imports and caches
+        generate_move(np.zeros(BOARD_SIZE, dtype=Player), PLAYER1, config.move_timeout)
+        return latency_summary(time_moves(generate_move, config.moves, config.move_timeout))
+
+
+def bench_throughput(make_sandbox: Callable[[], SandboxBackend], transport: str,
+                     config: BenchmarkConfig) -> dict[str, float]:
+    """Moves per second with 1, 2, 4, ... concurrent agents, each driven by its own thread."""
+    throughput = {}
+    concurrency = 1
+    while concurrency <= config.max_concurrency:
+        def run_agent(_):
+            with move_func(make_sandbox(), transport) as generate_move:
+                return time_moves(generate_move, config.moves, config.move_timeout)
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(run_agent, range(concurrency)))
+        # Includes sandbox start and stop, as in a real tournament without pooling
+        throughput[str(concurrency)] = concurrency * config.moves / (time.perf_counter() - start_time)
+        concurrency *= 2
+    return throughput
+
+
+def bench_matches(make_sandbox: Callable[[], SandboxBackend], transport: str,
+                  config: BenchmarkConfig) -> dict[str, float]:
+    start_time = time.perf_counter()
+    total_moves = 0
+    for _ in range(config.matches):
+        with move_func(make_sandbox(), transport) as player_1, move_func(make_sandbox(), transport) as player_2:
+            _, moves, error = _play_match(player_1, player_2, move_timeout=config.move_timeout)
+            if error is not None:
+                raise error
+            total_moves += len(moves)
+    elapsed = time.perf_counter() - start_time
+    return {'matches_per_second': config.matches / elapsed, 'moves_per_second': total_moves / elapsed}
+
+
+def bench_timeout_overhead(calls: int = 10000) -> dict[str, float]:
+    """Cost of entering and leaving a `timeout` block that does not expire, per call."""
+    start_time = time.perf_counter()
+    for _ in range(calls):
+        with timeout(60):
+            pass
+    return {'overhead_seconds': (time.perf_counter() - start_time) / calls}
+
+
+def run_benchmarks(backends: dict[str, Callable[[], SandboxBackend]], transports: tuple[str, ...] = TRANSPORTS,
+                   config: BenchmarkConfig = BenchmarkConfig()) -> dict:
+    results = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'config': config.__dict__,
+        },
+        'results': {'timeout': bench_timeout_overhead()},
+    }
+    for backend, make_sandbox in backends.items():
+        results['results'][f'{backend}/start_stop'] = bench_start_stop(make_sandbox, config.cycles)
+        for transport in transports:
+            results['results'][f'{backend}/{transport}'] = {
+                'move_latency_seconds': bench_move_latency(make_sandbox, transport, config),
+                'moves_per_second_by_concurrency': bench_throughput(make_sandbox, transport, config),
+                'matches': bench_matches(make_sandbox, transport, config),
+            }
+    return results
+
+
+def flatten(results: dict, prefix: str = '') -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}/{key}' if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        else:
+            flat[name] = value
+    return flat
+
+
+def higher_is_better(metric: str) -> bool:
+    return 'per_second' in metric
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.2) -> list[Regression]:
+    """Metrics that got worse than the baseline by more than `tolerance` (relative)."""
+    current, previous = flatten(results['results']), flatten(baseline['results'])
+    regressions = []
+    for metric in sorted(current.keys() & previous.keys()):
+        if higher_is_better(metric):
+            regressed = current[metric] < previous[metric] * (1 - tolerance)
+        else:
+            regressed = current[metric] > previous[metric] * (1 + tolerance)
+        if regressed:
+            regressions.append(Regression(metric, previous[metric], current[metric]))
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', action='append', choices=BACKENDS,
+                        help="Backend to benchmark, can be repeated (default: local)")
+    parser.add_argument('--transport', action='append', choices=TRANSPORTS,
+                        help="Transport to benchmark, can be repeated (default: all)")
+    parser.add_argument('--sif', type=Path, help="SIF file for the apptainer backend")
+    parser.add_argument('--agent-dir', type=Path, default=DEFAULT_LOCAL_AGENT,
+                        help="Agent directory for the local backend")
+    parser.add_argument('--moves', type=int, default=BenchmarkConfig.moves)
+    parser.add_argument('--cycles', type=int, default=BenchmarkConfig.cycles)
+    parser.add_argument('--max-concurrency', type=int, default=BenchmarkConfig.max_concurrency)
+    parser.add_argument('--matches', type=int, default=BenchmarkConfig.matches)
+    parser.add_argument('--output', type=Path, help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', type=Path, help="Compare against results stored in this file")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    backends = {backend: sandbox_factory(backend, args.sif, args.agent_dir) for backend in args.backend or ['local']}
+    config = BenchmarkConfig(moves=args.moves, cycles=args.cycles,
+                             max_concurrency=args.max_concurrency, matches=args.matches)
+    results = run_benchmarks(backends, tuple(args.transport or TRANSPORTS), config)
+
+    output = json.dumps(results, indent=2)
+    if args.output is not None:
+        args.output.write_text(output)
+    else:
+        print(output)
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import numpy as np
+from .c4_types import Board, Player, Move, BOARD_SIZE, NO_PLAYER, PLAYER1, PLAYER2
+
+# A position is a pair of integers (player 1 stones, player 2 stones). Each column
+# takes COLUMN_BITS consecutive bits, bottom row first, with one spare sentinel bit
+# on top so that shifts never wrap from one column into the next:
+#
+#   6 13 20 27 34 41 48   <- sentinel row
+#   5 12 19 26 33 40 47
+#   ...
+#   0  7 14 21 28 35 42   <- row 0
+Bitboards = tuple[int, int]
+
+ROWS, COLUMNS = BOARD_SIZE
+COLUMN_BITS = ROWS + 1
+BOTTOM_ROW = sum(1 << (col * COLUMN_BITS) for col in range(COLUMNS))
+FULL_BOARD = BOTTOM_ROW * ((1 << ROWS) - 1)
+TOP_CELLS = tuple(1 << (col * COLUMN_BITS + ROWS - 1) for col in range(COLUMNS))
+COLUMN_MASKS = tuple(((1 << ROWS) - 1) << (col * COLUMN_BITS) for col in range(COLUMNS))
+# Vertical, horizontal and the two diagonal directions
+DIRECTION_SHIFTS = (1, COLUMN_BITS, COLUMN_BITS - 1, COLUMN_BITS + 1)
+
+EMPTY_POSITION: Bitboards = (0, 0)
+
+_CELL_WEIGHTS = np.zeros(BOARD_SIZE, dtype=np.uint64)
+for _row in range(ROWS):
+    for _col in range(COLUMNS):
+        _CELL_WEIGHTS[_row, _col] = 1 << (_col * COLUMN_BITS + _row)
+
+
+def cell_bit(row: int, col: int) -> int:
+    return 1 << (col * COLUMN_BITS + row)
+
+
+def bits_from_mask(mask: np.ndarray) -> int:
+    """Packs a boolean 6x7 mask into a single bitboard integer."""
+    return int(np.bitwise_or.reduce(_CELL_WEIGHTS[mask], initial=np.uint64(0)))
+
+
+def from_board(board: Board) -> Bitboards:
+    """Converts a 6x7 numpy board into a (player 1, player 2) bitboard pair."""
+    return bits_from_mask(board == PLAYER1), bits_from_mask(board == PLAYER2)
+
+
+def to_board(position: Bitboards) -> Board:
+    """Converts a (player 1, player 2) bitboard pair back into a 6x7 numpy board."""
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+    for player, bits in zip((PLAYER1, PLAYER2), position):
+        board[(_CELL_WEIGHTS & np.uint64(bits)) != 0] = player
+    return board
+
+
+def occupied(position: Bitboards) -> int:
+    return position[0] | position[1]
+
+
+def move_count(position: Bitboards) -> int:
+    return occupied(position).bit_count()
+
+
+def player_to_move(position: Bitboards) -> Player:
+    return PLAYER1 if move_count(position) % 2 == 0 else PLAYER2
+
+
+def lowest_open_cell(position: Bitboards, move: int) -> int:
+    """Returns the bit of the lowest empty cell in the column (0 if the column is full)."""
+    move = int(move)
+    column = occupied(position) & COLUMN_MASKS[move]
+    return (column + (1 << (move * COLUMN_BITS))) & COLUMN_MASKS[move]
+
+
+def apply_move(position: Bitboards, move: Move, player: Player) -> Bitboards:
+    cell = lowest_open_cell(position, move)
+    if not cell:
+        raise ValueError(f"Column {move} is full.")
+    if player == PLAYER1:
+        return position[0] | cell, position[1]
+    return position[0], position[1] | cell
+
+
+def is_valid_move(position: Bitboards, move: Move, player: Player) -> bool:
+    if not isinstance(move, Move):
+        return False
+    if not 0 <= move < COLUMNS:
+        return False
+    if occupied(position) & TOP_CELLS[move]:
+        return False
+    return player == player_to_move(position)
+
+
+def has_four(bits: int) -> bool:
+    """Checks whether a single player's bitboard contains four in a row."""
+    for shift in DIRECTION_SHIFTS:
+        pairs = bits & (bits >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+def check_win(position: Bitboards, player: Player) -> bool:
+    return has_four(position[0] if player == PLAYER1 else position[1])
+
+
+def check_winner(position: Bitboards) -> Player | None:
+    if has_four(position[0]):
+        return PLAYER1
+    elif has_four(position[1]):
+        return PLAYER2
+    elif occupied(position) == FULL_BOARD:
+        return NO_PLAYER
+    else:
+        return None
+
+
+def mirror(bits: int) -> int:
+    """Mirrors a single bitboard left to right."""
+    column_mask = (1 << COLUMN_BITS) - 1
+    mirrored = 0
+    for col in range(COLUMNS):
+        mirrored |= ((bits >> (col * COLUMN_BITS)) & column_mask) << ((COLUMNS - 1 - col) * COLUMN_BITS)
+    return mirrored
+
+
+def mirror_position(position: Bitboards) -> Bitboards:
+    return mirror(position[0]), mirror(position[1])
+
+
+def position_key(position: Bitboards) -> int:
+    """
+    Unique 49-bit key of a position. Adding the bottom row to the occupied cells marks
+    the lowest empty cell of every column, so the occupancy can be recovered from the
+    key, and with it player 2's stones.
+    """
+    return position[0] + occupied(position) + BOTTOM_ROW
+
+
+def canonical_key(position: Bitboards) -> int:
+    """Key shared by a position and its mirror image, the smaller of both keys."""
+    return min(position_key(position), position_key(mirror_position(position)))
+
+
+# Batched versions operating on numpy uint64 arrays of bitboards
+_DIRECTION_SHIFTS_U64 = tuple((np.uint64(shift), np.uint64(2 * shift)) for shift in DIRECTION_SHIFTS)
+
+
+def from_boards(boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Converts a stack of 6x7 boards into arrays of player 1 and player 2 bitboards."""
+    boards = np.asarray(boards)
+    weights = _CELL_WEIGHTS[None]
+    return (np.bitwise_or.reduce(np.where(boards == PLAYER1, weights, 0), axis=(1, 2)),
+            np.bitwise_or.reduce(np.where(boards == PLAYER2, weights, 0), axis=(1, 2)))
+
+
+def has_four_batch(stones: np.ndarray) -> np.ndarray:
+    """`has_four` for an array of uint64 bitboards."""
+    result = np.zeros(stones.shape, dtype=bool)
+    for shift, double_shift in _DIRECTION_SHIFTS_U64:
+        pairs = stones & (stones >> shift)
+        result |= (pairs & (pairs >> double_shift)) != 0
+    return result
@@ -0,0 +1,172 @@
+"""
+Memory-mapped opening book / solved position database.
+
+A book file is a small header followed by fixed-width records sorted by canonical
+position key (see `bitboard.canonical_key`), each storing the position's value and best
+move. Lookups binary search the memory-mapped file, so opening a book costs nothing
+and all processes using the same book share its pages through the page cache.
+
+Books are built from solver output with one position per line, as
+`<moves> <score> [<best move>]`, where moves are 1-indexed column digits played from
+the empty board (e.g. `4453 -2 3`, or `- 1 4` for the empty board itself):
+
+    python -m c4utils.book solver_output.txt openings.book
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO
+import argparse
+import mmap
+import struct
+
+from .c4_types import Board, Move, PLAYER1, PLAYER2
+from . import bitboard
+from .bitboard import Bitboards, COLUMNS
+
+MAGIC = b'C4BOOK01'
+# magic, number of records
+HEADER = struct.Struct('<8sQ')
+# canonical key, value, best move (-1 if unknown)
+RECORD = struct.Struct('<Qbb')
+NO_MOVE = -1
+
+
+@dataclass(frozen=True)
+class BookEntry:
+    """Value of a position for the player to move, and the best move (-1 if unknown)"""
+    value: int
+    best_move: Move
+
+
+def mirror_move(move: int) -> int:
+    return move if move == NO_MOVE else COLUMNS - 1 - move
+
+
+def canonical_entry(position: Bitboards, value: int, best_move: int) -> tuple[int, int, int]:
+    """Record of a position, with the best move mirrored if the canonical key is the mirror image's."""
+    key = bitboard.position_key(position)
+    mirrored_key = bitboard.position_key(bitboard.mirror_position(position))
+    if mirrored_key < key:
+        return mirrored_key, value, mirror_move(best_move)
+    return key, value, best_move
+
+
+class OpeningBook:
+    """
+    Read-only view of a book file.
+
+    Usage:
+        with OpeningBook("openings.book") as book:
+            entry = book.lookup_board(board)
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as file:
+            if self.path.stat().st_size < HEADER.size:
+                raise ValueError(f"{self.path} is not an opening book")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) != HEADER.size + self._count * RECORD.size:
+            self._map.close()
+            raise ValueError(f"{self.path} is not an opening book or is truncated")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, position: Bitboards) -> bool:
+        return self.lookup(position) is not None
+
+    def _find(self, key: int) -> Optional[tuple[int, int]]:
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, value, best_move = RECORD.unpack_from(self._map, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return value, best_move
+        return None
+
+    def lookup(self, position: Bitboards) -> Optional[BookEntry]:
+        key = bitboard.position_key(position)
+        mirrored_key = bitboard.position_key(bitboard.mirror_position(position))
+        record = self._find(min(key, mirrored_key))
+        if record is None:
+            return None
+        value, best_move = record
+        if mirrored_key < key:
+            best_move = mirror_move(best_move)
+        return BookEntry(value, Move(best_move))
+
+    def lookup_board(self, board: Board) -> Optional[BookEntry]:
+        return self.lookup(bitboard.from_board(board))
+
+    def close(self):
+        self._map.close()
+
+
+def write_book(records: Iterable[tuple[int, int, int]], path: Path) -> int:
+    """
+    Writes (canonical key, value, best move) records to a book file and returns the
+    number of records written. For duplicate keys the first record is kept.
+    """
+    unique: dict[int, tuple[int, int]] = {}
+    for key, value, best_move in records:
+        unique.setdefault(key, (value, best_move))
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(unique)))
+        for key in sorted(unique):
+            file.write(RECORD.pack(key, *unique[key]))
+    return len(unique)
+
+
+def position_from_moves(moves: str) -> Bitboards:
+    """Position reached by playing 1-indexed column digits from the empty board ('-' for none)."""
+    position = bitboard.EMPTY_POSITION
+    if moves == '-':
+        return position
+    for ply, digit in enumerate(moves):
+        if digit not in '1234567':
+            raise ValueError(f"Invalid move {digit!r} in {moves!r}")
+        position = bitboard.apply_move(position, Move(int(digit) - 1), PLAYER1 if ply % 2 == 0 else PLAYER2)
+    return position
+
+
+def parse_solver_output(lines: Iterable[str]) -> Iterator[tuple[int, int, int]]:
+    """Yields canonical book records from `<moves> <score> [<best move>]` lines."""
+    for line_number, line in enumerate(lines, 1):
+        fields = line.split()
+        if not fields:
+            continue
+        if len(fields) not in (2, 3):
+            raise ValueError(f"Line {line_number}: expected '<moves> <score> [<best move>]', got {line!r}")
+        moves, score = fields[0], int(fields[1])
+        best_move = int(fields[2]) - 1 if len(fields) == 3 else NO_MOVE
+        yield canonical_entry(position_from_moves(moves), score, best_move)
+
+
+def build_book(solver_output: TextIO, path: Path) -> int:
+    return write_book(parse_solver_output(solver_output), path)
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('solver_output', type=Path, help="Solver output, one position per line")
+    parser.add_argument('book', type=Path, help="Book file to write")
+    args = parser.parse_args(argv)
+    with open(args.solver_output) as solver_output:
+        count = build_book(solver_output, args.book)
+    print(f"Wrote {count} positions to {args.book}")
+
+
+if __name__ == '__main__':
+    main()
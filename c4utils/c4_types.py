@@ -11,6 +11,8 @@ BOARD_SIZE = (6, 7)
 PLAYER1 = Player(1)
 PLAYER2 = Player(2)
 NO_PLAYER = Player(0)
+# Marks undecided games in arrays of winners, where None cannot be stored
+NO_WINNER_YET = Player(-1)
 
 class MoveTimeoutError(Exception):
     """Raised when an agent takes too long to generate a move"""
@@ -18,4 +20,12 @@ class MoveTimeoutError(Exception):
 
 class AgentRuntimeError(Exception):
     """Raised when an agent encounters an error during move generation"""
-    pass
\ No newline at end of file
+    pass
+
+class AgentLoadError(AgentRuntimeError):
+    """Raised when the agent module cannot be imported, e.g. a broken submission"""
+    pass
+
+class InvalidMoveError(ValueError):
+    """Raised when an agent plays a move that is not legal in the current position"""
+    pass
@@ -0,0 +1,308 @@
+"""
+Compact binary game records.
+
+A game log file is laid out as
+
+    header   magic, length of the metadata, metadata as JSON (e.g. agent names)
+    blocks   block header (number of games, payload size, CRC32), then the games
+    index    offset and number of games of every block, followed by a fixed-size footer
+
+Each game takes an 8 byte header (winner, termination, number of moves, flags, agent
+ids), its moves packed two per byte, and optionally one float32 per move with the time
+the move took. A typical game takes ~20 bytes instead of a few hundred as JSON.
+
+The index is written when the writer is closed. Logs of writers that crashed have no
+index; readers then scan the blocks and stop at the first incomplete one, and writers
+opened with `append=True` continue after the last complete block.
+"""
+from dataclasses import dataclass
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional, Sequence
+import json
+import os
+import struct
+import zlib
+import numpy as np
+
+from .c4_types import Player, Move, MoveTimeoutError, InvalidMoveError, BOARD_SIZE
+
+MAGIC = b'C4GLOG01'
+FOOTER_MAGIC = b'C4GLEND1'
+# magic, metadata size
+FILE_HEADER = struct.Struct('<8sI')
+# number of games, payload size, CRC32 of the payload
+BLOCK_HEADER = struct.Struct('<III')
+# winner, termination, number of moves, flags, agent ids
+GAME_HEADER = struct.Struct('<bBBBHH')
+# block offset, number of games
+INDEX_ENTRY = struct.Struct('<QI')
+# index offset, number of blocks, magic
+FOOTER = struct.Struct('<QI8s')
+
+HAS_MOVE_TIMES = 1
+MAX_MOVES = BOARD_SIZE[0] * BOARD_SIZE[1]
+DEFAULT_BLOCK_SIZE = 1024
+
+
+class Termination(IntEnum):
+    """Why a game ended"""
+    NORMAL = 0
+    TIMEOUT = 1
+    INVALID_MOVE = 2
+    ERROR = 3
+
+
+def termination_from_error(error: Optional[Exception]) -> Termination:
+    """Termination reason of a game from the error returned by `_play_match`."""
+    if error is None:
+        return Termination.NORMAL
+    if isinstance(error, MoveTimeoutError):
+        return Termination.TIMEOUT
+    if isinstance(error, InvalidMoveError):
+        return Termination.INVALID_MOVE
+    return Termination.ERROR
+
+
+@dataclass(frozen=True)
+class GameRecord:
+    winner: Player
+    moves: np.ndarray
+    termination: Termination = Termination.NORMAL
+    agents: tuple[int, int] = (0, 1)
+    move_times: Optional[np.ndarray] = None
+
+
+def pack_moves(moves: np.ndarray) -> bytes:
+    """Packs moves into 4-bit nibbles, the first move of each pair in the low nibble."""
+    moves = np.asarray(moves, dtype=np.uint8)
+    if len(moves) % 2:
+        moves = np.append(moves, np.uint8(0))
+    return (moves[0::2] | (moves[1::2] << 4)).tobytes()
+
+
+def unpack_moves(data: bytes, count: int) -> np.ndarray:
+    packed = np.frombuffer(data, dtype=np.uint8)
+    moves = np.empty(2 * len(packed), dtype=Move)
+    moves[0::2] = packed & 0x0F
+    moves[1::2] = packed >> 4
+    return moves[:count]
+
+
+def encode_game(record: GameRecord) -> bytes:
+    moves = np.asarray(record.moves)
+    if len(moves) > MAX_MOVES:
+        raise ValueError(f"A game has at most {MAX_MOVES} moves, got {len(moves)}")
+    flags = 0 if record.move_times is None else HAS_MOVE_TIMES
+    data = GAME_HEADER.pack(int(record.winner), int(record.termination), len(moves), flags, *record.agents)
+    data += pack_moves(moves)
+    if record.move_times is not None:
+        if len(record.move_times) != len(moves):
+            raise ValueError(f"Got {len(record.move_times)} move times for {len(moves)} moves")
+        data += np.asarray(record.move_times, dtype='<f4').tobytes()
+    return data
+
+
+def decode_games(payload: bytes, count: int) -> Iterator[GameRecord]:
+    offset = 0
+    for _ in range(count):
+        winner, termination, n_moves, flags, agent_1, agent_2 = GAME_HEADER.unpack_from(payload, offset)
+        offset += GAME_HEADER.size
+        packed_size = (n_moves + 1) // 2
+        moves = unpack_moves(payload[offset:offset + packed_size], n_moves)
+        offset += packed_size
+        move_times = None
+        if flags & HAS_MOVE_TIMES:
+            move_times = np.frombuffer(payload, dtype='<f4', count=n_moves, offset=offset).astype(np.float32)
+            offset += 4 * n_moves
+        yield GameRecord(Player(winner), moves, Termination(termination), (agent_1, agent_2), move_times)
+
+
+def _read_header(file: BinaryIO) -> tuple[dict[str, Any], int]:
+    """Returns the metadata and the offset of the first block."""
+    header = file.read(FILE_HEADER.size)
+    if len(header) < FILE_HEADER.size:
+        raise ValueError("Not a game log: file too short")
+    magic, metadata_size = FILE_HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not a game log: wrong magic")
+    return json.loads(file.read(metadata_size)), FILE_HEADER.size + metadata_size
+
+
+def _read_index(file: BinaryIO, data_start: int) -> Optional[tuple[list[tuple[int, int]], int]]:
+    """Block index and end of the data from the footer, None if the log was not closed."""
+    size = file.seek(0, os.SEEK_END)
+    if size < data_start + FOOTER.size:
+        return None
+    file.seek(size - FOOTER.size)
+    index_offset, n_blocks, magic = FOOTER.unpack(file.read(FOOTER.size))
+    if magic != FOOTER_MAGIC or index_offset + n_blocks * INDEX_ENTRY.size + FOOTER.size != size:
+        return None
+    file.seek(index_offset)
+    data = file.read(n_blocks * INDEX_ENTRY.size)
+    return [INDEX_ENTRY.unpack_from(data, i * INDEX_ENTRY.size) for i in range(n_blocks)], index_offset
+
+
+def _scan_blocks(file: BinaryIO, data_start: int) -> tuple[list[tuple[int, int]], int]:
+    """Finds the complete blocks by walking the file, returns them and the end of the last one."""
+    blocks = []
+    offset = data_start
+    file.seek(offset)
+    while True:
+        header = file.read(BLOCK_HEADER.size)
+        if len(header) < BLOCK_HEADER.size:
+            break
+        count, payload_size, checksum = BLOCK_HEADER.unpack(header)
+        payload = file.read(payload_size)
+        if len(payload) < payload_size or zlib.crc32(payload) != checksum:
+            break
+        blocks.append((offset, count))
+        offset += BLOCK_HEADER.size + payload_size
+    return blocks, offset
+
+
+class GameLogWriter:
+    """
+    Appends games to a log file, buffering up to `block_size` games per block.
+
+    Usage:
+        with GameLogWriter("games.c4log", metadata={'agents': names}) as log:
+            winner, moves, error = _play_match(agent_1, agent_2)
+            log.write_match(winner, moves, error, agents=(0, 1))
+
+    With `append=True`, an existing log is continued (its metadata is kept).
+    """
+
+    def __init__(self, path: Path, metadata: Optional[dict[str, Any]] = None,
+                 block_size: int = DEFAULT_BLOCK_SIZE, append: bool = False):
+        self.path = Path(path)
+        self.block_size = block_size
+        self._games: list[bytes] = []
+        self._blocks: list[tuple[int, int]] = []
+        if append and self.path.exists() and self.path.stat().st_size > 0:
+            self._file = open(self.path, 'r+b')
+            self.metadata, data_start = _read_header(self._file)
+            index = _read_index(self._file, data_start)
+            self._blocks, data_end = index if index is not None else _scan_blocks(self._file, data_start)
+            # Drop the index (or an incomplete block), it is rewritten on close
+            self._file.truncate(data_end)
+            self._file.seek(data_end)
+        else:
+            self._file = open(self.path, 'wb')
+            self.metadata = metadata or {}
+            encoded = json.dumps(self.metadata).encode()
+            self._file.write(FILE_HEADER.pack(MAGIC, len(encoded)) + encoded)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def games_written(self) -> int:
+        return sum(count for _, count in self._blocks) + len(self._games)
+
+    def write(self, record: GameRecord):
+        self._games.append(encode_game(record))
+        if len(self._games) >= self.block_size:
+            self.flush()
+
+    def write_match(self, winner: Player, moves: Sequence[Move], error: Optional[Exception] = None,
+                    agents: tuple[int, int] = (0, 1), move_times: Optional[Sequence[float]] = None):
+        """Writes the result of `_play_match`."""
+        self.write(GameRecord(winner, np.asarray(moves, dtype=Move), termination_from_error(error), agents,
+                              None if move_times is None else np.asarray(move_times, dtype=np.float32)))
+
+    def flush(self):
+        """Writes the buffered games as one block."""
+        if not self._games:
+            return
+        payload = b''.join(self._games)
+        self._blocks.append((self._file.tell(), len(self._games)))
+        self._file.write(BLOCK_HEADER.pack(len(self._games), len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        self._games = []
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        index_offset = self._file.tell()
+        self._file.write(b''.join(INDEX_ENTRY.pack(*block) for block in self._blocks))
+        self._file.write(FOOTER.pack(index_offset, len(self._blocks), FOOTER_MAGIC))
+        self._file.close()
+
+
+class GameLogReader:
+    """
+    Reads a game log lazily, block by block.
+
+    Usage:
+        with GameLogReader("games.c4log") as log:
+            for game in log:
+                ...
+            arrays = log.to_arrays()
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self.metadata, data_start = _read_header(self._file)
+            index = _read_index(self._file, data_start)
+            self.blocks, _ = index if index is not None else _scan_blocks(self._file, data_start)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return sum(count for _, count in self.blocks)
+
+    def read_block(self, block: int) -> list[GameRecord]:
+        offset, _ = self.blocks[block]
+        self._file.seek(offset)
+        count, payload_size, checksum = BLOCK_HEADER.unpack(self._file.read(BLOCK_HEADER.size))
+        payload = self._file.read(payload_size)
+        if zlib.crc32(payload) != checksum:
+            raise ValueError(f"Block {block} of {self.path} is corrupted")
+        return list(decode_games(payload, count))
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for block in range(len(self.blocks)):
+            yield from self.read_block(block)
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """
+        Loads all games into arrays: `moves` (games x 42, padded with -1), `n_moves`,
+        `winner`, `termination`, `agents` (games x 2) and `move_times` (games x 42,
+        NaN where no time was recorded).
+        """
+        n_games = len(self)
+        arrays = {
+            'moves': np.full((n_games, MAX_MOVES), -1, dtype=Move),
+            'n_moves': np.zeros(n_games, dtype=np.uint8),
+            'winner': np.zeros(n_games, dtype=Player),
+            'termination': np.zeros(n_games, dtype=np.uint8),
+            'agents': np.zeros((n_games, 2), dtype=np.uint16),
+            'move_times': np.full((n_games, MAX_MOVES), np.nan, dtype=np.float32),
+        }
+        for i, game in enumerate(self):
+            n_moves = len(game.moves)
+            arrays['moves'][i, :n_moves] = game.moves
+            arrays['n_moves'][i] = n_moves
+            arrays['winner'][i] = game.winner
+            arrays['termination'][i] = game.termination
+            arrays['agents'][i] = game.agents
+            if game.move_times is not None:
+                arrays['move_times'][i, :n_moves] = game.move_times
+        return arrays
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,197 @@
+"""
+Write-ahead journal of a tournament, so an interrupted run can be resumed.
+
+The journal is a JSON lines file with one record per event: a match was `scheduled`,
+`started` (handed to a worker) or `finished` (with its `MatchResult`). Every record
+is flushed to the operating system when it is written, so it survives the
+orchestrator being killed; `fsync`, which makes it survive a machine crash, is
+batched over `sync_every` records or `sync_interval` seconds.
+
+Opening an existing journal replays it: finished matches keep their results, and
+everything else, including matches that were running when the orchestrator stopped
+and matches that could not be set up (no winner, e.g. a sandbox failed to start),
+is played again. A record torn by a crash at the end of the file is dropped.
+`compact` rewrites the journal as a checkpoint with one record per match.
+
+    with TournamentJournal('league.journal') as journal:
+        for result in run_tournament(agents, journal=journal):
+            ...
+"""
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Iterable, Union
+import json
+import os
+import time
+
+from .c4_types import Player, Move, NO_WINNER_YET
+from .tournament import MatchResult, ScheduledMatch
+
+JOURNAL_VERSION = 1
+DEFAULT_SYNC_EVERY = 64
+DEFAULT_SYNC_INTERVAL = 1.0
+SCHEDULED, STARTED, FINISHED, HEADER = 'scheduled', 'started', 'finished', 'header'
+
+
+def result_to_dict(result: MatchResult) -> dict:
+    return {**asdict(result), 'winner': int(result.winner), 'moves': [int(move) for move in result.moves]}
+
+
+def result_from_dict(data: dict) -> MatchResult:
+    return MatchResult(**{**data, 'winner': Player(data['winner']), 'moves': [Move(move) for move in data['moves']]})
+
+
+@dataclass
+class JournalState:
+    scheduled: dict[int, ScheduledMatch] = field(default_factory=dict)
+    started: set[int] = field(default_factory=set)
+    finished: dict[int, MatchResult] = field(default_factory=dict)
+
+    @property
+    def in_flight(self) -> set[int]:
+        """Matches that were started but have not finished"""
+        return self.started - self.finished.keys()
+
+    @property
+    def pending(self) -> list[ScheduledMatch]:
+        """Scheduled matches without a result, in schedule order"""
+        return [match for match_id, match in sorted(self.scheduled.items()) if match_id not in self.finished]
+
+    def apply(self, record: dict):
+        kind = record['type']
+        if kind == SCHEDULED:
+            match = ScheduledMatch(record['match_id'], record['player_1'], record['player_2'], record['repeat'])
+            self.scheduled[match.match_id] = match
+        elif kind == STARTED:
+            self.started.add(record['match_id'])
+        elif kind == FINISHED:
+            result = result_from_dict(record['result'])
+            # Matches that could not be set up are recorded, but still need to be played
+            if result.winner != NO_WINNER_YET:
+                self.finished[result.match_id] = result
+        elif kind == HEADER:
+            if record['version'] != JOURNAL_VERSION:
+                raise ValueError(f"Unsupported journal version {record['version']}")
+        else:
+            raise ValueError(f"Unknown journal record type {kind!r}")
+
+
+def replay(path: Union[str, Path]) -> tuple[JournalState, int]:
+    """
+    State recorded in a journal, and the length in bytes of its intact part. Only the
+    last line may be torn; damage anywhere else raises ValueError.
+    """
+    state = JournalState()
+    valid_length = 0
+    with open(path, 'rb') as f:
+        lines = f.readlines()
+    for number, line in enumerate(lines):
+        try:
+            if not line.endswith(b'\n'):
+                raise ValueError("incomplete record")
+            state.apply(json.loads(line))
+        except (ValueError, KeyError, TypeError) as e:
+            if number == len(lines) - 1:
+                break
+            raise ValueError(f"Journal {path} is damaged at line {number + 1}: {e}") from e
+        valid_length += len(line)
+    return state, valid_length
+
+
+class TournamentJournal:
+    """Appends records to a journal file, replaying it first if it exists. See the module docstring."""
+
+    def __init__(self, path: Union[str, Path], sync_every: int = DEFAULT_SYNC_EVERY,
+                 sync_interval: float = DEFAULT_SYNC_INTERVAL):
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        if self.path.exists():
+            self.state, valid_length = replay(self.path)
+            self._file = open(self.path, 'r+b')
+            # Drop a torn last record, so new records start on a fresh line
+            self._file.truncate(valid_length)
+            self._file.seek(valid_length)
+        else:
+            self.state = JournalState()
+            self._file = open(self.path, 'wb')
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        if not self._file.tell():
+            self._append([{'type': HEADER, 'version': JOURNAL_VERSION}], sync=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _append(self, records: list[dict], sync: bool = False):
+        self._file.write(b''.join(json.dumps(record).encode() + b'\n' for record in records))
+        self._file.flush()
+        self._unsynced += len(records)
+        if (sync or self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval):
+            self.sync()
+
+    def sync(self):
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def schedule(self, matches: Iterable[ScheduledMatch]):
+        """Records matches that are not in the journal yet."""
+        records = [{'type': SCHEDULED, **asdict(match)} for match in matches
+                   if match.match_id not in self.state.scheduled]
+        for record in records:
+            self.state.apply(record)
+        if records:
+            self._append(records, sync=True)
+
+    def start(self, match_id: int):
+        record = {'type': STARTED, 'match_id': match_id}
+        self.state.apply(record)
+        self._append([record])
+
+    def finish(self, result: MatchResult):
+        record = {'type': FINISHED, 'result': result_to_dict(result)}
+        self.state.apply(record)
+        self._append([record])
+
+    def compact(self):
+        """
+        Atomically replaces the journal with a checkpoint of its state: the scheduled
+        matches and the results of the finished ones. Started records are dropped, as
+        unfinished matches are played again anyway.
+        """
+        records = [{'type': HEADER, 'version': JOURNAL_VERSION}]
+        records += [{'type': SCHEDULED, **asdict(match)} for _, match in sorted(self.state.scheduled.items())]
+        records += [{'type': FINISHED, 'result': result_to_dict(result)}
+                    for _, result in sorted(self.state.finished.items())]
+        temporary_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temporary_path, 'wb') as f:
+            f.write(b''.join(json.dumps(record).encode() + b'\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(temporary_path, self.path)
+        _sync_directory(self.path.parent)
+        self.state.started &= self.state.finished.keys()
+        self._file = open(self.path, 'ab')
+        self._unsynced = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def _sync_directory(directory: Path):
+    """Makes a rename in `directory` durable"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -1,45 +1,163 @@
 import numpy as np
-from dataclasses import dataclass, field
+import time
 from typing import ClassVar, Tuple, Optional
 from pathlib import Path
-from .c4_types import Board, Player, PLAYER1, PLAYER2, Move, BOARD_SIZE
-from . import rules
-from .agent_sandbox.agent_runner import SandboxedAgent, get_generate_move_func_from_container
+from .c4_types import Board, Player, PLAYER1, PLAYER2, NO_PLAYER, Move, BOARD_SIZE, MoveTimeoutError, InvalidMoveError
+from . import rules, zobrist
+from .tracing import Tracer, NULL_TRACER
+from contextlib import ExitStack
+from .agent_sandbox.agent_runner import (SandboxedAgent, DeadlinePolicy, container_deadline_policy,
+                                         get_generate_move_func_from_container)
+from .agent_sandbox.pool import AgentPool
+from .agent_sandbox.async_runner import (AsyncAgentFunction, AsyncSandboxedAgent,
+                                         get_async_generate_move_func_from_container)
 
-@dataclass
 class GameState:
     """
     Represents the state of a game, including the board, current player, and previous moves.
+
+    Moves are applied in place with `push` and can be undone with `pop`, so search code
+    and the referee do not allocate per move. The board is updated in place as well;
+    copy it before handing it to code that may keep or modify it.
+
+    Zobrist hashes of the board and of its mirror image are updated along with it;
+    `key` identifies the position up to left-right symmetry, e.g. for caches.
     """
-    
+
+    __slots__ = ('_board', '_heights', '_ply', '_moves', '_hash', '_mirror_hash', 'winner')
     players: ClassVar[Tuple[Player, Player]] = (PLAYER1, PLAYER2)
-    board: Board = field(default_factory=lambda: np.zeros(BOARD_SIZE, dtype=Player))
-    winner: Player | None = field(init=False, default=None)
 
-    def __post_init__(self):
-        self.winner = rules.check_winner(self.board)
+    def __init__(self, board: Optional[Board] = None):
+        if board is None:
+            self._board = np.zeros(BOARD_SIZE, dtype=Player)
+        else:
+            self._board = np.array(board, dtype=Player)
+        is_full = np.all(self._board != NO_PLAYER, axis=0)
+        lowest_open_rows = np.argmax(self._board == NO_PLAYER, axis=0)
+        self._heights = [int(h) for h in np.where(is_full, BOARD_SIZE[0], lowest_open_rows)]
+        self._ply = int(np.count_nonzero(self._board != NO_PLAYER))
+        self._moves: list[Move] = []
+        self._hash, self._mirror_hash = zobrist.hash_board(self._board)
+        # A custom initial board may already contain a win anywhere, so scan it fully once
+        self.winner: Player | None = rules.check_winner(self._board)
 
-    def update(self, move: Move):
+    def __repr__(self) -> str:
+        return f"GameState(ply={self._ply}, winner={self.winner}, moves={[int(m) for m in self._moves]})"
+
+    @property
+    def board(self) -> Board:
+        return self._board
+
+    @property
+    def ply(self) -> int:
+        return self._ply
+
+    @property
+    def heights(self) -> list[int]:
+        return list(self._heights)
+
+    @property
+    def moves(self) -> list[Move]:
+        return list(self._moves)
+
+    @property
+    def empty_cells(self) -> int:
+        return self._board.size - self._ply
+
+    @property
+    def zobrist_hash(self) -> int:
+        return self._hash
+
+    @property
+    def key(self) -> int:
+        """Hash shared by the position and its mirror image"""
+        return min(self._hash, self._mirror_hash)
+
+    def is_valid_move(self, move: Move) -> bool:
+        return isinstance(move, Move) and 0 <= move < BOARD_SIZE[1] and self._heights[move] < BOARD_SIZE[0]
+
+    def push(self, move: Move):
+        """Plays a move for the current player in place."""
         if self.winner is not None:
             raise ValueError(f"Game is already over. Winner: {self.winner}")
-        if not rules.is_valid_move(self.board, move, self.current_player):
-            raise ValueError(f"Invalid move: {move}. Type: {type(move)}.")
-        self.board = rules.apply_move(self.board, move, self.current_player)
-        self.winner = rules.check_winner(self.board)
+        if not self.is_valid_move(move):
+            raise InvalidMoveError(f"Invalid move: {move}. Type: {type(move)}.")
+        player = self.current_player
+        col = int(move)
+        row = self._heights[col]
+        self._board[row, col] = player
+        self._heights[col] = row + 1
+        stone_hash, stone_mirror_hash = zobrist.stone_hashes(player, row, col)
+        self._hash ^= stone_hash
+        self._mirror_hash ^= stone_mirror_hash
+        self._ply += 1
+        self._moves.append(move)
+        # Only lines through the new piece can have become a win
+        if rules.check_win_at(self._board, row, col, player):
+            self.winner = player
+        elif self._ply == self._board.size:
+            self.winner = NO_PLAYER
+
+    def pop(self) -> Move:
+        """Undoes the last pushed move and returns it."""
+        if not self._moves:
+            raise ValueError("No moves to undo.")
+        move = self._moves.pop()
+        col = int(move)
+        row = self._heights[col] = self._heights[col] - 1
+        stone_hash, stone_mirror_hash = zobrist.stone_hashes(self._board[row, col], row, col)
+        self._hash ^= stone_hash
+        self._mirror_hash ^= stone_mirror_hash
+        self._board[row, col] = NO_PLAYER
+        self._ply -= 1
+        # push refuses moves once the game is over, so the position before it was undecided
+        self.winner = None
+        return move
+
+    def update(self, move: Move):
+        self.push(move)
 
     @property
     def is_game_over(self) -> bool:
         return self.winner is not None
-    
+
     @property
     def current_player(self) -> Player:
-        count_players = [np.count_nonzero(self.board == player) for player in self.players]
-        return self.players[count_players.index(min(count_players))]
+        return self.players[self._ply % 2]
+
+
+class ChessClock:
+    """
+    Chess clock: each player has a total time bank, and gains `increment` seconds
+    after every move made in time.
+
+    `overheads` are the per-player transport overheads (e.g. from
+    `calibrate_worker_deadline`), subtracted from the measured move times so
+    agents are only charged for their own computing.
+    """
+
+    def __init__(self, bank: float, increment: float = 0.0, overheads: Tuple[float, float] = (0.0, 0.0)):
+        self.increment = increment
+        self.overheads = overheads
+        self._remaining = [bank, bank]
+
+    def time_left(self, player: Player) -> float:
+        return self._remaining[int(player) - 1]
+
+    def charge(self, player: Player, elapsed: float):
+        """Charges a move's wall-clock time, raises MoveTimeoutError if the player ran out of time."""
+        index = int(player) - 1
+        self._remaining[index] -= max(0.0, elapsed - self.overheads[index])
+        if self._remaining[index] < 0:
+            raise MoveTimeoutError(f"Player {player} ran out of time")
+        self._remaining[index] += self.increment
 
 
 def _play_match(gen_move_func_player_1, gen_move_func_player_2,
                initial_board: Optional[Board] = None,
-               move_timeout: float = 5.0) -> tuple[Player, list[Move], Optional[Exception]]:
+               move_timeout: float = 5.0,
+               clock: Optional[ChessClock] = None,
+               tracer: Tracer = NULL_TRACER) -> tuple[Player, list[Move], Optional[Exception]]:
     """
     Play a match between two agents with a timeout for each move.
     
@@ -48,6 +166,9 @@ def _play_match(gen_move_func_player_1, gen_move_func_player_2,
         gen_move_func_player_2: Move generator function for player 2
         initial_board: Optional starting board state
         move_timeout: Maximum time in seconds allowed for each move (default: 5.0)
+        clock: Optional chess clock; if given, agents get their remaining time
+            as timeout instead of `move_timeout`
+        tracer: Records a span per move and per stage of each move (see `c4utils.tracing`)
     
     Returns:
         Tuple of (winner, moves, error)
@@ -56,24 +177,102 @@ def _play_match(gen_move_func_player_1, gen_move_func_player_2,
     moves = []
 
     while not game_state.is_game_over:
-        gen_move_func = gen_move_func_player_1 if game_state.current_player == PLAYER1 else gen_move_func_player_2
+        player = game_state.current_player
+        gen_move_func = gen_move_func_player_1 if player == PLAYER1 else gen_move_func_player_2
         try:
-            # Note: The actual move generation and timeout handling should be 
-            # implemented in the agent_sandbox.agent_runner module
-            current_board = game_state.board.copy()
-            move = gen_move_func(current_board, game_state.current_player, move_timeout)
-            game_state.update(move)
-            moves.append(move)
+            with tracer.span('move', ply=game_state.ply, player=int(player)):
+                # Note: Hard deadlines are enforced by the move generator functions
+                # from the agent_sandbox.agent_runner module
+                with tracer.span('board.copy'):
+                    current_board = game_state.board.copy()
+                with tracer.span('agent'):
+                    if clock is None:
+                        move = gen_move_func(current_board, player, move_timeout)
+                    else:
+                        start_time = time.perf_counter()
+                        move = gen_move_func(current_board, player, clock.time_left(player))
+                        clock.charge(player, time.perf_counter() - start_time)
+                with tracer.span('game.push'):
+                    game_state.push(move)
+                moves.append(move)
             
         except Exception as e:
-            opponent = PLAYER1 if game_state.current_player == PLAYER2 else PLAYER2
+            opponent = PLAYER1 if player == PLAYER2 else PLAYER2
             return opponent, moves, e
     return game_state.winner, moves, None
 
 def play_match(agent_sandbox_sif_1: Path, agent_sandbox_sif_2: Path,
                initial_board: Optional[Board] = None,
-               move_timeout: float = 5.0) -> tuple[Player, list[Move], Optional[Exception]]:
-    with SandboxedAgent(agent_sandbox_sif_1) as player_1, SandboxedAgent(agent_sandbox_sif_2) as player_2:
-        generate_move_func_player_1 = get_generate_move_func_from_container(player_1)
-        generate_move_func_player_2 = get_generate_move_func_from_container(player_2)
-        return _play_match(generate_move_func_player_1, generate_move_func_player_2, initial_board, move_timeout)
\ No newline at end of file
+               move_timeout: float = 5.0,
+               pool: Optional[AgentPool] = None,
+               clock: Optional[ChessClock] = None,
+               tracer: Tracer = NULL_TRACER,
+               deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy(),
+               calibrate_deadline: bool = False) -> tuple[Player, list[Move], Optional[Exception]]:
+    """
+    Play a match between two sandboxed agents.
+
+    If a pool is given, warm instances are leased from it instead of starting
+    (and stopping) a new container for each agent; after a failed match (e.g. a
+    timeout) both instances are recycled rather than returned to the pool. Moves are killed according to
+    `deadline_policy`; with `calibrate_deadline`, the overhead of each container is
+    measured before the match and added to the deadline (see `container_deadline_policy`).
+    """
+    with ExitStack() as stack:
+        if pool is None:
+            player_1 = stack.enter_context(SandboxedAgent(agent_sandbox_sif_1))
+            player_2 = stack.enter_context(SandboxedAgent(agent_sandbox_sif_2))
+        else:
+            player_1 = stack.enter_context(pool.lease(agent_sandbox_sif_1))
+            player_2 = stack.enter_context(pool.lease(agent_sandbox_sif_2))
+        generate_move_func_player_1 = get_generate_move_func_from_container(
+            player_1, container_deadline_policy(player_1, deadline_policy, calibrate_deadline), tracer)
+        generate_move_func_player_2 = get_generate_move_func_from_container(
+            player_2, container_deadline_policy(player_2, deadline_policy, calibrate_deadline), tracer)
+        winner, moves, error = _play_match(generate_move_func_player_1, generate_move_func_player_2, initial_board,
+                                           move_timeout, clock, tracer)
+        if pool is not None and error is not None:
+            # A move killed at its deadline may still be running inside the instance
+            pool.mark_unhealthy(player_1)
+            pool.mark_unhealthy(player_2)
+        return winner, moves, error
+
+async def _async_play_match(gen_move_func_player_1: AsyncAgentFunction, gen_move_func_player_2: AsyncAgentFunction,
+                            initial_board: Optional[Board] = None,
+                            move_timeout: float = 5.0,
+                            clock: Optional[ChessClock] = None) -> tuple[Player, list[Move], Optional[Exception]]:
+    """
+    Like `_play_match`, for agents whose move generator functions are coroutines.
+
+    Many matches can be run concurrently on one event loop, e.g. with `asyncio.gather`.
+    """
+    game_state = GameState() if initial_board is None else GameState(board=initial_board)
+    moves = []
+
+    while not game_state.is_game_over:
+        player = game_state.current_player
+        gen_move_func = gen_move_func_player_1 if player == PLAYER1 else gen_move_func_player_2
+        try:
+            current_board = game_state.board.copy()
+            if clock is None:
+                move = await gen_move_func(current_board, player, move_timeout)
+            else:
+                start_time = time.perf_counter()
+                move = await gen_move_func(current_board, player, clock.time_left(player))
+                clock.charge(player, time.perf_counter() - start_time)
+            game_state.push(move)
+            moves.append(move)
+
+        except Exception as e:
+            opponent = PLAYER1 if player == PLAYER2 else PLAYER2
+            return opponent, moves, e
+    return game_state.winner, moves, None
+
+async def async_play_match(agent_sandbox_sif_1: Path, agent_sandbox_sif_2: Path,
+                           initial_board: Optional[Board] = None,
+                           move_timeout: float = 5.0,
+                           clock: Optional[ChessClock] = None) -> tuple[Player, list[Move], Optional[Exception]]:
+    async with AsyncSandboxedAgent(agent_sandbox_sif_1) as player_1, AsyncSandboxedAgent(agent_sandbox_sif_2) as player_2:
+        return await _async_play_match(get_async_generate_move_func_from_container(player_1),
+                                       get_async_generate_move_func_from_container(player_2),
+                                       initial_board, move_timeout, clock)
@@ -0,0 +1,244 @@
+"""
+Pre-flight validation of agent submissions.
+
+Every submission (a SIF file, or an agent directory run with `LocalAgent`) is checked
+once before it enters tournaments:
+
+- interface: the sandbox starts and a worker can import `generate_move`,
+- legal moves: the agent answers the `validate_agent_function` positions and a
+  battery of random positions with legal moves within the move timeout,
+- calibration: the per-move overhead of the exec and worker transports is measured,
+  see `DeadlinePolicy`.
+
+Submissions are validated in parallel, and results are cached by the SHA-256 of the
+submission's content together with the validation settings, so unchanged submissions
+are never validated twice, whatever their path. Only verdicts that depend on the
+submission alone are cached: passing, failing to load the agent, and illegal moves.
+Other failures (timeouts, slow moves, sandbox or calibration errors) may come from a
+loaded host or the infrastructure, so they are marked `retryable` and checked again.
+
+    python -m c4utils.preflight submissions/*.sif --cache-dir preflight-cache
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Sequence
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from .c4_types import Board, Player, Move, AgentLoadError, InvalidMoveError
+from .agent_interface import validate_agent_function, validation_positions
+from .rules import is_valid_move
+from .agent_sandbox.agent_runner import (SandboxBackend, SandboxedAgent, AgentWorker, DeadlinePolicy,
+                                         DEFAULT_DEADLINE_MARGIN, calibrate_container_deadline,
+                                         calibrate_worker_deadline)
+from .agent_sandbox.local import LocalAgent
+
+# Bump when the checks change, so cached results are not reused
+VALIDATION_VERSION = 2
+HASH_CHUNK_SIZE = 1 << 20
+STAGE_START, STAGE_INTERFACE, STAGE_MOVES, STAGE_CALIBRATION = 'start', 'interface', 'moves', 'calibration'
+
+
+@dataclass(frozen=True)
+class PreflightConfig:
+    move_timeout: float = 1.0
+    positions: int = 32
+    seed: int = 0
+    calibration_samples: int = 5
+    deadline_margin: float = DEFAULT_DEADLINE_MARGIN
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the validation settings in cache keys"""
+        settings = json.dumps({'version': VALIDATION_VERSION, **asdict(self)}, sort_keys=True)
+        return hashlib.sha256(settings.encode()).hexdigest()[:16]
+
+
+@dataclass
+class PreflightResult:
+    agent: str
+    digest: str
+    valid: bool
+    # Stage that failed and why, None for valid agents
+    failed_stage: Optional[str] = None
+    error: Optional[str] = None
+    # Whether the failure may not be the submission's fault, such results are not cached
+    retryable: bool = False
+    positions_checked: int = 0
+    move_time_median: float = 0.0
+    move_time_max: float = 0.0
+    exec_overhead: float = 0.0
+    worker_overhead: float = 0.0
+    duration: float = 0.0
+    cached: bool = False
+
+    def deadline_policy(self, margin: float = DEFAULT_DEADLINE_MARGIN, transport: str = 'exec') -> DeadlinePolicy:
+        """Deadline policy using the calibrated overhead of `transport`"""
+        return DeadlinePolicy(margin, self.exec_overhead if transport == 'exec' else self.worker_overhead)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PreflightResult':
+        return cls(**data)
+
+
+def content_hash(path: Path) -> str:
+    """SHA-256 of a file, or of the relative paths and contents of all files in a directory."""
+    path = Path(path)
+    digest = hashlib.sha256()
+    if path.is_dir():
+        files = sorted(p for p in path.rglob('*') if p.is_file() and '__pycache__' not in p.parts)
+    else:
+        files = [path]
+    for file in files:
+        if path.is_dir():
+            digest.update(file.relative_to(path).as_posix().encode() + b'\0')
+        with open(file, 'rb') as f:
+            while chunk := f.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PreflightCache:
+    """One JSON file per validated submission and settings, written atomically."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str, config: PreflightConfig) -> Path:
+        return self.directory / f'{digest}-{config.fingerprint}.json'
+
+    def get(self, digest: str, config: PreflightConfig) -> Optional[PreflightResult]:
+        try:
+            with open(self.path(digest, config)) as f:
+                return PreflightResult.from_dict(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+
+    def put(self, result: PreflightResult, config: PreflightConfig):
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(result.to_dict(), f)
+        os.replace(temporary_path, self.path(result.digest, config))
+
+
+def default_sandbox_factory(path: Path) -> SandboxBackend:
+    """Agent directories run as local processes, anything else as a SIF file"""
+    return LocalAgent(path) if Path(path).is_dir() else SandboxedAgent(path)
+
+
+def _check_moves(worker: AgentWorker, config: PreflightConfig, deadline: float) -> list[float]:
+    """Runs the interface checks and the position battery, returns the agent's move times."""
+    move_times = []
+
+    def generate_move(board: Board, player: Player, timeout: float) -> Move:
+        move = worker.request_move(board, player, timeout, deadline)
+        move_times.append(worker.last_reply.elapsed)
+        return move
+
+    valid, error = validate_agent_function(generate_move, config.move_timeout)
+    if error is not None:
+        raise error
+    if not valid:
+        raise InvalidMoveError("Illegal move in the interface check positions")
+    for index, (board, player) in enumerate(validation_positions(config.positions, config.seed)):
+        move = generate_move(board, player, config.move_timeout)
+        if not is_valid_move(board, Move(move), player):
+            raise InvalidMoveError(f"Illegal move {move} in validation position {index}:\n{board[::-1]}")
+    return move_times
+
+
+def preflight_agent(path: Path, config: PreflightConfig = PreflightConfig(), digest: Optional[str] = None,
+                    sandbox_factory: Callable[[Path], SandboxBackend] = default_sandbox_factory) -> PreflightResult:
+    """Validates one submission, without the cache."""
+    start_time = time.perf_counter()
+    result = PreflightResult(str(path), digest or content_hash(path), valid=False)
+    stage = STAGE_START
+    try:
+        with sandbox_factory(Path(path)) as sandbox:
+            stage = STAGE_INTERFACE
+            with sandbox.start_worker() as worker:
+                stage = STAGE_MOVES
+                deadline = DeadlinePolicy(config.deadline_margin).hard_limit(config.move_timeout)
+                move_times = _check_moves(worker, config, deadline)
+                result.positions_checked = len(move_times)
+                result.move_time_median = statistics.median(move_times)
+                result.move_time_max = max(move_times)
+                if result.move_time_max > config.move_timeout:
+                    raise ValueError(f"Move took {result.move_time_max:.3f}s, the timeout is {config.move_timeout}s")
+                stage = STAGE_CALIBRATION
+                result.worker_overhead = calibrate_worker_deadline(worker, config.calibration_samples).overhead
+            result.exec_overhead = calibrate_container_deadline(sandbox, config.calibration_samples).overhead
+        result.valid = True
+    except Exception as e:
+        result.failed_stage = stage
+        result.error = f"{type(e).__name__}: {e}"
+        result.retryable = not isinstance(e, (AgentLoadError, InvalidMoveError))
+    result.duration = time.perf_counter() - start_time
+    return result
+
+
+def run_preflight(paths: Sequence[Path], config: PreflightConfig = PreflightConfig(),
+                  cache_dir: Optional[Path] = None, max_workers: Optional[int] = None,
+                  sandbox_factory: Callable[[Path], SandboxBackend] = default_sandbox_factory
+                  ) -> Iterator[PreflightResult]:
+    """
+    Validates submissions in parallel and yields their results as they are completed,
+    cached ones first. Submissions with identical content are validated once.
+    """
+    cache = PreflightCache(cache_dir) if cache_dir is not None else None
+    max_workers = max_workers or os.cpu_count() or 1
+    # The validation work happens in sandbox processes, so threads are enough
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        digests = list(executor.map(content_hash, paths))
+        pending: dict[str, list[Path]] = {}
+        for path, digest in zip(paths, digests):
+            cached = cache.get(digest, config) if cache is not None else None
+            if cached is not None:
+                cached.agent, cached.cached = str(path), True
+                yield cached
+            else:
+                pending.setdefault(digest, []).append(path)
+        futures = {executor.submit(preflight_agent, same[0], config, digest, sandbox_factory): same
+                   for digest, same in pending.items()}
+        for future in as_completed(futures):
+            result = future.result()
+            if cache is not None and not result.retryable:
+                cache.put(result, config)
+            for index, path in enumerate(futures[future]):
+                yield result if index == 0 else PreflightResult.from_dict({**result.to_dict(), 'agent': str(path)})
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('submissions', nargs='+', type=Path, help="SIF files or agent directories")
+    parser.add_argument('--cache-dir', type=Path, help="Directory for cached results")
+    parser.add_argument('--output', type=Path, help="Write all results as JSON")
+    parser.add_argument('--move-timeout', type=float, default=PreflightConfig.move_timeout)
+    parser.add_argument('--positions', type=int, default=PreflightConfig.positions)
+    parser.add_argument('--seed', type=int, default=PreflightConfig.seed)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+    config = PreflightConfig(args.move_timeout, args.positions, args.seed)
+    results = []
+    for result in run_preflight(args.submissions, config, args.cache_dir, args.workers):
+        results.append(result)
+        status = 'ok' if result.valid else f'FAILED ({result.failed_stage}): {result.error}'
+        print(f"{result.agent}: {status}{' [cached]' if result.cached else ''}")
+    if args.output is not None:
+        args.output.write_text(json.dumps([result.to_dict() for result in results], indent=2))
+    return 0 if all(result.valid for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,12 +5,16 @@
 # check for illegal move
 # check for game over
 import numpy as np
-from .c4_types import Board, Player, Move, BOARD_SIZE, NO_PLAYER, PLAYER1, PLAYER2
+from .c4_types import Board, Player, Move, BOARD_SIZE, NO_PLAYER, NO_WINNER_YET, PLAYER1, PLAYER2
+from . import bitboard
+from .cache import LRUCache
+
+def lowest_open_row(board: Board, move: Move) -> int:
+    return int(np.where(board[:, move] == 0)[0][0])
 
 def apply_move(board: Board, move: Move, player: Player) -> Board:
     board = board.copy()
-    lowest_open_row = np.where(board[:, move] == 0)[0][0]
-    board[lowest_open_row, move] = player
+    board[lowest_open_row(board, move), move] = player
     return board
 
 def is_valid_move(board: Board, move: Move, player: Player) -> bool:
@@ -29,11 +33,31 @@ def is_valid_move(board: Board, move: Move, player: Player) -> bool:
     return True
 
 def check_win(board: Board, player: Player) -> bool:
+    if board.shape == BOARD_SIZE:
+        return bitboard.has_four(bitboard.bits_from_mask(board == player))
+    return check_win_windows(board, player)
+
+def check_win_windows(board: Board, player: Player) -> bool:
+    """Reference implementation scanning every 4-cell window, works for any board shape."""
     return any(is_win for is_win in [check_win_horizontal(board, player),
                                     check_win_horizontal(board.T, player),
                                     check_win_diagonal(board, player),
                                     check_win_diagonal(np.fliplr(board), player)])
 
+def check_win_at(board: Board, row: int, col: int, player: Player) -> bool:
+    """Checks only the four lines through (row, col), i.e. whether the piece placed there won."""
+    n_rows, n_cols = board.shape
+    for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        for sign in (1, -1):
+            r, c = row + sign * d_row, col + sign * d_col
+            while 0 <= r < n_rows and 0 <= c < n_cols and board[r, c] == player:
+                count += 1
+                r, c = r + sign * d_row, c + sign * d_col
+        if count >= 4:
+            return True
+    return False
+
 def yield_all_windows(board_slice: np.ndarray, window_size: int) -> np.ndarray:
     for i in range(board_slice.shape[0] - window_size + 1):
         yield board_slice[i:i+window_size]
@@ -55,6 +79,8 @@ def check_win_diagonal(board: Board, player: Player) -> bool:
     return False
 
 def check_winner(board: Board) -> Player | None:
+    if board.shape == BOARD_SIZE:
+        return bitboard.check_winner(bitboard.from_board(board))
     if check_win(board, PLAYER1):
         return PLAYER1
     elif check_win(board, PLAYER2):
@@ -63,3 +89,70 @@ def check_winner(board: Board) -> Player | None:
         return NO_PLAYER
     else:
         return None
+
+# Default cache of check_winner_cached, for `GameState.key` keys. Keys of one cache must
+# all come from the same scheme, e.g. not mix Zobrist and bitboard keys.
+WINNER_CACHE = LRUCache()
+
+def check_winner_cached(board: Board, key: int, cache: LRUCache = WINNER_CACHE) -> Player | None:
+    """
+    `check_winner` memoized in an LRU cache. `key` identifies the position in the
+    cache's key scheme (by default `GameState.key`); computing it from the board would
+    cost more than the check itself. The winner of a position and of its mirror image
+    are the same, so mirror-folded keys are fine.
+    """
+    return cache.get_or_compute(key, lambda: check_winner(board))
+
+
+# Batched versions operating on stacks of boards with shape (N, rows, columns).
+# They loop over chunks of boards only, so temporaries stay bounded for huge inputs.
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+def check_winner_batch(boards: np.ndarray, chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+    """
+    Vectorized `check_winner` for a stack of boards.
+
+    Returns an array of players, with NO_PLAYER for draws and NO_WINNER_YET where
+    `check_winner` would return None.
+    """
+    boards = np.asarray(boards)
+    winners = np.full(len(boards), NO_WINNER_YET, dtype=Player)
+    if boards.shape[1:] != BOARD_SIZE:
+        # Other board sizes do not fit the bitboard layout
+        for index, board in enumerate(boards):
+            winner = check_winner(board)
+            winners[index] = NO_WINNER_YET if winner is None else winner
+        return winners
+    for start in range(0, len(boards), chunk_size):
+        chunk = boards[start:start + chunk_size]
+        chunk_winners = winners[start:start + chunk_size]
+        chunk_winners[np.all(chunk != NO_PLAYER, axis=(1, 2))] = NO_PLAYER
+        player_1, player_2 = bitboard.from_boards(chunk)
+        # Player 1 is assigned last, as check_winner gives it precedence
+        chunk_winners[bitboard.has_four_batch(player_2)] = PLAYER2
+        chunk_winners[bitboard.has_four_batch(player_1)] = PLAYER1
+    return winners
+
+def valid_moves_batch(boards: np.ndarray) -> np.ndarray:
+    """Returns a boolean (N, columns) array marking the columns that are still open."""
+    return np.asarray(boards)[:, -1, :] == NO_PLAYER
+
+def apply_moves_batch(boards: np.ndarray, moves: np.ndarray, players: np.ndarray | Player,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+    """Vectorized `apply_move`: returns a copy of the boards with one move applied to each."""
+    new_boards = np.array(boards, copy=True)
+    moves = np.broadcast_to(np.asarray(moves, dtype=np.intp), len(new_boards))
+    players = np.broadcast_to(np.asarray(players, dtype=new_boards.dtype), len(new_boards))
+    if np.any((moves < 0) | (moves >= new_boards.shape[2])):
+        raise ValueError("Moves out of bounds.")
+    for start in range(0, len(new_boards), chunk_size):
+        chunk = new_boards[start:start + chunk_size]
+        chunk_moves = moves[start:start + chunk_size]
+        indices = np.arange(len(chunk))
+        is_open = chunk[indices, :, chunk_moves] == NO_PLAYER
+        if not np.all(is_open.any(axis=1)):
+            full = start + np.flatnonzero(~is_open.any(axis=1))
+            raise ValueError(f"Moves into full columns for boards {full[:10].tolist()}.")
+        rows = np.argmax(is_open, axis=1)
+        chunk[indices, rows, chunk_moves] = players[start:start + chunk_size]
+    return new_boards
@@ -0,0 +1,208 @@
+"""
+Self-play data generation.
+
+`run_selfplay` plays `n_games` games between two agents and writes them as game log
+shards (see `c4utils.gamelog`) to an output directory:
+
+- Openings of `opening_plies` random moves are drawn up front in the main process,
+  optionally deduplicated by canonical position, so games do not repeat.
+- Games are split into shards of `games_per_shard`, played in worker processes. Each
+  shard gets its own seed derived from `seed`, and the agents swap colours every game.
+- A shard is written to a temporary file and renamed when complete, so an interrupted
+  run resumes by skipping the shards that already exist. Shards record the settings
+  they were played with in their metadata, and resuming into a directory written with
+  other settings fails instead of mixing the two.
+
+Output only depends on `seed`, not on the number of workers, as long as the agents
+themselves are deterministic given numpy's and Python's global random state (agents
+that search until a deadline are not).
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+import argparse
+import importlib
+import os
+import random
+import numpy as np
+
+from .c4_types import Player, Move, BOARD_SIZE, PLAYER1, PLAYER2
+from . import bitboard
+from .gamelog import GameLogReader, GameLogWriter, GameRecord, termination_from_error
+from .match import _play_match
+from .tournament import AgentSpec, SandboxFactory, _move_func, is_sandboxed
+from .agent_sandbox.agent_runner import SandboxedAgent
+
+SHARD_SUFFIX = '.c4log'
+DEFAULT_GAMES_PER_SHARD = 1000
+# Random openings are redrawn at most this many times per game before giving up on dedup
+MAX_OPENING_ATTEMPTS = 100
+
+
+@dataclass(frozen=True)
+class SelfPlayConfig:
+    agents: tuple[AgentSpec, AgentSpec]
+    n_games: int
+    output_dir: Path
+    seed: int = 0
+    opening_plies: int = 0
+    dedup_openings: bool = False
+    games_per_shard: int = DEFAULT_GAMES_PER_SHARD
+    move_timeout: float = 5.0
+    max_workers: Optional[int] = None
+
+    @property
+    def n_shards(self) -> int:
+        return -(-self.n_games // self.games_per_shard)
+
+    def shard_path(self, shard: int) -> Path:
+        return Path(self.output_dir) / f'shard-{shard:05d}{SHARD_SUFFIX}'
+
+    def shard_metadata(self, shard: int, seed: int) -> dict:
+        """Metadata of a shard's game log: everything its games depend on"""
+        settings = {
+            'agents': [agent_name(agent) for agent in self.agents],
+            'n_games': self.n_games,
+            'games_per_shard': self.games_per_shard,
+            'seed': self.seed,
+            'opening_plies': self.opening_plies,
+            'dedup_openings': self.dedup_openings,
+            'move_timeout': self.move_timeout,
+        }
+        return {'shard': shard, 'seed': seed, 'settings': settings}
+
+
+def agent_name(agent: AgentSpec) -> str:
+    """`module:function` of in-process agents (as accepted by `load_agent`), the path of sandboxed ones"""
+    if is_sandboxed(agent):
+        return str(agent)
+    return (f"{getattr(agent, '__module__', type(agent).__module__)}:"
+            f"{getattr(agent, '__qualname__', type(agent).__qualname__)}")
+
+
+def generate_openings(n_games: int, plies: int, seed: int, dedup: bool = False) -> np.ndarray:
+    """
+    Random openings of `plies` moves, as an (n_games, plies) array of columns. Openings
+    never end the game. With `dedup`, no two openings reach the same position up to
+    mirror symmetry.
+    """
+    rng = np.random.default_rng(seed)
+    openings = np.zeros((n_games, plies), dtype=Move)
+    seen = set()
+    for game in range(n_games):
+        for _ in range(MAX_OPENING_ATTEMPTS):
+            position = bitboard.EMPTY_POSITION
+            for ply in range(plies):
+                player = PLAYER1 if ply % 2 == 0 else PLAYER2
+                # Only moves that neither fill nor decide the game keep the opening neutral
+                candidates = [col for col in range(BOARD_SIZE[1])
+                              if bitboard.lowest_open_cell(position, col)
+                              and not bitboard.check_win(bitboard.apply_move(position, Move(col), player), player)]
+                if not candidates:
+                    break
+                col = candidates[rng.integers(len(candidates))]
+                openings[game, ply] = col
+                position = bitboard.apply_move(position, Move(col), player)
+            else:
+                key = bitboard.canonical_key(position)
+                if not dedup or key not in seen:
+                    seen.add(key)
+                    break
+        else:
+            raise ValueError(f"Could not find {n_games} distinct openings of {plies} plies")
+    return openings
+
+
+def opening_board(opening: np.ndarray) -> np.ndarray:
+    position = bitboard.EMPTY_POSITION
+    for ply, col in enumerate(opening):
+        position = bitboard.apply_move(position, Move(col), PLAYER1 if ply % 2 == 0 else PLAYER2)
+    return bitboard.to_board(position)
+
+
+def play_shard(config: SelfPlayConfig, shard: int, openings: np.ndarray, seed: int,
+               sandbox_factory: SandboxFactory = SandboxedAgent) -> Path:
+    """Plays the games of one shard and writes them to the shard's file."""
+    np.random.seed(seed % (1 << 32))
+    random.seed(seed)
+    path = config.shard_path(shard)
+    temporary_path = path.with_suffix(path.suffix + '.tmp')
+    first_game = shard * config.games_per_shard
+    with ExitStack() as stack:
+        agents = [_move_func(stack, agent, sandbox_factory) for agent in config.agents]
+        with GameLogWriter(temporary_path, metadata=config.shard_metadata(shard, seed)) as log:
+            for offset, opening in enumerate(openings):
+                # Agent 0 plays first in even games, second in odd games
+                order = (0, 1) if (first_game + offset) % 2 == 0 else (1, 0)
+                winner, moves, error = _play_match(agents[order[0]], agents[order[1]],
+                                                   opening_board(opening), config.move_timeout)
+                all_moves = np.concatenate([opening, np.asarray(moves, dtype=Move)])
+                log.write(GameRecord(Player(winner), all_moves, termination_from_error(error), order))
+    os.replace(temporary_path, path)
+    return path
+
+
+def is_shard_done(config: SelfPlayConfig, shard: int, seed: int) -> bool:
+    """
+    Whether the shard's file exists. Raises ValueError if it was written with other
+    settings, as resuming would mix games of different runs.
+    """
+    path = config.shard_path(shard)
+    if not path.exists():
+        return False
+    with GameLogReader(path) as log:
+        metadata = log.metadata
+    if metadata != config.shard_metadata(shard, seed):
+        raise ValueError(f"{path} was written with other settings ({metadata}), use another output directory")
+    return True
+
+
+def run_selfplay(config: SelfPlayConfig, sandbox_factory: SandboxFactory = SandboxedAgent) -> Iterator[Path]:
+    """Plays all missing shards and yields their paths as they are completed."""
+    Path(config.output_dir).mkdir(parents=True, exist_ok=True)
+    openings = generate_openings(config.n_games, config.opening_plies, config.seed, config.dedup_openings)
+    seeds = [int(s.generate_state(1, np.uint64)[0]) for s in np.random.SeedSequence(config.seed).spawn(config.n_shards)]
+    pending = [shard for shard in range(config.n_shards) if not is_shard_done(config, shard, seeds[shard])]
+    if not pending:
+        return
+    with ProcessPoolExecutor(max_workers=config.max_workers) as executor:
+        futures = []
+        for shard in pending:
+            start = shard * config.games_per_shard
+            shard_openings = openings[start:start + config.games_per_shard]
+            futures.append(executor.submit(play_shard, config, shard, shard_openings, seeds[shard], sandbox_factory))
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def load_agent(spec: str) -> AgentSpec:
+    """`module:function` for in-process agents, anything else is a path to a sandboxed agent."""
+    if ':' in spec and not Path(spec).exists():
+        module, function = spec.split(':', 1)
+        return getattr(importlib.import_module(module), function)
+    return Path(spec)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('agents', nargs=2, help="module:function of an in-process agent, or a SIF file")
+    parser.add_argument('--games', type=int, required=True)
+    parser.add_argument('--output', type=Path, required=True, help="Directory for the shard files")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--opening-plies', type=int, default=0)
+    parser.add_argument('--dedup-openings', action='store_true')
+    parser.add_argument('--games-per-shard', type=int, default=DEFAULT_GAMES_PER_SHARD)
+    parser.add_argument('--move-timeout', type=float, default=5.0)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+    config = SelfPlayConfig((load_agent(args.agents[0]), load_agent(args.agents[1])), args.games, args.output,
+                            args.seed, args.opening_plies, args.dedup_openings, args.games_per_shard,
+                            args.move_timeout, args.workers)
+    for path in run_selfplay(config):
+        print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, Sequence, Union
+import itertools
+import os
+import time
+
+from .c4_types import Board, Player, Move, AgentFunction, NO_WINNER_YET
+from .match import _play_match
+from .agent_sandbox.agent_runner import (SandboxBackend, SandboxedAgent, DeadlinePolicy, container_deadline_policy,
+                                         get_generate_move_func_from_container)
+
+if TYPE_CHECKING:
+    from .journal import TournamentJournal
+
+# An agent is either a path (run in a sandbox, by default a SIF file run with Apptainer)
+# or an in-process agent function. Agents and sandbox factories are sent to worker
+# processes, so they must be picklable (i.e. defined at module level).
+AgentSpec = Union[Path, str, AgentFunction]
+SandboxFactory = Callable[[Path], SandboxBackend]
+
+
+@dataclass(frozen=True)
+class ScheduledMatch:
+    match_id: int
+    player_1: int
+    player_2: int
+    repeat: int = 0
+
+
+@dataclass
+class MatchResult:
+    match_id: int
+    player_1: int
+    player_2: int
+    winner: Player
+    moves: list[Move] = field(default_factory=list)
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+def is_sandboxed(agent: AgentSpec) -> bool:
+    return isinstance(agent, (str, Path))
+
+
+def build_schedule(n_agents: int, repeats: int = 1) -> list[ScheduledMatch]:
+    """All pairings of `n_agents` agents with both colours, each played `repeats` times."""
+    pairings = [(i, j) for i in range(n_agents) for j in range(n_agents) if i != j]
+    schedule = []
+    for repeat in range(repeats):
+        for i, j in pairings:
+            schedule.append(ScheduledMatch(len(schedule), i, j, repeat))
+    return schedule
+
+
+# Per worker process state, set up once by _init_worker
+_worker_agents: Sequence[AgentSpec] = ()
+_worker_options: dict = {}
+
+
+def _init_worker(agents: Sequence[AgentSpec], options: dict):
+    global _worker_agents, _worker_options
+    _worker_agents = agents
+    _worker_options = options
+
+
+def _move_func(stack: ExitStack, agent: AgentSpec, sandbox_factory: SandboxFactory,
+               deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy(),
+               calibrate_deadline: bool = False) -> AgentFunction:
+    if is_sandboxed(agent):
+        sandbox = stack.enter_context(sandbox_factory(Path(agent)))
+        return get_generate_move_func_from_container(
+            sandbox, container_deadline_policy(sandbox, deadline_policy, calibrate_deadline))
+    return agent
+
+
+def run_scheduled_match(scheduled: ScheduledMatch, agents: Sequence[AgentSpec],
+                        move_timeout: float = 5.0, initial_board: Optional[Board] = None,
+                        sandbox_factory: SandboxFactory = SandboxedAgent,
+                        deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy(),
+                        calibrate_deadline: bool = False) -> MatchResult:
+    start_time = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            move_funcs = [_move_func(stack, agents[player], sandbox_factory, deadline_policy, calibrate_deadline)
+                          for player in (scheduled.player_1, scheduled.player_2)]
+            winner, moves, error = _play_match(*move_funcs, initial_board, move_timeout)
+    except Exception as e:
+        # The match could not be set up (e.g. a container failed to start), nobody won
+        winner, moves, error = NO_WINNER_YET, [], e
+    return MatchResult(
+        match_id=scheduled.match_id,
+        player_1=scheduled.player_1,
+        player_2=scheduled.player_2,
+        winner=winner,
+        moves=[Move(move) for move in moves],
+        # Exceptions are not always picklable, so only their description is kept
+        error=None if error is None else f"{type(error).__name__}: {error}",
+        duration=time.perf_counter() - start_time
+    )
+
+
+def _run_in_worker(scheduled: ScheduledMatch) -> MatchResult:
+    return run_scheduled_match(scheduled, _worker_agents, **_worker_options)
+
+
+def tournament_workers(agents: Sequence[AgentSpec], max_workers: Optional[int] = None,
+                       max_containers: Optional[int] = None, cores_per_match: Optional[int] = None) -> int:
+    """Number of matches to run concurrently given the core and container limits."""
+    workers = max_workers or max(1, (os.cpu_count() or 1) // (cores_per_match or 1))
+    containers_per_match = min(2, sum(is_sandboxed(agent) for agent in agents))
+    if max_containers is not None and containers_per_match:
+        workers = min(workers, max(1, max_containers // containers_per_match))
+    return workers
+
+
+def run_tournament(agents: Sequence[AgentSpec], repeats: int = 1,
+                   max_workers: Optional[int] = None,
+                   max_containers: Optional[int] = None,
+                   cores_per_match: Optional[int] = None,
+                   move_timeout: float = 5.0,
+                   initial_board: Optional[Board] = None,
+                   schedule: Optional[Sequence[ScheduledMatch]] = None,
+                   sandbox_factory: Optional[SandboxFactory] = None,
+                   journal: Optional['TournamentJournal'] = None,
+                   deadline_policy: Optional[DeadlinePolicy] = DeadlinePolicy(),
+                   calibrate_deadline: bool = False) -> Iterator[MatchResult]:
+    """
+    Play a round-robin tournament on a process pool, yielding results as matches finish.
+
+    With a `journal`, matches are recorded as they are scheduled, started and
+    finished. Results already in the journal are yielded first and their matches
+    not played again, so rerunning an interrupted tournament with the same journal
+    only plays the matches that had not finished.
+
+    Args:
+        agents: SIF paths or in-process agent functions
+        repeats: Number of times every ordered pairing is played
+        max_workers: Number of concurrent matches (default: CPU count / cores_per_match)
+        max_containers: Upper bound on concurrently running containers
+        cores_per_match: CPUs reserved for each match; also applied to containers as a CPU limit
+        move_timeout: Maximum time in seconds allowed for each move
+        initial_board: Optional starting board state for every match
+        schedule: Matches to play instead of the full round-robin
+        sandbox_factory: Creates the sandbox for path agents (default: Apptainer `SandboxedAgent`)
+        journal: Write-ahead journal to record progress in and resume from (see `c4utils.journal`)
+        deadline_policy: When moves of sandboxed agents are killed; None waits forever
+        calibrate_deadline: Measure the overhead of each sandbox at the start of a match and
+            add it to the deadline (see `container_deadline_policy`)
+    """
+    if schedule is None:
+        schedule = build_schedule(len(agents), repeats)
+    if journal is not None:
+        for scheduled in schedule:
+            recorded = journal.state.scheduled.get(scheduled.match_id)
+            if recorded is not None and recorded != scheduled:
+                raise ValueError(f"Match {scheduled.match_id} in the journal is {recorded}, not {scheduled}")
+        journal.schedule(schedule)
+        yield from (journal.state.finished[s.match_id] for s in schedule if s.match_id in journal.state.finished)
+        schedule = [s for s in schedule if s.match_id not in journal.state.finished]
+    workers = tournament_workers(agents, max_workers, max_containers, cores_per_match)
+    options = {
+        'move_timeout': move_timeout,
+        'initial_board': initial_board,
+        'sandbox_factory': sandbox_factory or partial(SandboxedAgent, cpus=cores_per_match),
+        'deadline_policy': deadline_policy,
+        'calibrate_deadline': calibrate_deadline,
+    }
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(list(agents), options)) as executor:
+        if journal is None:
+            futures = [executor.submit(_run_in_worker, scheduled) for scheduled in schedule]
+            for future in as_completed(futures):
+                yield future.result()
+            return
+        # Matches are only submitted when a worker is free, so started matches are running ones
+        queue, running = iter(schedule), set()
+        while True:
+            for scheduled in itertools.islice(queue, workers - len(running)):
+                running.add(executor.submit(_run_in_worker, scheduled))
+                journal.start(scheduled.match_id)
+            if not running:
+                return
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                journal.finish(result)
+                yield result
@@ -0,0 +1,175 @@
+"""
+Lockstep simulation of many games for in-process agents.
+
+`VectorizedGameState` holds N games as a board stack plus uint64 bitboards. Moves for
+all active games are applied and checked for wins with a handful of numpy operations
+per ply, and finished games leave the active set. `play_matches_batched` uses it to
+play N games between two batched agents, calling each agent once per ply with all the
+boards where it is to move.
+
+A batched agent function takes an `[n, 6, 7]` board stack, the `[n]` players to move
+and the per-move timeout, and returns `[n]` moves. Timeouts are not enforced, as the
+agents run in the referee process; `batched` turns an ordinary `AgentFunction` into a
+(slow) batched one.
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+import numpy as np
+
+from .c4_types import AgentFunction, Player, Move, BOARD_SIZE, NO_PLAYER, NO_WINNER_YET, PLAYER1, PLAYER2
+from . import bitboard, rules
+from .bitboard import COLUMN_BITS
+from .gamelog import Termination
+
+BatchedAgentFunction = Callable[[np.ndarray, np.ndarray, float], np.ndarray]
+
+ROWS, COLUMNS = BOARD_SIZE
+MAX_MOVES = ROWS * COLUMNS
+DEFAULT_CHUNK_SIZE = 1 << 17
+
+
+@dataclass(frozen=True)
+class BatchedMatchResults:
+    """
+    Outcome of N games: `winners` (NO_PLAYER for draws), `moves` (N x 42, padded with
+    -1), `n_moves` and `termination` (`gamelog.Termination` values).
+    """
+    winners: np.ndarray
+    moves: np.ndarray
+    n_moves: np.ndarray
+    termination: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.winners)
+
+
+class VectorizedGameState:
+    """
+    N games advanced in lockstep. `push` takes one move for every active game; moves into
+    full or nonexistent columns lose the game for the player who made them, as in
+    `_play_match`.
+    """
+
+    def __init__(self, n_games: Optional[int] = None, initial_boards: Optional[np.ndarray] = None):
+        if initial_boards is None:
+            if n_games is None:
+                raise ValueError("Either n_games or initial_boards is required")
+            self.boards = np.zeros((n_games, *BOARD_SIZE), dtype=Player)
+        else:
+            self.boards = np.array(initial_boards, dtype=Player)
+            if self.boards.shape[1:] != BOARD_SIZE:
+                raise ValueError(f"Boards must have shape (n, {BOARD_SIZE[0]}, {BOARD_SIZE[1]})")
+        n_games = len(self.boards)
+        is_empty = self.boards == NO_PLAYER
+        self.heights = np.where(is_empty.any(axis=1), np.argmax(is_empty, axis=1), ROWS).astype(np.intp)
+        self.ply = np.count_nonzero(~is_empty, axis=(1, 2))
+        self.stones = np.stack(bitboard.from_boards(self.boards))
+        self.winners = rules.check_winner_batch(self.boards)
+        self.termination = np.full(n_games, Termination.NORMAL, dtype=np.uint8)
+        # Moves made here, not those leading to the initial boards
+        self.moves = np.full((n_games, MAX_MOVES), -1, dtype=Move)
+        self.n_moves = np.zeros(n_games, dtype=np.intp)
+        self.active = np.flatnonzero(self.winners == NO_WINNER_YET)
+
+    def __len__(self) -> int:
+        return len(self.boards)
+
+    @property
+    def is_game_over(self) -> bool:
+        return len(self.active) == 0
+
+    @property
+    def current_players(self) -> np.ndarray:
+        """Players to move in the active games"""
+        return np.where(self.ply[self.active] % 2 == 0, PLAYER1, PLAYER2).astype(Player)
+
+    def push(self, moves: np.ndarray):
+        """Plays one move in every active game, in the order of `active`."""
+        games = self.active
+        moves = np.asarray(moves).astype(np.intp)
+        if moves.shape != games.shape:
+            raise ValueError(f"Expected {len(games)} moves, got shape {moves.shape}")
+        players = self.current_players
+        valid = (moves >= 0) & (moves < COLUMNS)
+        valid[valid] = self.heights[games[valid], moves[valid]] < ROWS
+
+        invalid_games = games[~valid]
+        self.winners[invalid_games] = np.where(players[~valid] == PLAYER1, PLAYER2, PLAYER1)
+        self.termination[invalid_games] = Termination.INVALID_MOVE
+
+        games, moves, players = games[valid], moves[valid], players[valid]
+        rows = self.heights[games, moves]
+        self.boards[games, rows, moves] = players
+        self.heights[games, moves] += 1
+        self.moves[games, self.n_moves[games]] = moves
+        self.n_moves[games] += 1
+        self.ply[games] += 1
+        cells = np.left_shift(np.uint64(1), (moves * COLUMN_BITS + rows).astype(np.uint64))
+        side = (players == PLAYER2).astype(np.intp)
+        self.stones[side, games] |= cells
+        won = bitboard.has_four_batch(self.stones[side, games])
+        self.winners[games[won]] = players[won]
+        self.winners[games[~won & (self.ply[games] == MAX_MOVES)]] = NO_PLAYER
+
+        self.active = self.active[self.winners[self.active] == NO_WINNER_YET]
+
+    def results(self) -> BatchedMatchResults:
+        return BatchedMatchResults(self.winners.copy(), self.moves.copy(), self.n_moves.copy(),
+                                   self.termination.copy())
+
+
+def _play_chunk(agent_1: BatchedAgentFunction, agent_2: BatchedAgentFunction, state: VectorizedGameState,
+                move_timeout: float) -> BatchedMatchResults:
+    while not state.is_game_over:
+        players = state.current_players
+        boards = state.boards[state.active]
+        moves = np.empty(len(players), dtype=np.intp)
+        for player, agent in ((PLAYER1, agent_1), (PLAYER2, agent_2)):
+            to_move = players == player
+            if to_move.any():
+                moves[to_move] = agent(boards[to_move], players[to_move], move_timeout)
+        state.push(moves)
+    return state.results()
+
+
+def play_matches_batched(agent_1: BatchedAgentFunction, agent_2: BatchedAgentFunction,
+                         n_games: Optional[int] = None, initial_boards: Optional[np.ndarray] = None,
+                         move_timeout: float = 5.0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> BatchedMatchResults:
+    """
+    Plays N games between two batched agents, `agent_1` moving for player 1.
+
+    Games are simulated `chunk_size` at a time, so memory stays bounded for huge N.
+    """
+    if initial_boards is not None:
+        initial_boards = np.asarray(initial_boards)
+        n_games = len(initial_boards)
+    if n_games is None:
+        raise ValueError("Either n_games or initial_boards is required")
+    chunks = []
+    for start in range(0, n_games, chunk_size):
+        stop = min(start + chunk_size, n_games)
+        state = (VectorizedGameState(n_games=stop - start) if initial_boards is None
+                 else VectorizedGameState(initial_boards=initial_boards[start:stop]))
+        chunks.append(_play_chunk(agent_1, agent_2, state, move_timeout))
+    if not chunks:
+        return VectorizedGameState(n_games=0).results()
+    return BatchedMatchResults(*(np.concatenate(arrays) for arrays in zip(
+        *((c.winners, c.moves, c.n_moves, c.termination) for c in chunks))))
+
+
+def batched(agent: AgentFunction) -> BatchedAgentFunction:
+    """Wraps an ordinary agent function, calling it once per board."""
+    def generate_moves(boards: np.ndarray, players: np.ndarray, timeout: float) -> np.ndarray:
+        return np.array([agent(board, player, timeout) for board, player in zip(boards, players)], dtype=np.intp)
+    return generate_moves
+
+
+def random_batched_agent(seed: Optional[int] = None) -> BatchedAgentFunction:
+    """Batched agent choosing uniformly among the open columns."""
+    rng = np.random.default_rng(seed)
+
+    def generate_moves(boards: np.ndarray, players: np.ndarray, timeout: float) -> np.ndarray:
+        keys = rng.random((len(boards), COLUMNS))
+        keys[boards[:, -1, :] != NO_PLAYER] = -1.0
+        return np.argmax(keys, axis=1)
+    return generate_moves
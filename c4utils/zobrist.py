@@ -0,0 +1,35 @@
+"""
+Zobrist hashing of boards.
+
+Every (player, row, column) gets a fixed random 64-bit number and a board hashes to the
+XOR of the numbers of its stones, so placing or removing a stone updates a hash with a
+single XOR. `GameState` keeps the hash of its board and of the mirrored board this way;
+the smaller of the two is a key shared by a position and its mirror image.
+"""
+import numpy as np
+
+from .c4_types import Board, Player, BOARD_SIZE, PLAYER1, PLAYER2
+
+ROWS, COLUMNS = BOARD_SIZE
+# Fixed seed, so hashes are stable across processes and runs
+ZOBRIST_SEED = 0xC4
+# ZOBRIST_KEYS[player - 1][row][col], as Python ints for fast incremental updates
+ZOBRIST_KEYS: list[list[list[int]]] = np.random.default_rng(ZOBRIST_SEED).integers(
+    0, 2 ** 64, size=(2, ROWS, COLUMNS), dtype=np.uint64, endpoint=False).tolist()
+
+
+def stone_hashes(player: Player, row: int, col: int) -> tuple[int, int]:
+    """Hash contributions of a stone to the board hash and to the mirrored board hash"""
+    keys = ZOBRIST_KEYS[int(player) - 1][row]
+    return keys[col], keys[COLUMNS - 1 - col]
+
+
+def hash_board(board: Board) -> tuple[int, int]:
+    """Zobrist hashes of a board and of its mirror image."""
+    board_hash = mirror_hash = 0
+    for player in (PLAYER1, PLAYER2):
+        for row, col in zip(*np.nonzero(board == player)):
+            stone_hash, stone_mirror_hash = stone_hashes(player, int(row), int(col))
+            board_hash ^= stone_hash
+            mirror_hash ^= stone_mirror_hash
+    return board_hash, mirror_hash
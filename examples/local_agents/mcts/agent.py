@@ -0,0 +1 @@
+from c4utils.agents.mcts import generate_move
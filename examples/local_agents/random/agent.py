@@ -0,0 +1,4 @@
+from c4utils.agent_sandbox.timeout import with_timeout
+from examples.agents.random_agent import generate_move as _generate_move
+
+generate_move = with_timeout(_generate_move)
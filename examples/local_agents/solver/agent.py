@@ -0,0 +1 @@
+from c4utils.agents.solver import generate_move
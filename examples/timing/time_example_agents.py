@@ -4,12 +4,15 @@ Timing examples and benchmarks for different agent implementations.
 import time
 from typing import Callable
 import numpy as np
-from c4utils.agent_sandbox.agent_runner import SandboxedAgent, get_move_time_from_container
+from c4utils.agent_sandbox.agent_runner import SandboxBackend, SandboxedAgent, get_move_time_from_container
+from c4utils.agent_sandbox.local import LocalAgent
 from c4utils.c4_types import Player
 from pathlib import Path
 
-def move_time_sandboxed_random_agent(timeout: float, iterations: int | None = None) -> list[float]:
-    with SandboxedAgent(Path('/workspace/examples/agent_random.sif')) as runner:
+LOCAL_AGENTS_DIR = Path(__file__).resolve().parents[1] / 'local_agents'
+
+def move_time_agent(sandbox: SandboxBackend, timeout: float, iterations: int | None = None) -> list[float]:
+    with sandbox as runner:
         board = np.zeros((6, 7), dtype=Player)
         player = Player(1)
         move_times = []
@@ -22,19 +25,22 @@ def move_time_sandboxed_random_agent(timeout: float, iterations: int | None = No
                 move_times.append(move_time)
     return move_times
 
+def move_time_sandboxed_random_agent(timeout: float, iterations: int | None = None) -> list[float]:
+    return move_time_agent(SandboxedAgent(Path('/workspace/examples/agent_random.sif')), timeout, iterations)
+
 def move_time_sandboxed_fixed_time_agent(timeout: float, iterations: int | None = None) -> list[float]:
-    with SandboxedAgent(Path('/workspace/examples/agent_fixed_time.sif')) as runner:
-        board = np.zeros((6, 7), dtype=Player)
-        player = Player(1)
-        move_times = []
-        if iterations is None:
-            move_time = get_move_time_from_container(runner, board, player, timeout)
-            move_times.append(move_time)
-        else: 
-            for _ in range(iterations):
-                move_time = get_move_time_from_container(runner, board, player, timeout)
-                move_times.append(move_time)
-    return move_times
+    return move_time_agent(SandboxedAgent(Path('/workspace/examples/agent_fixed_time.sif')), timeout, iterations)
+
+def move_time_local_random_agent(timeout: float, iterations: int | None = None) -> list[float]:
+    return move_time_agent(LocalAgent(LOCAL_AGENTS_DIR / 'random'), timeout, iterations)
+
+def move_time_local_fixed_time_agent(timeout: float, iterations: int | None = None) -> list[float]:
+    return move_time_agent(LocalAgent(LOCAL_AGENTS_DIR / 'fixed_time'), timeout, iterations)
+
+MOVE_TIME_FUNCS = {
+    'apptainer': [move_time_sandboxed_random_agent, move_time_sandboxed_fixed_time_agent],
+    'local': [move_time_local_random_agent, move_time_local_fixed_time_agent],
+}
 
 def print_results(move_time_func: Callable[[float, int | None], list[float]],
                   move_times: list[float], timeout: float, start_time: float, end_time: float):
@@ -44,16 +50,17 @@ def print_results(move_time_func: Callable[[float, int | None], list[float]],
         print(f'Sleep time: {timeout/2:.3f} seconds')
     print(f"Time taken: {end_time - start_time:.3f} seconds")
 
-def run_move_timing(timeout: float = 1.0, iterations: int = 10):
+def run_move_timing(timeout: float = 1.0, iterations: int = 10, backend: str = 'apptainer'):
+    move_time_funcs = MOVE_TIME_FUNCS[backend]
     print('Running agents in running container:')
-    for move_time_func in [move_time_sandboxed_random_agent, move_time_sandboxed_fixed_time_agent]:
+    for move_time_func in move_time_funcs:
         start_time = time.time()
         move_times = move_time_func(timeout, iterations)
         end_time = time.time()
         print_results(move_time_func, move_times, timeout, start_time, end_time)
         print('')
     print('Running agents in new container:')
-    for move_time_func in [move_time_sandboxed_random_agent, move_time_sandboxed_fixed_time_agent]:
+    for move_time_func in move_time_funcs:
         start_time = time.time()
         move_times = []
         for _ in range(iterations):
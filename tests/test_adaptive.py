@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from c4utils.adaptive import (AdaptiveScheduler, AdaptiveConfig, run_adaptive_tournament, sprt_llr, sprt_bounds,
+                              H0, H1)
+from c4utils.agents.solver import generate_move as solver_agent
+from c4utils.c4_types import PLAYER1, PLAYER2, NO_PLAYER, NO_WINNER_YET
+from c4utils.tournament import MatchResult
+from examples.agents.random_agent import generate_move as random_agent
+
+
+def failing_agent(board, player, timeout):
+    raise RuntimeError("broken submission")
+
+
+def simulate(scheduler, strengths, seed=0, batch=4):
+    rng = np.random.default_rng(seed)
+    while not scheduler.is_finished:
+        for match in scheduler.next_pairings(batch):
+            p = 1 / (1 + np.exp(strengths[match.player_2] - strengths[match.player_1]))
+            winner = PLAYER1 if rng.random() < p else PLAYER2
+            scheduler.record(MatchResult(match.match_id, match.player_1, match.player_2, winner))
+
+
+def test_sprt_decides_clear_and_even_matchups():
+    lower, upper = sprt_bounds(0.05, 0.05)
+    assert sprt_llr(60, 0, 10, 0, 50) >= upper
+    assert sprt_llr(10, 0, 60, 0, 50) <= lower
+    assert sprt_llr(500, 0, 500, 0, 50) <= lower
+    assert lower < sprt_llr(3, 1, 2, 0, 50) < upper
+    assert sprt_llr(0, 0, 0, 0, 50) == 0
+
+
+def test_adaptive_ranking_uses_fraction_of_round_robin():
+    strengths = np.linspace(0, 3, 12)
+    config = AdaptiveConfig(max_games_per_pair=100)
+    scheduler = AdaptiveScheduler(len(strengths), config)
+    simulate(scheduler, strengths)
+    assert scheduler.matches_played < 0.25 * 66 * config.max_games_per_pair
+    ranking = [rating.agent for rating in scheduler.ranking()]
+    assert ranking[:2] in ([11, 10], [10, 11]) and ranking[-2:] in ([1, 0], [0, 1])
+    assert np.corrcoef(ranking, np.arange(11, -1, -1))[0, 1] > 0.95
+    confidence = scheduler.adjacent_confidence()
+    assert len(confidence) == 11 and all(0.5 <= c <= 1 for c in confidence)
+
+
+def test_sprt_stops_decided_pairs():
+    scheduler = AdaptiveScheduler(2, AdaptiveConfig(min_games=10 ** 6))
+    simulate(scheduler, np.array([0.0, 3.0]))
+    decisions = scheduler.sprt_decisions()
+    assert decisions[1, 0] == H1 and decisions[0, 1] == H0
+    assert scheduler.matches_played < 100
+
+
+def test_pairings_spread_over_agents_and_alternate_colours():
+    scheduler = AdaptiveScheduler(6)
+    matches = scheduler.next_pairings(3)
+    agents = [agent for match in matches for agent in (match.player_1, match.player_2)]
+    assert sorted(agents) == list(range(6))
+    for match in matches:
+        scheduler.record(MatchResult(match.match_id, match.player_1, match.player_2, NO_PLAYER))
+    first = scheduler.first
+    for _ in range(20):
+        for match in scheduler.next_pairings(3):
+            scheduler.record(MatchResult(match.match_id, match.player_1, match.player_2, NO_PLAYER))
+    assert np.all(np.abs(first - first.T) <= 1)
+
+
+def test_failed_matches_are_capped_and_max_matches():
+    scheduler = AdaptiveScheduler(2, AdaptiveConfig(max_games_per_pair=5))
+    while not scheduler.is_finished:
+        for match in scheduler.next_pairings(2):
+            scheduler.record(MatchResult(match.match_id, match.player_1, match.player_2, NO_WINNER_YET,
+                                         error="AgentRuntimeError: failed to start"))
+    assert scheduler.matches_played == 0 and scheduler.matches_scheduled == 5
+
+    scheduler = AdaptiveScheduler(4, AdaptiveConfig(max_matches=7))
+    # A batch has every pair at most once
+    assert len(scheduler.next_pairings(10)) == 6
+    assert len(scheduler.next_pairings(10)) == 1
+    assert scheduler.is_finished and scheduler.next_pairings(1) == []
+
+
+def test_run_adaptive_tournament():
+    agents = [failing_agent, random_agent, solver_agent]
+    scheduler = AdaptiveScheduler(len(agents), AdaptiveConfig(min_games=6, max_games_per_pair=20))
+    results = list(run_adaptive_tournament(agents, scheduler, max_workers=2, move_timeout=0.05))
+    assert len(results) == scheduler.matches_scheduled == scheduler.matches_played
+    assert scheduler.is_finished
+    assert [rating.agent for rating in scheduler.ranking()] == [2, 1, 0]
+    assert len(results) < 3 * 20
+
+
+def test_scheduler_size_must_match_agents():
+    with pytest.raises(ValueError):
+        list(run_adaptive_tournament([random_agent, random_agent], AdaptiveScheduler(3)))
@@ -0,0 +1,55 @@
+import json
+import pytest
+
+from c4utils.benchmark import BenchmarkConfig, compare, flatten, main, run_benchmarks, sandbox_factory
+
+
+def test_compare_flags_slower_latency_and_lower_throughput():
+    baseline = {'results': {'local/worker': {'move_latency_seconds': {'p50': 1.0, 'p99': 2.0},
+                                             'moves_per_second_by_concurrency': {'1': 100.0, '2': 200.0}}}}
+    results = {'results': {'local/worker': {'move_latency_seconds': {'p50': 1.1, 'p99': 3.0},
+                                            'moves_per_second_by_concurrency': {'1': 50.0, '2': 300.0}}}}
+    regressions = compare(results, baseline, tolerance=0.2)
+    assert [r.metric for r in regressions] == [
+        'local/worker/move_latency_seconds/p99',
+        'local/worker/moves_per_second_by_concurrency/1',
+    ]
+
+
+def test_compare_ignores_metrics_missing_from_baseline():
+    results = {'results': {'local/start_stop': {'start_seconds': 1.0}}}
+    assert compare(results, {'results': {}}) == []
+
+
+def test_flatten():
+    assert flatten({'a': {'b': 1, 'c': {'d': 2}}, 'e': 3}) == {'a/b': 1, 'a/c/d': 2, 'e': 3}
+
+
+def test_apptainer_backend_needs_sif():
+    with pytest.raises(ValueError):
+        sandbox_factory('apptainer')
+
+
+def test_run_benchmarks_local_worker():
+    config = BenchmarkConfig(moves=5, cycles=1, max_concurrency=2, matches=1)
+    results = run_benchmarks({'local': sandbox_factory('local')}, ('worker',), config)
+    worker = results['results']['local/worker']
+    assert set(worker['move_latency_seconds']) == {'p50', 'p95', 'p99', 'mean'}
+    assert set(worker['moves_per_second_by_concurrency']) == {'1', '2'}
+    assert worker['matches']['matches_per_second'] > 0
+    assert results['results']['local/start_stop']['start_seconds'] >= 0
+    # Results are JSON serializable
+    json.dumps(results)
+
+
+def test_main_exits_nonzero_on_regression(tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    output = tmp_path / 'results.json'
+    args = ['--transport', 'worker', '--moves', '3', '--cycles', '1', '--max-concurrency', '1', '--matches', '1']
+    assert main([*args, '--output', str(baseline)]) == 0
+    # Pretend the baseline was impossibly fast
+    stored = json.loads(baseline.read_text())
+    stored['results']['local/worker']['move_latency_seconds']['p50'] = 1e-12
+    baseline.write_text(json.dumps(stored))
+    assert main([*args, '--output', str(output), '--baseline', str(baseline)]) == 1
+    assert output.exists()
@@ -0,0 +1,102 @@
+import pytest
+import numpy as np
+import c4utils.rules as rules
+import c4utils.bitboard as bitboard
+from c4utils.c4_types import Player, Move, BOARD_SIZE, NO_PLAYER, PLAYER1, PLAYER2
+
+
+def random_boards(count, seed=0):
+    """Plays random games and yields every position reached, including finished ones."""
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        board = np.zeros(BOARD_SIZE, dtype=Player)
+        player = PLAYER1
+        while True:
+            yield board
+            open_columns = np.flatnonzero(board[-1] == NO_PLAYER)
+            if len(open_columns) == 0 or rules.check_win_windows(board, PLAYER1) or rules.check_win_windows(board, PLAYER2):
+                break
+            board = rules.apply_move(board, Move(rng.choice(open_columns)), player)
+            player = PLAYER2 if player == PLAYER1 else PLAYER1
+
+
+@pytest.fixture
+def drawn_board():
+    return np.array([[1, 1, 1, 2, 1, 1, 1],
+                     [2, 2, 2, 1, 2, 2, 2],
+                     [1, 1, 1, 2, 1, 1, 1],
+                     [2, 2, 2, 1, 2, 2, 2],
+                     [1, 1, 1, 2, 1, 1, 1],
+                     [2, 2, 2, 1, 2, 2, 2]], dtype=Player)
+
+
+def test_board_round_trip():
+    for board in random_boards(20):
+        assert np.array_equal(bitboard.to_board(bitboard.from_board(board)), board)
+
+
+def test_check_win_matches_window_scan():
+    for board in random_boards(200, seed=1):
+        position = bitboard.from_board(board)
+        for player in (PLAYER1, PLAYER2):
+            assert bitboard.check_win(position, player) == rules.check_win_windows(board, player)
+
+
+def test_apply_move_matches_numpy():
+    for board in random_boards(20, seed=2):
+        position = bitboard.from_board(board)
+        player = bitboard.player_to_move(position)
+        for move in range(BOARD_SIZE[1]):
+            if board[-1, move] != NO_PLAYER:
+                continue
+            expected = rules.apply_move(board, Move(move), player)
+            assert np.array_equal(bitboard.to_board(bitboard.apply_move(position, Move(move), player)), expected)
+
+
+def test_is_valid_move_matches_numpy():
+    for board in random_boards(20, seed=3):
+        position = bitboard.from_board(board)
+        for move in [*map(Move, range(-1, 8)), 0, 1.0]:
+            for player in (PLAYER1, PLAYER2):
+                assert bitboard.is_valid_move(position, move, player) == rules.is_valid_move(board, move, player)
+
+
+def test_apply_move_on_full_column_raises(drawn_board):
+    with pytest.raises(ValueError):
+        bitboard.apply_move(bitboard.from_board(drawn_board), Move(0), PLAYER1)
+
+
+def test_check_winner_on_drawn_board(drawn_board):
+    assert bitboard.check_winner(bitboard.from_board(drawn_board)) == NO_PLAYER
+    assert bitboard.check_winner(bitboard.EMPTY_POSITION) is None
+
+
+def test_mirror_matches_fliplr():
+    for board in random_boards(20, seed=4):
+        mirrored = bitboard.mirror_position(bitboard.from_board(board))
+        assert np.array_equal(bitboard.to_board(mirrored), np.fliplr(board))
+
+
+def test_position_key_is_unique():
+    keys = {}
+    for board in random_boards(50, seed=5):
+        key = bitboard.position_key(bitboard.from_board(board))
+        assert keys.setdefault(key, board.tobytes()) == board.tobytes()
+
+
+def test_canonical_key_folds_mirror_images():
+    for board in random_boards(20, seed=6):
+        assert (bitboard.canonical_key(bitboard.from_board(board))
+                == bitboard.canonical_key(bitboard.from_board(np.fliplr(board))))
+
+
+def test_has_four_batch_matches_scalar():
+    rng = np.random.default_rng(7)
+    stones = rng.integers(0, 1 << 48, 1000, dtype=np.uint64) & np.uint64(bitboard.FULL_BOARD)
+    assert bitboard.has_four_batch(stones).tolist() == [bitboard.has_four(int(bits)) for bits in stones]
+
+
+def test_from_boards_matches_scalar():
+    boards = np.stack(list(random_boards(5, seed=8)))
+    player_1, player_2 = bitboard.from_boards(boards)
+    assert [(int(a), int(b)) for a, b in zip(player_1, player_2)] == [bitboard.from_board(b) for b in boards]
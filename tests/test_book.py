@@ -0,0 +1,69 @@
+import io
+import numpy as np
+import pytest
+
+from c4utils import bitboard
+from c4utils.book import OpeningBook, build_book, position_from_moves, write_book, NO_MOVE
+from c4utils.c4_types import Move
+
+SOLVER_OUTPUT = """\
+- 1 4
+1 -1 4
+12 2 2
+4453 -2 3
+445 0
+"""
+
+
+@pytest.fixture
+def book_path(tmp_path):
+    path = tmp_path / 'openings.book'
+    assert build_book(io.StringIO(SOLVER_OUTPUT), path) == 5
+    return path
+
+
+def test_lookup(book_path):
+    with OpeningBook(book_path) as book:
+        assert len(book) == 5
+        entry = book.lookup(position_from_moves('4453'))
+        assert (entry.value, entry.best_move) == (-2, Move(2))
+        assert book.lookup(position_from_moves('445')).best_move == NO_MOVE
+        assert book.lookup(position_from_moves('-')).best_move == Move(3)
+        assert position_from_moves('44') not in book
+
+
+def test_lookup_mirrored_position_mirrors_best_move(book_path):
+    with OpeningBook(book_path) as book:
+        # 7 6 is the mirror image of 1 2
+        entry = book.lookup(position_from_moves('76'))
+        assert (entry.value, entry.best_move) == (2, Move(5))
+        assert book.lookup(position_from_moves('12')).best_move == Move(1)
+        assert book.lookup(position_from_moves('7')).best_move == Move(3)
+
+
+def test_lookup_board(book_path):
+    board = bitboard.to_board(position_from_moves('4453'))
+    with OpeningBook(book_path) as book:
+        assert book.lookup_board(board).value == -2
+        assert book.lookup_board(np.fliplr(board)).best_move == Move(6 - 2)
+
+
+def test_records_are_sorted_and_deduplicated(tmp_path):
+    path = tmp_path / 'book'
+    assert write_book([(5, 1, 0), (3, 2, 1), (5, 7, 2)], path) == 2
+    with OpeningBook(path) as book:
+        assert book._find(5) == (1, 0)
+        assert book._find(3) == (2, 1)
+        assert book._find(4) is None
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / 'book'
+    path.write_bytes(b'not a book at all')
+    with pytest.raises(ValueError):
+        OpeningBook(path)
+
+
+def test_invalid_solver_output(tmp_path):
+    with pytest.raises(ValueError):
+        build_book(io.StringIO("48 1\n"), tmp_path / 'book')
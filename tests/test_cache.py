@@ -0,0 +1,46 @@
+import pytest
+
+from c4utils.cache import LRUCache
+
+
+def test_get_and_put():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('b', 0) == 0
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert cache.stats.evictions == 1
+    assert len(cache) == 2
+
+
+def test_get_or_compute_caches_none():
+    cache = LRUCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute('key', lambda: calls.append(1)) is None
+    assert len(calls) == 1
+    assert cache.stats.hit_rate == pytest.approx(2 / 3)
+
+
+def test_clear_keeps_stats():
+    cache = LRUCache()
+    cache.put('a', 1)
+    cache.get('a')
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats.hits == 1
+
+
+def test_max_size_must_be_positive():
+    with pytest.raises(ValueError):
+        LRUCache(max_size=0)
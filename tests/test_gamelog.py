@@ -0,0 +1,139 @@
+import json
+import numpy as np
+import pytest
+
+from c4utils.c4_types import Move, Player, PLAYER1, PLAYER2, NO_PLAYER, MoveTimeoutError, InvalidMoveError
+from c4utils.gamelog import (GameLogReader, GameLogWriter, GameRecord, Termination, pack_moves, unpack_moves,
+                             termination_from_error)
+from c4utils.match import _play_match
+from examples.agents.random_timeout_agent import generate_move_with_timeout as random_agent
+
+
+def random_games(count, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        n_moves = int(rng.integers(0, 43))
+        yield GameRecord(Player(rng.choice([PLAYER1, PLAYER2, NO_PLAYER])),
+                         rng.integers(0, 7, n_moves).astype(Move),
+                         Termination(i % len(Termination)),
+                         (i % 5, (i + 1) % 5),
+                         rng.random(n_moves).astype(np.float32) if i % 2 else None)
+
+
+def assert_same_game(actual, expected):
+    assert actual.winner == expected.winner
+    assert np.array_equal(actual.moves, expected.moves)
+    assert actual.termination == expected.termination
+    assert actual.agents == expected.agents
+    if expected.move_times is None:
+        assert actual.move_times is None
+    else:
+        assert np.array_equal(actual.move_times, expected.move_times)
+
+
+def test_pack_moves_round_trip():
+    for n_moves in range(43):
+        moves = np.arange(n_moves, dtype=Move) % 7
+        assert len(pack_moves(moves)) == (n_moves + 1) // 2
+        assert np.array_equal(unpack_moves(pack_moves(moves), n_moves), moves)
+
+
+def test_write_and_read(tmp_path):
+    path = tmp_path / 'games.c4log'
+    games = list(random_games(250))
+    with GameLogWriter(path, metadata={'agents': ['a', 'b']}, block_size=64) as log:
+        for game in games:
+            log.write(game)
+    with GameLogReader(path) as log:
+        assert log.metadata == {'agents': ['a', 'b']}
+        assert len(log) == 250
+        assert len(log.blocks) == 4
+        for actual, expected in zip(log, games, strict=True):
+            assert_same_game(actual, expected)
+
+
+def test_to_arrays(tmp_path):
+    path = tmp_path / 'games.c4log'
+    games = list(random_games(20))
+    with GameLogWriter(path) as log:
+        for game in games:
+            log.write(game)
+    with GameLogReader(path) as log:
+        arrays = log.to_arrays()
+    for i, game in enumerate(games):
+        n_moves = arrays['n_moves'][i]
+        assert np.array_equal(arrays['moves'][i, :n_moves], game.moves)
+        assert np.all(arrays['moves'][i, n_moves:] == -1)
+        assert arrays['winner'][i] == game.winner
+        assert tuple(arrays['agents'][i]) == game.agents
+
+
+def test_unclosed_log_is_readable_and_appendable(tmp_path):
+    path = tmp_path / 'games.c4log'
+    games = list(random_games(30))
+    log = GameLogWriter(path, block_size=10)
+    for game in games[:25]:
+        log.write(game)
+    # Simulate a crash: the two complete blocks are on disk, the index is not
+    log._file.close()
+    with GameLogReader(path) as reader:
+        assert len(reader) == 20
+    with GameLogWriter(path, append=True) as log:
+        for game in games[20:]:
+            log.write(game)
+        assert log.games_written == 30
+    with GameLogReader(path) as reader:
+        for actual, expected in zip(reader, games, strict=True):
+            assert_same_game(actual, expected)
+
+
+def test_truncated_block_is_ignored(tmp_path):
+    path = tmp_path / 'games.c4log'
+    log = GameLogWriter(path, block_size=10)
+    for game in random_games(20):
+        log.write(game)
+    log._file.close()
+    path.write_bytes(path.read_bytes()[:-5])
+    with GameLogReader(path) as reader:
+        assert len(reader) == 10
+
+
+def test_write_match_is_much_smaller_than_json(tmp_path):
+    path = tmp_path / 'games.c4log'
+    json_size = 0
+    with GameLogWriter(path) as log:
+        for _ in range(100):
+            winner, moves, error = _play_match(random_agent, random_agent)
+            log.write_match(winner, moves, error)
+            json_size += len(json.dumps({'winner': int(winner), 'moves': [int(m) for m in moves],
+                                         'error': None, 'termination': 'normal',
+                                         'agents': ['agent_1', 'agent_2']}))
+    assert path.stat().st_size * 5 < json_size
+
+
+def test_termination_from_error():
+    assert termination_from_error(None) == Termination.NORMAL
+    assert termination_from_error(MoveTimeoutError()) == Termination.TIMEOUT
+    assert termination_from_error(InvalidMoveError("Invalid move")) == Termination.INVALID_MOVE
+    assert termination_from_error(ValueError("Agent bug")) == Termination.ERROR
+    assert termination_from_error(RuntimeError()) == Termination.ERROR
+
+
+def test_termination_of_played_matches():
+    def full_column_agent(board, player, timeout):
+        return Move(0)
+
+    def value_error_agent(board, player, timeout):
+        raise ValueError("Agent bug")
+
+    _, _, error = _play_match(full_column_agent, full_column_agent)
+    assert termination_from_error(error) == Termination.INVALID_MOVE
+    _, _, error = _play_match(random_agent, value_error_agent)
+    assert termination_from_error(error) == Termination.ERROR
+
+
+def test_not_a_game_log(tmp_path):
+    path = tmp_path / 'games.c4log'
+    path.write_bytes(b'nothing here')
+    with pytest.raises(ValueError):
+        GameLogReader(path)
@@ -0,0 +1,147 @@
+import os
+import pytest
+from pathlib import Path
+
+from c4utils import journal as journal_module
+from c4utils.c4_types import Move, PLAYER1, PLAYER2, NO_WINNER_YET, AgentRuntimeError
+from c4utils.agent_sandbox.local import LocalAgent
+from c4utils.journal import TournamentJournal, replay
+from c4utils.tournament import MatchResult, ScheduledMatch, build_schedule, run_tournament
+from examples.agents.random_agent import generate_move as random_agent
+
+RANDOM_AGENT_DIR = Path(__file__).resolve().parents[1] / 'examples' / 'local_agents' / 'random'
+
+
+def leftmost_column_agent(board, player, timeout):
+    for col in range(board.shape[1]):
+        if board[-1, col] == 0:
+            return Move(col)
+
+
+def failing_sandbox_factory(path):
+    raise AgentRuntimeError("Sandbox is unavailable")
+
+
+def result(match_id, winner=PLAYER1):
+    return MatchResult(match_id, 0, 1, winner, [Move(3), Move(4)], None, 0.5)
+
+
+def test_replay_restores_state(tmp_path):
+    path = tmp_path / 'league.journal'
+    with TournamentJournal(path) as journal:
+        journal.schedule(build_schedule(2, repeats=2))
+        journal.start(0)
+        journal.start(1)
+        journal.finish(result(0, PLAYER2))
+    with TournamentJournal(path) as journal:
+        state = journal.state
+        assert sorted(state.scheduled) == [0, 1, 2, 3]
+        assert state.finished == {0: result(0, PLAYER2)}
+        assert isinstance(state.finished[0].moves[0], Move)
+        assert state.in_flight == {1}
+        assert [match.match_id for match in state.pending] == [1, 2, 3]
+
+
+def test_torn_last_record_is_dropped(tmp_path):
+    path = tmp_path / 'league.journal'
+    with TournamentJournal(path) as journal:
+        journal.schedule([ScheduledMatch(0, 0, 1)])
+        journal.finish(result(0))
+    with open(path, 'ab') as f:
+        f.write(b'{"type": "finished", "result": {"match_')
+    with TournamentJournal(path) as journal:
+        assert list(journal.state.finished) == [0]
+        journal.finish(result(1))
+    state, _ = replay(path)
+    assert sorted(state.finished) == [0, 1]
+
+
+def test_damaged_journal_raises(tmp_path):
+    path = tmp_path / 'league.journal'
+    with TournamentJournal(path) as journal:
+        journal.schedule([ScheduledMatch(0, 0, 1)])
+        journal.finish(result(0))
+    lines = path.read_bytes().splitlines(keepends=True)
+    path.write_bytes(lines[0] + b'garbage\n' + b''.join(lines[1:]))
+    with pytest.raises(ValueError):
+        TournamentJournal(path)
+
+
+def test_compact(tmp_path):
+    path = tmp_path / 'league.journal'
+    with TournamentJournal(path) as journal:
+        journal.schedule(build_schedule(2))
+        for match_id in (0, 1):
+            journal.start(match_id)
+        journal.finish(result(0))
+        size = path.stat().st_size
+        journal.compact()
+        assert path.stat().st_size < size
+        assert journal.state.in_flight == set()
+        journal.finish(result(1))
+    state, _ = replay(path)
+    assert sorted(state.finished) == [0, 1] and sorted(state.scheduled) == [0, 1]
+    assert not (tmp_path / 'league.journal.tmp').exists()
+
+
+def test_fsync_is_batched(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(journal_module.os, 'fsync', lambda fd: calls.append(fd))
+    with TournamentJournal(tmp_path / 'league.journal', sync_every=10, sync_interval=3600) as journal:
+        calls.clear()
+        for match_id in range(25):
+            journal.start(match_id)
+        assert len(calls) == 2
+    assert len(calls) == 3
+
+
+def test_tournament_resumes_from_journal(tmp_path):
+    path = tmp_path / 'league.journal'
+    agents = [random_agent, leftmost_column_agent]
+    schedule = build_schedule(2, repeats=4)
+
+    with TournamentJournal(path) as journal:
+        results = run_tournament(agents, schedule=schedule, max_workers=2, move_timeout=0.5, journal=journal)
+        first = [next(results) for _ in range(3)]
+        # The orchestrator stops with matches still running
+        results.close()
+
+    with TournamentJournal(path) as journal:
+        finished_before = dict(journal.state.finished)
+        assert len(finished_before) >= 3
+        resumed = list(run_tournament(agents, schedule=schedule, max_workers=2, move_timeout=0.5, journal=journal))
+    assert sorted(r.match_id for r in resumed) == list(range(len(schedule)))
+    # Finished matches are not played again
+    for r in first:
+        assert r in resumed
+    by_id = {r.match_id: r for r in resumed}
+    assert all(by_id[match_id] == r for match_id, r in finished_before.items())
+    state, _ = replay(path)
+    assert len(state.finished) == len(schedule) and not state.in_flight
+
+
+def test_setup_failures_are_played_again(tmp_path):
+    path = tmp_path / 'league.journal'
+    agents = [random_agent, RANDOM_AGENT_DIR]
+    with TournamentJournal(path) as journal:
+        failed = list(run_tournament(agents, max_workers=2, move_timeout=0.5, sandbox_factory=failing_sandbox_factory,
+                                     journal=journal))
+    assert all(r.winner == NO_WINNER_YET and "unavailable" in r.error for r in failed)
+    state, _ = replay(path)
+    assert not state.finished
+    assert [match.match_id for match in state.pending] == [0, 1]
+
+    with TournamentJournal(path) as journal:
+        resumed = list(run_tournament(agents, max_workers=2, move_timeout=0.5, sandbox_factory=LocalAgent,
+                                      journal=journal))
+    assert sorted(r.match_id for r in resumed) == [0, 1]
+    assert all(r.error is None and r.winner != NO_WINNER_YET for r in resumed)
+    state, _ = replay(path)
+    assert len(state.finished) == 2 and not state.pending
+
+
+def test_journal_of_other_schedule_is_rejected(tmp_path):
+    with TournamentJournal(tmp_path / 'league.journal') as journal:
+        journal.schedule([ScheduledMatch(0, 1, 0)])
+        with pytest.raises(ValueError):
+            list(run_tournament([random_agent, random_agent], journal=journal))
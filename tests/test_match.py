@@ -1,6 +1,9 @@
+import asyncio
+import time
 import pytest
 import numpy as np
-from c4utils.match import GameState, _play_match
+from c4utils import rules
+from c4utils.match import GameState, _play_match, _async_play_match
 from examples.agents.random_timeout_agent import generate_move_with_timeout as random_agent
 from c4utils.c4_types import BOARD_SIZE, PLAYER1, PLAYER2, Move, NO_PLAYER
 
@@ -89,4 +92,99 @@ def test_random_agent_does_not_fail(leftmost_column_agent):
     _, moves, error = _play_match(random_agent, leftmost_column_agent)
     print(moves)
     assert error is None
-    assert len(moves) >= 7
\ No newline at end of file
+    assert len(moves) >= 7
+
+
+def test_game_state_detects_draw_on_last_move():
+    board = np.array([[1, 1, 1, 2, 1, 1, 1],
+                      [2, 2, 2, 1, 2, 2, 2],
+                      [1, 1, 1, 2, 1, 1, 1],
+                      [2, 2, 2, 1, 2, 2, 2],
+                      [1, 1, 1, 2, 1, 1, 1],
+                      [2, 2, 2, 1, 2, 2, 0]])
+    game_state = GameState(board=board)
+    assert game_state.winner is None
+    game_state.update(Move(6))
+    assert game_state.winner == NO_PLAYER
+
+def test_game_state_matches_full_scan_over_random_game():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        game_state = GameState()
+        while not game_state.is_game_over:
+            open_columns = np.flatnonzero(game_state.board[-1] == NO_PLAYER)
+            game_state.update(Move(rng.choice(open_columns)))
+            assert game_state.winner == rules.check_winner(game_state.board)
+
+def test_game_state_copies_initial_board(board_after_first_move_0):
+    game_state = GameState(board=board_after_first_move_0)
+    game_state.push(Move(0))
+    assert board_after_first_move_0[1, 0] == NO_PLAYER
+    assert game_state.ply == 2
+    assert game_state.heights == [2, 0, 0, 0, 0, 0, 0]
+
+def test_game_state_pop_restores_position(win_on_next_move_board_player_1):
+    game_state = GameState(board=win_on_next_move_board_player_1)
+    game_state.push(Move(3))
+    assert game_state.winner == PLAYER1
+    assert game_state.pop() == Move(3)
+    assert game_state.winner is None
+    assert game_state.current_player == PLAYER1
+    assert np.array_equal(game_state.board, win_on_next_move_board_player_1)
+
+def test_game_state_pop_on_initial_position_fails():
+    with pytest.raises(ValueError):
+        GameState().pop()
+
+def test_game_state_push_fails_on_full_column():
+    game_state = GameState()
+    for _ in range(BOARD_SIZE[0]):
+        game_state.push(Move(0))
+    with pytest.raises(ValueError):
+        game_state.push(Move(0))
+    assert game_state.moves == [Move(0)] * BOARD_SIZE[0]
+
+def test_async_play_matches_run_concurrently(leftmost_column_agent):
+    async def slow_leftmost_agent(board, player, timeout):
+        await asyncio.sleep(0.01)
+        return leftmost_column_agent(board, player, timeout)
+
+    async def play_all():
+        return await asyncio.gather(*[_async_play_match(slow_leftmost_agent, slow_leftmost_agent) for _ in range(50)])
+
+    start_time = time.perf_counter()
+    results = asyncio.run(play_all())
+    # 50 matches of 19 moves would take at least 9.5 seconds if run one after the other
+    assert time.perf_counter() - start_time < 3
+    for winner, moves, error in results:
+        assert error is None
+        assert winner == PLAYER1
+        assert len(moves) == 19
+
+def test_async_play_match_fails_on_exception():
+    async def zero_agent(board, player, timeout):
+        return Move(0)
+
+    async def failing_agent(board, player, timeout):
+        return 1 / 0
+
+    winner, moves, error = asyncio.run(_async_play_match(zero_agent, failing_agent))
+    assert winner == PLAYER1
+    assert moves == [Move(0)]
+    assert isinstance(error, ZeroDivisionError)
+
+def test_game_state_hashes_match_fresh_state():
+    rng = np.random.default_rng(1)
+    for _ in range(10):
+        game_state = GameState()
+        hashes = [game_state.zobrist_hash]
+        while not game_state.is_game_over:
+            game_state.push(Move(rng.choice(np.flatnonzero(game_state.board[-1] == NO_PLAYER))))
+            fresh = GameState(board=game_state.board)
+            mirrored = GameState(board=np.fliplr(game_state.board))
+            assert game_state.zobrist_hash == fresh.zobrist_hash
+            assert game_state.key == mirrored.key
+            hashes.append(game_state.zobrist_hash)
+        while game_state.ply:
+            game_state.pop()
+            assert game_state.zobrist_hash == hashes[game_state.ply]
@@ -0,0 +1,88 @@
+import time
+import numpy as np
+
+from c4utils import bitboard
+from c4utils.agents.mcts import MCTSAgent, random_playouts, playout_throughput
+from c4utils.c4_types import Move, Player, BOARD_SIZE, PLAYER1, PLAYER2
+from c4utils.match import _play_match
+from examples.agents.random_agent import generate_move as random_agent
+
+
+def test_random_playouts_from_decided_positions():
+    rng = np.random.default_rng(0)
+    # Player 1 to move with three in a row on an otherwise empty board except
+    # for player 2's answers: the result depends on the playout, but every playout ends
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+    board[0, 0:3] = PLAYER1
+    board[1, 0:3] = PLAYER2
+    player_1, player_2 = bitboard.from_board(board)
+    results = random_playouts(np.full(2000, player_1, dtype=np.uint64),
+                              np.full(2000, player_1 | player_2, dtype=np.uint64), rng)
+    assert set(results.tolist()) <= {-1, 0, 1}
+    # Player 1 wins at once whenever the first random move goes to column 3
+    assert np.mean(results == 1) > 1 / 7
+
+
+def test_random_playout_on_last_cell_is_a_draw():
+    drawn = np.array([[1, 1, 1, 2, 1, 1, 1],
+                      [2, 2, 2, 1, 2, 2, 2],
+                      [1, 1, 1, 2, 1, 1, 1],
+                      [2, 2, 2, 1, 2, 2, 2],
+                      [1, 1, 1, 2, 1, 1, 1],
+                      [2, 2, 2, 1, 2, 2, 0]], dtype=Player)
+    player_1, player_2 = bitboard.from_board(drawn)
+    results = random_playouts(np.array([player_1], dtype=np.uint64),
+                              np.array([player_1 | player_2], dtype=np.uint64), np.random.default_rng(0))
+    assert results.tolist() == [0]
+
+
+def test_takes_immediate_win():
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+    board[0, 1:4] = PLAYER1
+    board[1, 1:4] = PLAYER2
+    assert MCTSAgent(seed=0)(board, PLAYER1, 0.1) in (Move(0), Move(4))
+
+
+def test_blocks_threat():
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+    board[0, 0:3] = PLAYER2
+    board[0, 5:7] = PLAYER1
+    board[1, 0] = PLAYER1
+    assert MCTSAgent(seed=0)(board, PLAYER1, 0.3) == Move(3)
+
+
+def test_respects_timeout_and_reports_throughput():
+    agent = MCTSAgent(seed=0)
+    start_time = time.perf_counter()
+    agent(np.zeros(BOARD_SIZE, dtype=Player), PLAYER1, 0.2)
+    assert time.perf_counter() - start_time < 0.2
+    assert agent.last_result.playouts > 0
+    assert agent.last_result.visits.sum() >= agent.last_result.playouts
+    assert agent.last_result.playouts_per_second > 0
+
+
+def test_root_parallelism():
+    with MCTSAgent(processes=2, seed=0) as agent:
+        move = agent(np.zeros(BOARD_SIZE, dtype=Player), PLAYER1, 0.3)
+        assert 0 <= move < BOARD_SIZE[1]
+        assert agent.last_result.visits.sum() >= agent.last_result.playouts
+
+
+def test_beats_random_agent():
+    winner, _, error = _play_match(MCTSAgent(seed=0), random_agent, move_timeout=0.1)
+    assert error is None
+    assert winner == PLAYER1
+
+
+def test_playout_throughput():
+    assert playout_throughput(batch_size=64, seconds=0.05, seed=0) > 0
+
+
+def test_last_empty_cell():
+    board = np.array([[1, 1, 1, 2, 1, 1, 1],
+                      [2, 2, 2, 1, 2, 2, 2],
+                      [1, 1, 1, 2, 1, 1, 1],
+                      [2, 2, 2, 1, 2, 2, 2],
+                      [1, 1, 1, 2, 1, 1, 1],
+                      [2, 2, 2, 1, 2, 2, 0]], dtype=Player)
+    assert MCTSAgent(seed=0)(board, PLAYER2, 0.05) == Move(6)
@@ -0,0 +1,121 @@
+import time
+import pytest
+from pathlib import Path
+from c4utils.agent_sandbox.agent_runner import DeadlinePolicy
+from c4utils.agent_sandbox.local import LocalAgent
+from c4utils.agent_sandbox.pool import AgentPool
+from c4utils.c4_types import MoveTimeoutError
+from c4utils.match import play_match
+
+RANDOM_AGENT_DIR = Path(__file__).resolve().parents[1] / 'examples' / 'local_agents' / 'random'
+STUCK_AGENT = "import time\ndef generate_move(board, player, timeout):\n    time.sleep(60)\n"
+
+
+class FakeAgent:
+    """Stands in for SandboxedAgent, records starts and stops"""
+    started = []
+    stopped = []
+
+    def __init__(self, sif_path: Path):
+        self.sif_path = sif_path
+
+    def start(self):
+        FakeAgent.started.append(self)
+        return self
+
+    def cleanup(self):
+        FakeAgent.stopped.append(self)
+
+
+@pytest.fixture(autouse=True)
+def reset_fake_agent():
+    FakeAgent.started = []
+    FakeAgent.stopped = []
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("Condition not reached in time")
+        time.sleep(0.01)
+
+
+def test_pool_reuses_instances():
+    pool = AgentPool(warm_instances=0, agent_factory=FakeAgent)
+    with pool.lease(Path('a.sif')) as first:
+        pass
+    with pool.lease(Path('a.sif')) as second:
+        pass
+    assert first is second
+    assert len(FakeAgent.started) == 1
+    pool.close()
+    assert FakeAgent.stopped == [first]
+
+
+def test_pool_keys_instances_by_sif():
+    pool = AgentPool(warm_instances=0, agent_factory=FakeAgent)
+    with pool.lease(Path('a.sif')) as agent_a, pool.lease(Path('b.sif')) as agent_b:
+        assert agent_a.sif_path != agent_b.sif_path
+    with pool.lease(Path('a.sif')) as agent:
+        assert agent is agent_a
+    pool.close()
+
+
+def test_pool_recycles_after_max_games():
+    pool = AgentPool(max_games_per_instance=2, warm_instances=0, agent_factory=FakeAgent)
+    agents = []
+    for _ in range(3):
+        with pool.lease(Path('a.sif')) as agent:
+            agents.append(agent)
+    assert agents[0] is agents[1]
+    assert agents[2] is not agents[0]
+    assert FakeAgent.stopped == [agents[0]]
+    pool.close()
+
+
+def test_pool_recycles_on_exception():
+    pool = AgentPool(warm_instances=0, agent_factory=FakeAgent)
+    with pytest.raises(RuntimeError):
+        with pool.lease(Path('a.sif')) as agent:
+            raise RuntimeError("match failed")
+    assert FakeAgent.stopped == [agent]
+    pool.close()
+
+
+def test_pool_recycles_unhealthy_instances():
+    pool = AgentPool(warm_instances=0, agent_factory=FakeAgent)
+    with pool.lease(Path('a.sif')) as agent:
+        pool.mark_unhealthy(agent)
+    assert FakeAgent.stopped == [agent]
+    with pool.lease(Path('a.sif')) as second:
+        assert second is not agent
+    pool.close()
+
+
+def test_play_match_recycles_timed_out_instances(tmp_path):
+    (tmp_path / 'agent.py').write_text(STUCK_AGENT)
+    with AgentPool(warm_instances=0, agent_factory=LocalAgent) as pool:
+        winner, moves, error = play_match(RANDOM_AGENT_DIR, tmp_path, move_timeout=0.1, pool=pool,
+                                          deadline_policy=DeadlinePolicy(margin=0.2))
+        assert isinstance(error, MoveTimeoutError)
+        assert pool.idle_count(tmp_path) == 0 and pool.idle_count(RANDOM_AGENT_DIR) == 0
+        winner, moves, error = play_match(RANDOM_AGENT_DIR, RANDOM_AGENT_DIR, move_timeout=0.5, pool=pool)
+        assert error is None
+        assert pool.idle_count(RANDOM_AGENT_DIR) == 2
+
+
+def test_pool_keeps_instances_warm():
+    with AgentPool(warm_instances=2, agent_factory=FakeAgent, refill_interval=0.01) as pool:
+        pool.warm(Path('a.sif'))
+        assert pool.idle_count(Path('a.sif')) == 2
+        with pool.lease(Path('a.sif')):
+            wait_for(lambda: pool.idle_count(Path('a.sif')) == 2)
+    assert len(FakeAgent.stopped) == len(FakeAgent.started) == 3
+
+
+def test_closed_pool_refuses_leases():
+    pool = AgentPool(agent_factory=FakeAgent)
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire(Path('a.sif'))
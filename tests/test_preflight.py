@@ -0,0 +1,117 @@
+import shutil
+from pathlib import Path
+import numpy as np
+import pytest
+
+from c4utils.agent_interface import validate_agent_function, validation_positions
+from c4utils.c4_types import Move, NO_PLAYER
+from c4utils.preflight import (PreflightConfig, PreflightCache, content_hash, preflight_agent, run_preflight,
+                               STAGE_START, STAGE_INTERFACE, STAGE_MOVES)
+from examples.agents.random_agent import generate_move as random_agent
+
+RANDOM_AGENT_DIR = Path(__file__).resolve().parents[1] / 'examples' / 'local_agents' / 'random'
+CONFIG = PreflightConfig(move_timeout=1.0, positions=8, calibration_samples=2)
+
+
+def write_agent(directory: Path, source: str) -> Path:
+    directory.mkdir(parents=True)
+    (directory / 'agent.py').write_text(source)
+    return directory
+
+
+def test_validate_agent_function():
+    assert validate_agent_function(random_agent, 1.0) == (True, None)
+    assert validate_agent_function(lambda board, player, timeout: Move(7), 1.0) == (False, None)
+    valid, error = validate_agent_function(lambda board, player, timeout: 1 / 0, 1.0)
+    assert not valid and isinstance(error, ZeroDivisionError)
+
+
+def test_validation_positions_are_distinct_and_open():
+    positions = validation_positions(50, seed=1)
+    assert len({board.tobytes() for board, _ in positions}) == 50
+    for board, player in positions:
+        assert (board[-1] == NO_PLAYER).any()
+        assert player == (1 if np.count_nonzero(board) % 2 == 0 else 2)
+
+
+def test_content_hash(tmp_path):
+    agent = shutil.copytree(RANDOM_AGENT_DIR, tmp_path / 'agent', ignore=shutil.ignore_patterns('__pycache__'))
+    digest = content_hash(agent)
+    assert digest == content_hash(RANDOM_AGENT_DIR)
+    (agent / 'agent.py').write_text((agent / 'agent.py').read_text() + '\n')
+    assert content_hash(agent) != digest
+
+
+def test_preflight_valid_agent():
+    result = preflight_agent(RANDOM_AGENT_DIR, CONFIG)
+    assert result.valid, result.error
+    assert result.positions_checked == CONFIG.positions + 2
+    assert 0 <= result.move_time_median <= result.move_time_max < CONFIG.move_timeout
+    assert result.exec_overhead > 0 and result.worker_overhead > 0
+    assert result.deadline_policy(transport='worker').overhead == result.worker_overhead
+
+
+SLOW_AGENT = ("import time\ndef generate_move(board, player, timeout):\n    time.sleep(timeout * 1.5)\n"
+              "    return int((board[-1] == 0).argmax())\n")
+
+
+@pytest.mark.parametrize("source, stage, retryable", [
+    ("import does_not_exist\n", STAGE_INTERFACE, False),
+    ("def generate_move(board, player, timeout):\n    return 7\n", STAGE_MOVES, False),
+    (SLOW_AGENT, STAGE_MOVES, True),
+])
+def test_preflight_invalid_agents(tmp_path, source, stage, retryable):
+    result = preflight_agent(write_agent(tmp_path / 'agent', source), PreflightConfig(move_timeout=0.2, positions=2))
+    assert not result.valid
+    assert result.failed_stage == stage
+    assert result.retryable == retryable
+
+
+def test_preflight_missing_agent(tmp_path):
+    (tmp_path / 'empty').mkdir()
+    result = preflight_agent(tmp_path / 'empty', CONFIG)
+    assert not result.valid and result.failed_stage == STAGE_START and result.retryable
+
+
+def test_run_preflight_does_not_cache_retryable_failures(tmp_path):
+    slow = write_agent(tmp_path / 'slow', SLOW_AGENT)
+    broken = write_agent(tmp_path / 'broken', "import does_not_exist\n")
+    (tmp_path / 'empty').mkdir()
+    config = PreflightConfig(move_timeout=0.2, positions=2)
+    cache_dir = tmp_path / 'cache'
+    first = {r.agent: r for r in run_preflight([slow, broken, tmp_path / 'empty'], config, cache_dir)}
+    assert not any(r.valid for r in first.values())
+    second = {r.agent: r for r in run_preflight([slow, broken, tmp_path / 'empty'], config, cache_dir)}
+    assert second[str(broken)].cached
+    assert not second[str(slow)].cached and not second[str(tmp_path / 'empty')].cached
+
+
+def test_run_preflight_caches_by_content(tmp_path):
+    copies = [shutil.copytree(RANDOM_AGENT_DIR, tmp_path / name, ignore=shutil.ignore_patterns('__pycache__'))
+              for name in ('a', 'b')]
+    broken = write_agent(tmp_path / 'broken', "def generate_move(board, player, timeout):\n    return -1\n")
+    cache_dir = tmp_path / 'cache'
+
+    first = {r.agent: r for r in run_preflight([*copies, broken], CONFIG, cache_dir, max_workers=2)}
+    assert set(first) == {str(copies[0]), str(copies[1]), str(broken)}
+    assert first[str(copies[0])].valid and first[str(copies[1])].valid and not first[str(broken)].valid
+    # Identical submissions are validated once
+    assert len(list(cache_dir.glob('*.json'))) == 2
+
+    second = {r.agent: r for r in run_preflight([*copies, broken], CONFIG, cache_dir)}
+    assert all(r.cached for r in second.values())
+    assert second[str(copies[0])].exec_overhead == first[str(copies[0])].exec_overhead
+    assert not second[str(broken)].valid
+
+    # Changed content or settings are validated again
+    (copies[1] / 'agent.py').write_text((copies[1] / 'agent.py').read_text() + '\n')
+    third = {r.agent: r for r in run_preflight(copies, CONFIG, cache_dir)}
+    assert third[str(copies[0])].cached and not third[str(copies[1])].cached
+    fourth = list(run_preflight(copies[:1], PreflightConfig(positions=1, calibration_samples=1), cache_dir))
+    assert not fourth[0].cached
+
+
+def test_cache_ignores_corrupt_entries(tmp_path):
+    cache = PreflightCache(tmp_path)
+    cache.path('abc', CONFIG).write_text('{')
+    assert cache.get('abc', CONFIG) is None
@@ -0,0 +1,53 @@
+import io
+import pytest
+import numpy as np
+from c4utils.agent_sandbox import protocol
+from c4utils.c4_types import Player, Move, BOARD_SIZE, PLAYER2
+
+
+@pytest.fixture
+def board():
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+    board[0, :3] = 1
+    board[1, :2] = 2
+    return board
+
+
+def test_request_round_trip(board):
+    data = protocol.encode_request(7, board, PLAYER2, 0.25)
+    assert len(data) == protocol.REQUEST.size
+    request = protocol.decode_request(data)
+    assert request.request_id == 7
+    assert request.kind == protocol.MOVE_REQUEST
+    assert request.player == PLAYER2
+    assert request.timeout == 0.25
+    assert np.array_equal(request.board, board)
+    assert request.board.flags.writeable
+
+
+def test_request_rejects_wrong_board_shape(board):
+    with pytest.raises(ValueError):
+        protocol.encode_request(1, board.T, PLAYER2, 1.)
+
+
+def test_reply_round_trip():
+    reply = protocol.decode_reply(protocol.encode_reply(3, protocol.STATUS_OK, 5, 0.125))
+    assert reply == protocol.Reply(3, protocol.STATUS_OK, Move(5), 0.125)
+    assert isinstance(reply.move, Move)
+
+
+def test_error_reply_carries_description():
+    stream = io.BytesIO()
+    protocol.write_error(stream, 4, "boom", "Traceback ...")
+    stream.seek(0)
+    reply = protocol.read_reply(stream)
+    assert reply.status == protocol.STATUS_ERROR
+    assert reply.request_id == 4
+    assert reply.error == {'error': "boom", 'traceback': "Traceback ..."}
+    assert protocol.read_reply(stream) is None
+
+
+def test_truncated_stream_raises(board):
+    stream = io.BytesIO(protocol.encode_request(1, board, PLAYER2, 1.)[:-1])
+    with pytest.raises(EOFError):
+        protocol.read_request(stream)
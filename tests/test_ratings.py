@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from c4utils.c4_types import NO_PLAYER, NO_WINNER_YET, PLAYER1, PLAYER2
+from c4utils.ratings import RatingModel, ELO_SCALE, match_arrays, rate
+from c4utils.tournament import MatchResult
+
+
+def simulate(strengths, n_results, seed=0):
+    rng = np.random.default_rng(seed)
+    n = len(strengths)
+    a = rng.integers(n, size=n_results)
+    b = (a + rng.integers(1, n, size=n_results)) % n
+    p = 1 / (1 + np.exp(strengths[b] - strengths[a]))
+    return a, b, (rng.random(n_results) < p).astype(float)
+
+
+def test_recovers_strengths():
+    strengths = np.linspace(-2, 2, 10)
+    model = rate(*simulate(strengths, 200_000))
+    expected = ELO_SCALE * (strengths - strengths.mean()) + model.base
+    assert np.allclose(model.ratings, expected, atol=15)
+    assert [r.agent for r in model.ranking()] == list(range(9, -1, -1))
+
+
+def test_confidence_intervals_cover_true_ratings():
+    strengths = np.random.default_rng(1).normal(0, 1, 20)
+    expected = ELO_SCALE * (strengths - strengths.mean()) + 1500
+    covered = 0
+    for seed in range(10):
+        lower, upper = rate(*simulate(strengths, 5_000, seed)).confidence_intervals(0.95)
+        covered += np.count_nonzero((lower <= expected) & (expected <= upper))
+    # 95% intervals, up to the shrinkage of the prior
+    assert covered >= 0.88 * 200
+
+
+def test_incremental_updates_match_batch_fit():
+    a, b, score = simulate(np.linspace(-1, 1, 8), 50_000)
+    model = RatingModel()
+    for start in range(0, len(a), 5_000):
+        model.update(a[start:start + 5_000], b[start:start + 5_000], score[start:start + 5_000])
+    assert model.iterations < 10
+    batch = rate(a, b, score)
+    assert np.allclose(model.log_strengths, batch.log_strengths)
+    assert np.allclose(model.stderr, batch.stderr)
+
+
+def test_unbeaten_agent_has_finite_rating():
+    model = rate([0, 0, 1], [1, 2, 2], [1.0, 1.0, 0.5])
+    assert np.all(np.isfinite(model.ratings))
+    assert model.ratings[0] > model.ratings[1] == pytest.approx(model.ratings[2])
+    assert model.expected_score(np.array([0]), np.array([1]))[0] > 0.5
+
+
+def test_uncertainty_shrinks_with_games():
+    a, b, score = simulate(np.zeros(4), 400)
+    few = rate(a[:40], b[:40], score[:40])
+    many = rate(a, b, score)
+    assert np.all(many.stderr < few.stderr)
+    assert many.difference_stderr(0, 1) < few.difference_stderr(0, 1)
+
+
+def test_draws_and_growing_agent_set():
+    model = rate([0], [1], [0.5])
+    assert model.ratings[0] == pytest.approx(model.ratings[1])
+    model.update([2], [0], [1.0])
+    assert model.n_agents == 3 and model.games.tolist() == [2, 1, 1]
+
+
+def test_invalid_results():
+    with pytest.raises(ValueError):
+        rate([0], [0], [1.0])
+    with pytest.raises(ValueError):
+        rate([0], [1], [2.0])
+    assert RatingModel().ranking() == []
+
+
+def test_match_arrays():
+    results = [MatchResult(0, 0, 1, PLAYER1), MatchResult(1, 1, 2, PLAYER2), MatchResult(2, 2, 0, NO_PLAYER),
+               MatchResult(3, 0, 2, NO_WINNER_YET, error='AgentRuntimeError: failed to start')]
+    a, b, score = match_arrays(results)
+    assert a.tolist() == [0, 1, 2] and b.tolist() == [1, 2, 0] and score.tolist() == [1.0, 0.0, 0.5]
@@ -1,7 +1,8 @@
 import pytest
 import numpy as np
 import c4utils.rules as rules
-from c4utils.c4_types import Player, Move, BOARD_SIZE, NO_PLAYER, PLAYER1, PLAYER2
+from c4utils import bitboard
+from c4utils.c4_types import Player, Move, BOARD_SIZE, NO_PLAYER, NO_WINNER_YET, PLAYER1, PLAYER2
 
 
 @pytest.fixture
@@ -163,3 +164,82 @@ def test_yield_all_windows():
                         np.array([5, 6, 7, 8])]
     for idx, window in enumerate(rules.yield_all_windows(test_array, 4)):
         assert np.array_equal(window, expected_windows[idx])
+
+def test_check_win_at_finds_line_through_cell(horizontal_win_boards):
+    row, col = np.argwhere(horizontal_win_boards == PLAYER1)[0]
+    assert rules.check_win_at(horizontal_win_boards, row, col, PLAYER1)
+    assert rules.check_win_at(horizontal_win_boards.T, col, row, PLAYER1)
+
+
+def test_check_win_at_finds_diagonal(diagonal_win_boards):
+    for row, col in np.argwhere(diagonal_win_boards == PLAYER1)[:4]:
+        if rules.check_win_at(diagonal_win_boards, row, col, PLAYER1):
+            return
+    pytest.fail("No winning cell found on diagonal board")
+
+
+def test_check_win_at_ignores_other_lines(filled_board):
+    assert not rules.check_win_at(filled_board, 3, 4, PLAYER2)
+
+@pytest.fixture
+def random_positions():
+    rng = np.random.default_rng(0)
+    positions = []
+    for _ in range(100):
+        board = np.zeros(BOARD_SIZE, dtype=Player)
+        player = PLAYER1
+        while rules.check_winner(board) is None:
+            positions.append(board)
+            move = Move(rng.choice(np.flatnonzero(board[-1] == NO_PLAYER)))
+            board = rules.apply_move(board, move, player)
+            player = PLAYER2 if player == PLAYER1 else PLAYER1
+        positions.append(board)
+    return np.stack(positions)
+
+
+def test_check_winner_batch_matches_scalar(random_positions, drawn_board):
+    boards = np.concatenate([random_positions, drawn_board[None]])
+    winners = rules.check_winner_batch(boards, chunk_size=97)
+    expected = [rules.check_winner(board) for board in boards]
+    assert [None if w == NO_WINNER_YET else w for w in winners] == expected
+
+
+def test_check_winner_batch_on_transposed_boards(horizontal_win_boards):
+    assert rules.check_winner_batch(horizontal_win_boards.T[None]).tolist() == [PLAYER1]
+
+
+def test_valid_moves_batch(random_positions):
+    valid = rules.valid_moves_batch(random_positions)
+    assert valid.shape == (len(random_positions), BOARD_SIZE[1])
+    for board, valid_row in zip(random_positions, valid):
+        player = PLAYER1 if np.count_nonzero(board == NO_PLAYER) % 2 == 0 else PLAYER2
+        expected = [rules.is_valid_move(board, Move(col), player) for col in range(BOARD_SIZE[1])]
+        assert valid_row.tolist() == expected
+
+
+def test_apply_moves_batch_matches_scalar(random_positions):
+    rng = np.random.default_rng(1)
+    valid = rules.valid_moves_batch(random_positions)
+    boards = random_positions[valid.any(axis=1)]
+    moves = np.array([rng.choice(np.flatnonzero(v)) for v in rules.valid_moves_batch(boards)])
+    players = np.where(np.arange(len(boards)) % 2 == 0, PLAYER1, PLAYER2).astype(Player)
+    new_boards = rules.apply_moves_batch(boards, moves, players, chunk_size=13)
+    for board, move, player, new_board in zip(boards, moves, players, new_boards):
+        assert np.array_equal(new_board, rules.apply_move(board, Move(move), player))
+
+
+def test_apply_moves_batch_fails_on_full_column(drawn_board):
+    with pytest.raises(ValueError):
+        rules.apply_moves_batch(drawn_board[None], np.array([0]), PLAYER1)
+
+
+def test_check_winner_cached(random_positions):
+    cache = rules.LRUCache(max_size=1000)
+    keys = [bitboard.canonical_key(bitboard.from_board(board)) for board in random_positions[:200]]
+    for board, key in zip(random_positions[:200], keys):
+        assert rules.check_winner_cached(board, key, cache) == rules.check_winner(board)
+    misses = cache.stats.misses
+    for board, key in zip(random_positions[:200], keys):
+        assert rules.check_winner_cached(board, key, cache) == rules.check_winner(board)
+    assert cache.stats.misses == misses
+    assert cache.stats.hits == 200 + (200 - misses)
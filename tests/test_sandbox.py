@@ -1,11 +1,26 @@
+import asyncio
+import os
+import shutil
+import sys
+import time
 import pytest
 from time import sleep
 from pathlib import Path
 import numpy as np
-from c4utils.agent_sandbox.timeout import with_timeout, MoveTimeoutError
+from concurrent.futures import ThreadPoolExecutor
+from c4utils.agent_sandbox.timeout import with_timeout, with_hard_timeout, timeout as deadline, MoveTimeoutError
 from c4utils.c4_types import Player, Move
 from c4utils.match import _play_match
-from c4utils.agent_sandbox.agent_runner import SandboxedAgent, get_generate_move_func_from_container
+from c4utils.agent_sandbox.agent_runner import (SandboxedAgent, AgentWorker, get_generate_move_func_from_container,
+                                                get_generate_move_func_from_worker)
+from c4utils.c4_types import AgentRuntimeError, PLAYER1, PLAYER2
+from c4utils.match import ChessClock
+from c4utils.agent_sandbox.async_runner import AsyncAgentWorker, AsyncSandboxedAgent
+from c4utils.agent_sandbox.local import LocalAgent, ResourceLimits
+from c4utils.agent_sandbox.agent_runner import (get_move_from_container, DeadlinePolicy,
+                                                calibrate_container_deadline, calibrate_worker_deadline,
+                                                container_deadline_policy)
+from c4utils.tournament import run_tournament
 from examples.agents.random_agent import generate_move as random_agent
 from examples.timing.time_example_agents import move_time_sandboxed_random_agent, move_time_sandboxed_fixed_time_agent
 import subprocess
@@ -25,6 +40,19 @@ def fixed_time_sandbox():
     assert path.exists(), f"SIF file not found at {path}"
     return path
 
+@pytest.fixture(scope='session')
+def local_agents_dir():
+    return Path(__file__).resolve().parents[1] / 'examples' / 'local_agents'
+
+@pytest.fixture
+def local_worker_env():
+    """Environment for stand-in worker processes that run outside of a container"""
+    repo_root = str(Path(__file__).resolve().parents[1])
+    return {**os.environ, 'PYTHONPATH': os.pathsep.join([repo_root, os.environ.get('PYTHONPATH', '')])}
+
+def local_worker_command(module: str, function: str = 'generate_move') -> list[str]:
+    return [sys.executable, '-m', 'c4utils.agent_sandbox.worker', '--module', module, '--function', function]
+
 # Timeout Tests
 @pytest.mark.parametrize("sleep_time, should_raise", [
     (0.5, False),  # Should not raise
@@ -57,6 +85,63 @@ def test_time_out_with_agents(agent_func, expected_move):
     move = agent_with_timeout(board, player, timeout)
     assert expected_move(move)
 
+def test_time_out_interrupts_python_loop():
+    start = time.perf_counter()
+    with pytest.raises(MoveTimeoutError):
+        with deadline(0.1):
+            while True:
+                pass
+    assert time.perf_counter() - start < 0.5
+
+def test_time_out_concurrent_deadlines():
+    @with_timeout
+    def busy(a, b, timeout):
+        end = time.perf_counter() + a
+        while time.perf_counter() < end:
+            pass
+        return b
+
+    def call(i):
+        # Even calls finish well within their deadline, odd calls overrun theirs
+        try:
+            return busy(0.05 if i % 2 == 0 else 1.0, i, 0.3)
+        except MoveTimeoutError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(call, range(16)))
+    assert results == [i if i % 2 == 0 else None for i in range(16)]
+
+def test_time_out_not_raised_after_block():
+    for _ in range(200):
+        with deadline(0.001):
+            pass
+    # Expired deadlines of finished blocks must not fire later
+    sleep(0.05)
+
+# Hard timeouts run the function in a fresh process, so it must be defined at module level
+@with_hard_timeout
+def stuck(a, b, timeout):
+    sleep(a)
+    return b
+
+def test_hard_time_out():
+    assert stuck(0, 3, 1) == 3
+    start = time.perf_counter()
+    with pytest.raises(MoveTimeoutError):
+        stuck(10, 3, 0.2)
+    assert time.perf_counter() - start < 2
+
+def test_hard_time_out_from_worker_threads():
+    # The deadline timer thread is running, and other threads are busy
+    with deadline(1):
+        pass
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(stuck, 0, index, 2) for index in range(4)]
+        assert [future.result() for future in futures] == list(range(4))
+        with pytest.raises(MoveTimeoutError):
+            executor.submit(stuck, 10, 0, 0.2).result()
+
 # Sandbox Tests
 @pytest.mark.integration
 @pytest.mark.parametrize("sandbox_fixture, expected_move", [
@@ -127,3 +212,211 @@ def test_container_cleanup(agent_fixture, request):
         text=True, check=True
     )
     assert instance_name not in result.stdout, "Container instance still running after cleanup"
+
+# Persistent Worker Tests
+def test_local_worker_answers_moves(local_worker_env):
+    with AgentWorker(local_worker_command('examples.agents.random_agent'), env=local_worker_env) as worker:
+        board = np.zeros((6, 7), dtype=Player)
+        for _ in range(5):
+            move = worker.request_move(board, Player(1), 1.)
+            assert 0 <= move <= 6
+
+def test_local_worker_plays_match(local_worker_env):
+    with AgentWorker(local_worker_command('examples.agents.random_agent'), env=local_worker_env) as player1, \
+            AgentWorker(local_worker_command('examples.agents.random_timeout_agent', 'generate_move_with_timeout'),
+                        env=local_worker_env) as player2:
+        winner, moves, error = _play_match(get_generate_move_func_from_worker(player1),
+                                           get_generate_move_func_from_worker(player2), move_timeout=0.5)
+        assert error is None
+        assert len(moves) >= 7
+
+def test_local_worker_reports_agent_errors(local_worker_env):
+    with AgentWorker(local_worker_command('examples.agents.random_agent'), env=local_worker_env) as worker:
+        with pytest.raises(AgentRuntimeError):
+            worker.request_move(np.ones((6, 7), dtype=Player), Player(1), 1.)
+        # The worker survives agent exceptions
+        assert 0 <= worker.request_move(np.zeros((6, 7), dtype=Player), Player(1), 1.) <= 6
+
+def test_local_worker_fails_on_missing_agent(local_worker_env):
+    with pytest.raises(AgentRuntimeError):
+        AgentWorker(local_worker_command('examples.agents.no_such_agent'), env=local_worker_env).start()
+
+def test_async_local_workers_serve_concurrent_requests(local_worker_env):
+    async def run():
+        workers = [AsyncAgentWorker(local_worker_command('examples.agents.fixed_time_agent'), env=local_worker_env)
+                   for _ in range(4)]
+        for worker in workers:
+            await worker.start()
+        try:
+            board = np.zeros((6, 7), dtype=Player)
+            start_time = time.perf_counter()
+            moves = await asyncio.gather(*[worker.request_move(board, Player(1), 0.4) for worker in workers])
+            elapsed = time.perf_counter() - start_time
+        finally:
+            for worker in workers:
+                await worker.close()
+        return moves, elapsed
+
+    moves, elapsed = asyncio.run(run())
+    assert moves == [Move(0)] * 4
+    # Each agent sleeps for half the timeout; sequential requests would take 0.8 seconds
+    assert elapsed < 0.6
+
+def test_async_sandboxed_agent_del_does_not_block(monkeypatch):
+    def blocking_call(*args, **kwargs):
+        raise AssertionError("__del__ ran a blocking subprocess")
+    monkeypatch.setattr(subprocess, 'run', blocking_call)
+    monkeypatch.setattr(AsyncSandboxedAgent, 'cleanup', blocking_call)
+    agent = AsyncSandboxedAgent(Path('agent.sif'))
+    agent._running = True
+    with pytest.warns(ResourceWarning, match=agent.instance_name):
+        agent.__del__()
+    agent._running = False
+
+# Local Backend Tests
+def test_local_agent_exec_command(local_agents_dir):
+    with LocalAgent(local_agents_dir / 'random') as runner:
+        assert runner.exec_command("print('hello')") == "hello"
+
+def test_local_agent_cleans_up_work_dir(local_agents_dir):
+    with LocalAgent(local_agents_dir / 'random') as runner:
+        work_dir = Path(runner.work_dir)
+        assert work_dir.is_dir()
+    assert not work_dir.exists()
+
+@pytest.mark.parametrize("agent_name, expected_move", [
+    ("random", lambda move: 0 <= move <= 6),
+    ("fixed_time", lambda move: move == Move(0))
+])
+def test_local_agent_moves(local_agents_dir, agent_name, expected_move):
+    board = np.zeros((6, 7), dtype=Player)
+    with LocalAgent(local_agents_dir / agent_name) as runner:
+        assert expected_move(get_move_from_container(runner, board, Player(1), 0.2))
+        with runner.start_worker() as worker:
+            assert expected_move(worker.request_move(board, Player(1), 0.2))
+
+def test_match_between_local_agents(local_agents_dir):
+    with LocalAgent(local_agents_dir / 'random') as player1, LocalAgent(local_agents_dir / 'random') as player2:
+        with player1.start_worker() as worker1, player2.start_worker() as worker2:
+            winner, moves, error = _play_match(get_generate_move_func_from_worker(worker1),
+                                               get_generate_move_func_from_worker(worker2), move_timeout=0.5)
+    assert error is None
+    assert len(moves) >= 7
+
+def test_local_agent_enforces_memory_limit(local_agents_dir):
+    limits = ResourceLimits(memory_bytes=512 * 1024 ** 2)
+    with LocalAgent(local_agents_dir / 'random', limits=limits) as runner:
+        with pytest.raises(AgentRuntimeError, match="MemoryError"):
+            runner.exec_command("x = bytearray(1024 ** 3)")
+
+@pytest.mark.parametrize("has_prlimit, new_namespace, python", [
+    (True, False, sys.executable),
+    (False, False, sys.executable),
+    # The setrlimit wrapper must search PATH for the next command
+    (False, True, sys.executable),
+    (False, False, 'python3'),
+])
+def test_local_agent_limits_set_in_child(local_agents_dir, monkeypatch, has_prlimit, new_namespace, python):
+    if not has_prlimit:
+        which = shutil.which
+        monkeypatch.setattr('c4utils.agent_sandbox.local.shutil.which',
+                            lambda name: None if name == 'prlimit' else which(name))
+    limits = ResourceLimits(cpu_seconds=30, open_files=64)
+    with LocalAgent(local_agents_dir / 'random', limits=limits, new_namespace=new_namespace, python=python) as runner:
+        assert 'preexec_fn' not in runner.process_options()
+        assert (runner.exec_python_command('')[0] == 'prlimit') == has_prlimit
+        output = runner.exec_command("import resource; print(resource.getrlimit(resource.RLIMIT_CPU)[0], "
+                                     "resource.getrlimit(resource.RLIMIT_NOFILE)[0])")
+    assert output == "30 64"
+
+def test_local_agent_requires_agent_module(tmp_path):
+    with pytest.raises(AgentRuntimeError):
+        LocalAgent(tmp_path).start()
+
+# Deadline Tests
+STUCK_AGENT = """
+import time
+
+def generate_move(board, player, timeout):
+    time.sleep(60)
+"""
+
+@pytest.fixture
+def stuck_agent_dir(tmp_path):
+    (tmp_path / 'agent.py').write_text(STUCK_AGENT)
+    return tmp_path
+
+def test_stuck_worker_is_killed_at_deadline(stuck_agent_dir):
+    with LocalAgent(stuck_agent_dir) as runner, runner.start_worker() as worker:
+        move_func = get_generate_move_func_from_worker(worker, DeadlinePolicy(margin=0.2))
+        start_time = time.perf_counter()
+        with pytest.raises(MoveTimeoutError):
+            move_func(np.zeros((6, 7), dtype=Player), Player(1), 0.1)
+        assert time.perf_counter() - start_time < 2
+        assert not worker.is_running
+
+def test_stuck_exec_is_killed_at_deadline(stuck_agent_dir):
+    with LocalAgent(stuck_agent_dir) as runner:
+        move_func = get_generate_move_func_from_container(runner, DeadlinePolicy(margin=0.5))
+        start_time = time.perf_counter()
+        with pytest.raises(MoveTimeoutError):
+            move_func(np.zeros((6, 7), dtype=Player), Player(1), 0.1)
+        assert time.perf_counter() - start_time < 3
+
+def test_stuck_agent_loses_match(stuck_agent_dir, local_agents_dir):
+    with LocalAgent(local_agents_dir / 'random') as player1, LocalAgent(stuck_agent_dir) as player2:
+        with player1.start_worker() as worker1, player2.start_worker() as worker2:
+            policy = DeadlinePolicy(margin=0.2)
+            winner, moves, error = _play_match(get_generate_move_func_from_worker(worker1, policy),
+                                               get_generate_move_func_from_worker(worker2, policy),
+                                               move_timeout=0.1)
+    assert winner == PLAYER1
+    assert len(moves) == 1
+    assert isinstance(error, MoveTimeoutError)
+
+def test_calibrated_overheads(local_agents_dir):
+    with LocalAgent(local_agents_dir / 'random') as runner:
+        exec_policy = calibrate_container_deadline(runner, samples=2)
+        with runner.start_worker() as worker:
+            worker_policy = calibrate_worker_deadline(worker, samples=5)
+    assert 0 < worker_policy.overhead < exec_policy.overhead
+    assert exec_policy.hard_limit(1.) == 1. + exec_policy.overhead + exec_policy.margin
+    assert worker_policy.compute_time(worker_policy.overhead / 2) == 0.
+
+def test_container_deadline_policy(local_agents_dir):
+    policy = DeadlinePolicy(margin=0.3)
+    with LocalAgent(local_agents_dir / 'random') as runner:
+        assert container_deadline_policy(runner, policy) is policy
+        calibrated = container_deadline_policy(runner, policy, calibrate=True)
+    assert calibrated.margin == 0.3
+    assert calibrated.overhead > 0
+
+def test_tournament_uses_deadline_policy(stuck_agent_dir):
+    start_time = time.perf_counter()
+    results = list(run_tournament([random_agent, stuck_agent_dir], max_workers=2, move_timeout=0.1,
+                                  sandbox_factory=LocalAgent, deadline_policy=DeadlinePolicy(margin=0.2)))
+    # The default margin alone would take two seconds per match
+    assert time.perf_counter() - start_time < 2
+    assert all("MoveTimeoutError" in result.error for result in results)
+
+def test_chess_clock_flags_slow_player():
+    def fast_agent(board, player, timeout):
+        return Move(np.argwhere(board[-1, :] == 0)[0, 0])
+
+    def slow_agent(board, player, timeout):
+        sleep(0.05)
+        return fast_agent(board, player, timeout)
+
+    clock = ChessClock(bank=0.12, increment=0.0)
+    winner, moves, error = _play_match(fast_agent, slow_agent, clock=clock)
+    assert winner == PLAYER1
+    assert isinstance(error, MoveTimeoutError)
+    assert len(moves) == 5
+    assert clock.time_left(PLAYER1) > 0.1
+
+def test_chess_clock_increment_and_overhead():
+    clock = ChessClock(bank=1.0, increment=0.5, overheads=(0.1, 0.0))
+    clock.charge(PLAYER1, 0.6)
+    clock.charge(PLAYER2, 0.6)
+    assert clock.time_left(PLAYER1) == pytest.approx(1.0)
+    assert clock.time_left(PLAYER2) == pytest.approx(0.9)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from c4utils import bitboard
+from c4utils.c4_types import Move, PLAYER1, PLAYER2
+from c4utils.gamelog import GameLogReader
+from c4utils.match import GameState
+from c4utils.selfplay import SelfPlayConfig, generate_openings, run_selfplay, load_agent
+from examples.agents.random_agent import generate_move as random_agent
+
+
+def read_games(paths):
+    games = []
+    for path in sorted(paths):
+        with GameLogReader(path) as log:
+            games.extend(log)
+    return games
+
+
+def test_openings_are_deterministic_and_distinct():
+    openings = generate_openings(200, plies=4, seed=3, dedup=True)
+    assert np.array_equal(openings, generate_openings(200, plies=4, seed=3, dedup=True))
+    keys = set()
+    for opening in openings:
+        position = bitboard.EMPTY_POSITION
+        for ply, col in enumerate(opening):
+            position = bitboard.apply_move(position, Move(col), PLAYER1 if ply % 2 == 0 else PLAYER2)
+        keys.add(bitboard.canonical_key(position))
+    assert len(keys) == 200
+
+
+def test_too_many_distinct_openings():
+    # There are only 4 distinct one-move openings up to mirror symmetry
+    with pytest.raises(ValueError):
+        generate_openings(5, plies=1, seed=0, dedup=True)
+
+
+def test_selfplay_writes_valid_deterministic_shards(tmp_path):
+    config = SelfPlayConfig((random_agent, random_agent), n_games=25, output_dir=tmp_path / 'a', seed=7,
+                            opening_plies=2, games_per_shard=10, max_workers=2)
+    paths = list(run_selfplay(config))
+    assert len(paths) == 3
+    games = read_games(paths)
+    assert len(games) == 25
+    for i, game in enumerate(games):
+        assert game.agents == ((0, 1) if i % 2 == 0 else (1, 0))
+        game_state = GameState()
+        for move in game.moves:
+            game_state.push(Move(move))
+        assert game_state.winner == game.winner
+
+    again = list(run_selfplay(SelfPlayConfig((random_agent, random_agent), n_games=25, output_dir=tmp_path / 'b',
+                                             seed=7, opening_plies=2, games_per_shard=10, max_workers=1)))
+    for first, second in zip(games, read_games(again), strict=True):
+        assert np.array_equal(first.moves, second.moves)
+
+
+def test_selfplay_resumes(tmp_path):
+    config = SelfPlayConfig((random_agent, random_agent), n_games=20, output_dir=tmp_path, games_per_shard=10)
+    first_run = sorted(run_selfplay(config))
+    assert len(first_run) == 2
+    first_run[1].unlink()
+    assert list(run_selfplay(config)) == [first_run[1]]
+    assert list(run_selfplay(config)) == []
+
+
+def test_selfplay_refuses_to_resume_with_other_settings(tmp_path):
+    config = SelfPlayConfig((random_agent, random_agent), n_games=10, output_dir=tmp_path, games_per_shard=10)
+    [path] = run_selfplay(config)
+    with GameLogReader(path) as log:
+        assert log.metadata['settings']['agents'] == ['examples.agents.random_agent:generate_move'] * 2
+    with pytest.raises(ValueError, match="other settings"):
+        list(run_selfplay(SelfPlayConfig((random_agent, random_agent), n_games=10, output_dir=tmp_path,
+                                         games_per_shard=10, seed=1)))
+    with pytest.raises(ValueError, match="other settings"):
+        list(run_selfplay(SelfPlayConfig((random_agent, random_agent), n_games=10, output_dir=tmp_path,
+                                         games_per_shard=10, opening_plies=2)))
+
+
+def test_load_agent(tmp_path):
+    assert load_agent('examples.agents.random_agent:generate_move') is random_agent
+    assert load_agent(str(tmp_path / 'agent.sif')) == tmp_path / 'agent.sif'
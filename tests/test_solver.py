@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import time
+import numpy as np
+import pytest
+
+from c4utils import bitboard
+from c4utils.bitboard import BOTTOM_ROW, FULL_BOARD, COLUMN_MASKS
+from c4utils.agents.solver import Solver, SIZE, WIN_SCORE, generate_move, thread_solver, winning_cells
+from c4utils.c4_types import Move, Player, BOARD_SIZE, PLAYER1, PLAYER2
+from c4utils.match import _play_match
+from examples.agents.random_agent import generate_move as random_agent
+
+
+@lru_cache(maxsize=None)
+def minimax(current, mask):
+    """Exhaustive reference search, with the solver's score convention"""
+    moves = mask.bit_count()
+    possible = (mask + BOTTOM_ROW) & FULL_BOARD
+    if not possible:
+        return 0
+    best = -np.inf
+    for column_mask in COLUMN_MASKS:
+        move = possible & column_mask
+        if not move:
+            continue
+        if bitboard.has_four(current | move):
+            return WIN_SCORE + SIZE - moves
+        best = max(best, -minimax(current ^ mask, mask | move))
+    return best
+
+
+def endgame_positions(count, empty_cells, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = []
+    while len(positions) < count:
+        stones, mask = [0, 0], 0
+        for ply in range(SIZE - empty_cells):
+            possible = (mask + BOTTOM_ROW) & FULL_BOARD
+            move = possible & COLUMN_MASKS[rng.choice([c for c in range(7) if possible & COLUMN_MASKS[c]])]
+            stones[ply % 2] |= move
+            mask |= move
+            if bitboard.has_four(stones[ply % 2]):
+                break
+        else:
+            positions.append((stones[(SIZE - empty_cells) % 2], mask))
+    return positions
+
+
+def test_winning_cells():
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+    board[0, 0:3] = PLAYER1
+    player_1, player_2 = bitboard.from_board(board)
+    assert winning_cells(player_1, player_1 | player_2) == bitboard.cell_bit(0, 3)
+
+
+def test_search_matches_exhaustive_minimax():
+    for current, mask in endgame_positions(40, empty_cells=12):
+        result = Solver().search(current, mask)
+        assert result.solved
+        assert result.score == minimax(current, mask)
+
+
+def test_takes_immediate_win():
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+    board[0, 1:4] = PLAYER1
+    board[1, 1:4] = PLAYER2
+    result = Solver().search_board(board, PLAYER1)
+    assert result.move in (Move(0), Move(4))
+    assert result.solved
+
+
+def test_blocks_threat():
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+    board[0, 0:3] = PLAYER2
+    board[0, 5:7] = PLAYER1
+    board[1, 0] = PLAYER1
+    assert Solver().search_board(board, PLAYER1, max_depth=4).move == Move(3)
+
+
+@pytest.mark.parametrize("timeout", [0.05, 0.3])
+def test_generate_move_respects_timeout(timeout):
+    start_time = time.perf_counter()
+    move = generate_move(np.zeros(BOARD_SIZE, dtype=Player), PLAYER1, timeout)
+    assert time.perf_counter() - start_time < timeout
+    assert move == Move(3)
+
+
+def test_concurrent_searches_keep_their_own_deadlines():
+    board = np.zeros(BOARD_SIZE, dtype=Player)
+
+    def timed_move(timeout):
+        start_time = time.perf_counter()
+        generate_move(board, PLAYER1, timeout)
+        return time.perf_counter() - start_time
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fast = executor.submit(timed_move, 0.2)
+        # Starts while the first search is still running
+        time.sleep(0.02)
+        slow = executor.submit(timed_move, 1.5)
+        assert fast.result() < 0.6
+        slow.result()
+        solvers = set(executor.map(lambda _: id(thread_solver()), range(2)))
+    assert id(thread_solver()) not in solvers
+
+
+def test_beats_random_agent():
+    for solver_first in (True, False):
+        agents = (generate_move, random_agent) if solver_first else (random_agent, generate_move)
+        winner, _, error = _play_match(*agents, move_timeout=0.05)
+        assert error is None
+        assert winner == (PLAYER1 if solver_first else PLAYER2)
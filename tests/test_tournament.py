@@ -0,0 +1,49 @@
+import pytest
+import numpy as np
+from collections import Counter
+from c4utils.tournament import build_schedule, run_tournament, tournament_workers
+from c4utils.c4_types import Move, PLAYER1, NO_PLAYER, NO_WINNER_YET
+from examples.agents.random_agent import generate_move as random_agent
+
+
+def leftmost_column_agent(board, player, timeout):
+    return Move(np.argwhere(board[-1, :] == 0)[0, 0])
+
+
+def failing_agent(board, player, timeout):
+    raise RuntimeError("broken submission")
+
+
+def test_schedule_contains_all_pairings_with_both_colours():
+    schedule = build_schedule(4, repeats=3)
+    assert len(schedule) == 4 * 3 * 3
+    assert len({match.match_id for match in schedule}) == len(schedule)
+    pairings = Counter((match.player_1, match.player_2) for match in schedule)
+    assert set(pairings.values()) == {3}
+    assert all(i != j for i, j in pairings)
+    assert (0, 1) in pairings and (1, 0) in pairings
+
+
+def test_workers_respect_container_limit():
+    assert tournament_workers(['a.sif', 'b.sif'], max_workers=8, max_containers=4) == 2
+    assert tournament_workers([random_agent, 'b.sif'], max_workers=8, max_containers=4) == 4
+    assert tournament_workers([random_agent, random_agent], max_workers=8, max_containers=1) == 8
+
+
+def test_tournament_streams_all_results():
+    agents = [random_agent, leftmost_column_agent, failing_agent]
+    results = list(run_tournament(agents, repeats=2, max_workers=2, move_timeout=0.5))
+    assert sorted(result.match_id for result in results) == list(range(12))
+    for result in results:
+        if failing_agent in (agents[result.player_1], agents[result.player_2]):
+            assert "broken submission" in result.error
+        else:
+            assert result.error is None
+            assert result.winner in (PLAYER1, 2, NO_PLAYER)
+            assert len(result.moves) >= 7
+
+
+def test_tournament_reports_sandbox_failures(tmp_path):
+    results = list(run_tournament([random_agent, tmp_path / 'missing.sif'], max_workers=1))
+    assert len(results) == 2
+    assert all(result.winner == NO_WINNER_YET and result.error for result in results)
@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+import numpy as np
+
+from c4utils.c4_types import Board, Player, Move
+from c4utils.match import _play_match
+from c4utils.tracing import Tracer, NULL_TRACER, MemorySink, JsonlSink, ChromeTraceSink
+from c4utils.agent_sandbox.local import LocalAgent
+from c4utils.agent_sandbox.agent_runner import get_generate_move_func_from_container
+
+LOCAL_RANDOM_AGENT = Path(__file__).parents[1] / 'examples' / 'local_agents' / 'random'
+
+
+def first_free_column(board: Board, player: Player, timeout: float) -> Move:
+    return Move(np.argmax(board[-1] == 0))
+
+
+def test_null_tracer_records_nothing():
+    assert not NULL_TRACER.enabled
+    with NULL_TRACER.span('stage'):
+        pass
+    NULL_TRACER.record('stage', 0.0, 1.0)
+
+
+def test_span_records_duration_and_args():
+    sink = MemorySink()
+    tracer = Tracer(sink)
+    with tracer.span('stage', ply=3):
+        pass
+    [span] = sink.spans
+    assert span.name == 'stage'
+    assert span.args == {'ply': 3}
+    assert span.duration >= 0
+
+
+def test_span_marks_errors():
+    sink = MemorySink()
+    try:
+        with Tracer(sink).span('stage'):
+            raise ValueError()
+    except ValueError:
+        pass
+    assert sink.spans[0].args['error'] == 'ValueError'
+
+
+def test_play_match_spans():
+    sink = MemorySink()
+    winner, moves, error = _play_match(first_free_column, first_free_column, tracer=Tracer(sink))
+    assert error is None
+    for name in ('move', 'board.copy', 'agent', 'game.push'):
+        assert len(sink.durations(name)) == len(moves)
+    assert [span.args['ply'] for span in sink.spans if span.name == 'move'] == list(range(len(moves)))
+
+
+def test_file_sinks(tmp_path):
+    with JsonlSink(tmp_path / 'trace.jsonl') as jsonl, ChromeTraceSink(tmp_path / 'trace.json') as chrome:
+        for sink in (jsonl, chrome):
+            with Tracer(sink).span('stage', ply=0):
+                pass
+    [line] = (tmp_path / 'trace.jsonl').read_text().splitlines()
+    assert json.loads(line)['name'] == 'stage'
+    [event] = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert event['ph'] == 'X'
+    assert event['name'] == 'stage'
+    assert event['args'] == {'ply': 0}
+
+
+def test_container_move_reports_agent_times():
+    sink = MemorySink()
+    tracer = Tracer(sink)
+    with LocalAgent(LOCAL_RANDOM_AGENT) as agent:
+        generate_move = get_generate_move_func_from_container(agent, tracer=tracer)
+        generate_move(np.zeros((6, 7), dtype=Player), Player(1), 0.1)
+    names = [span.name for span in sink.spans]
+    assert names == ['serialize', 'exec', 'parse', 'agent.compute', 'agent.import']
+    spans = {span.name: span for span in sink.spans}
+    assert spans['agent.compute'].args['source'] == 'agent'
+    assert spans['agent.compute'].duration + spans['agent.import'].duration <= spans['exec'].duration
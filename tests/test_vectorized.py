@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from c4utils.c4_types import Move, Player, BOARD_SIZE, NO_PLAYER, NO_WINNER_YET, PLAYER1, PLAYER2
+from c4utils.gamelog import Termination
+from c4utils.match import GameState, _play_match
+from c4utils.vectorized import VectorizedGameState, play_matches_batched, batched, random_batched_agent
+
+
+def leftmost_column_agent(board, player, timeout):
+    return Move(np.argmax(board[-1] == NO_PLAYER))
+
+
+def test_random_games_match_game_state():
+    results = play_matches_batched(random_batched_agent(0), random_batched_agent(1), n_games=500, chunk_size=128)
+    assert len(results) == 500
+    for winner, moves, n_moves in zip(results.winners, results.moves, results.n_moves):
+        game_state = GameState()
+        for move in moves[:n_moves]:
+            assert game_state.winner is None
+            game_state.push(Move(move))
+        assert np.all(moves[n_moves:] == -1)
+        assert game_state.winner == winner
+    assert np.all(results.termination == Termination.NORMAL)
+
+
+def test_batched_matches_play_match():
+    agent = batched(leftmost_column_agent)
+    results = play_matches_batched(agent, agent, n_games=3)
+    winner, moves, _ = _play_match(leftmost_column_agent, leftmost_column_agent)
+    assert np.all(results.winners == winner)
+    assert np.all(results.n_moves == len(moves))
+    assert results.moves[0, :len(moves)].tolist() == [int(m) for m in moves]
+
+
+def test_each_agent_is_called_once_per_ply():
+    calls = []
+    random_agent = random_batched_agent(0)
+
+    def counting_agent(boards, players, timeout):
+        calls.append(len(boards))
+        return random_agent(boards, players, timeout)
+    results = play_matches_batched(counting_agent, counting_agent, n_games=100)
+    assert len(calls) == results.n_moves.max()
+    assert sum(calls) == results.n_moves.sum()
+
+
+def test_initial_boards():
+    boards = np.zeros((2, *BOARD_SIZE), dtype=Player)
+    boards[1, 0:2, 0] = PLAYER1
+    boards[1, 0:2, 5] = PLAYER1
+    boards[1, 0, 1:4] = PLAYER2
+    state = VectorizedGameState(initial_boards=boards)
+    assert state.current_players.tolist() == [PLAYER1, PLAYER2]
+    # Player 2 completes the bottom row in the second game
+    state.push(np.array([0, 4]))
+    assert state.winners.tolist() == [NO_WINNER_YET, PLAYER2]
+    assert state.active.tolist() == [0]
+    assert state.current_players.tolist() == [PLAYER2]
+
+
+def test_finished_initial_boards_are_not_played():
+    boards = np.zeros((2, *BOARD_SIZE), dtype=Player)
+    boards[1, 0, 0:4] = PLAYER1
+    boards[1, 1, 0:3] = PLAYER2
+    results = play_matches_batched(random_batched_agent(0), random_batched_agent(1), initial_boards=boards)
+    assert results.winners[1] == PLAYER1
+    assert results.n_moves[1] == 0
+
+
+def test_invalid_move_loses():
+    state = VectorizedGameState(n_games=3)
+    state.push(np.array([0, 7, -1]))
+    assert state.winners.tolist() == [NO_WINNER_YET, PLAYER2, PLAYER2]
+    assert state.termination.tolist() == [Termination.NORMAL, Termination.INVALID_MOVE, Termination.INVALID_MOVE]
+    for _ in range(5):
+        state.push(np.array([0]))
+    # Column 0 is full now
+    state.push(np.array([0]))
+    assert state.winners[0] == PLAYER2
+    assert state.is_game_over
+
+
+def test_push_checks_number_of_moves():
+    with pytest.raises(ValueError):
+        VectorizedGameState(n_games=2).push(np.array([0]))